@@ -0,0 +1,67 @@
+'''tests of the account validation cache against the fake exchange module'''
+import asyncio
+import dataclasses
+
+from tracker.account.validation import ValidationCache
+from tracker.testing.fake_exchange import DAY_MS, FakeExchangeConfig, create_exchange_module
+from tracker.testing.fake_gsheet import create_user_infos
+
+
+def test_transient_errors_keep_previous_validation_and_retry():
+    module = create_exchange_module(
+        FakeExchangeConfig(start_time=0, end_time=DAY_MS, latency=0,
+                           invalid_api_keys=['api_key_1']),
+        {'binance': 'date_time'})
+    user_infos = create_user_infos(4, ['binance'])
+    # every row is validated again on each update
+    cache = ValidationCache(ttl=-1, exchange_module=module)
+
+    def validate(user_infos: list) -> dict:
+        account_infos = asyncio.run(cache.validate(user_infos))
+        return {account_info.user_info.api_key: account_info for account_info in account_infos}
+
+    first = validate(user_infos[:3])
+    assert [first[f'api_key_{index}'].user_info.valid for index in range(3)] == [True, False, True]
+
+    # every request fails with 429 while a new row is added
+    module.config.rate_limit_error_rate = 1.
+    second = validate(create_user_infos(4, ['binance']))
+    assert [second[f'api_key_{index}'].user_info.valid
+            for index in range(4)] == [True, False, True, None]
+    assert second['api_key_3'].user_info.reason == 'RateLimitExceeded'
+    assert second['api_key_0'].exchange is first['api_key_0'].exchange
+
+    module.config.rate_limit_error_rate = 0.
+    third = validate(create_user_infos(4, ['binance']))
+    assert [third[f'api_key_{index}'].user_info.valid
+            for index in range(4)] == [True, False, True, True]
+    assert third['api_key_3'].user_info.reason is None
+    # the exchange of the new row is reused by the retry instead of created again
+    assert third['api_key_3'].exchange is second['api_key_3'].exchange
+
+
+def test_validations_are_kept_until_expired_while_rows_are_missing():
+    module = create_exchange_module(
+        FakeExchangeConfig(start_time=0, end_time=DAY_MS, latency=0), {'binance': 'date_time'})
+    user_infos = create_user_infos(2, ['binance'])
+    cache = ValidationCache(ttl=60, exchange_module=module)
+    first = asyncio.run(cache.validate(user_infos))
+    requests = module.stats['requests']
+
+    # a failed read of the sheet returns no rows
+    assert not asyncio.run(cache.validate([]))
+    second = asyncio.run(cache.validate(create_user_infos(2, ['binance'])))
+    assert [account_info.exchange for account_info in second] == [
+        account_info.exchange for account_info in first]
+    assert module.stats['requests'] == requests
+
+    # the exchange is created with the type of the row, a changed type is validated again
+    futures = [dataclasses.replace(user_info, type='future') for user_info in user_infos]
+    third = asyncio.run(cache.validate(futures))
+    assert third[0].exchange is not first[0].exchange
+    assert module.stats['requests'] > requests
+
+    cache.ttl = -1
+    asyncio.run(cache.validate(futures))
+    # pylint: disable=protected-access
+    assert {key[3] for key in cache._entries} == {'future'}
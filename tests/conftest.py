@@ -0,0 +1,21 @@
+'''fixtures shared by the tests'''
+import pytest
+
+from tracker.connector.ccxt import pagination
+from tracker.database.database import DataBase, DBConfig
+
+
+@pytest.fixture
+def database(tmp_path):
+    '''empty tracker database'''
+    database = DataBase(DBConfig(db_type='sqlite+pysqlite', host=str(tmp_path / 'test.sqlite')))
+    yield database
+    database.engine.dispose()
+
+
+@pytest.fixture
+def no_delay(monkeypatch):
+    '''retries and pages are not spaced in tests'''
+    monkeypatch.setattr(pagination, 'PAGE_DELAY', 0)
+    monkeypatch.setattr(pagination, 'RATE_LIMIT_DELAY', 0)
+    monkeypatch.setattr(pagination, 'NETWORK_ERROR_DELAY', 0)
@@ -0,0 +1,101 @@
+'''tests of the fetch loops reconfigured when accounts or bounties change'''
+import asyncio
+import dataclasses
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from tracker.account.create_account_infos import AccountInfo, create_account_infos
+from tracker.connector.ccxt.fetch_trades import TradeFetcher
+from tracker.connector.ccxt.get_config import CCXTConfig
+from tracker.testing.fake_exchange import DAY_MS, FakeExchangeConfig, create_exchange_module
+from tracker.testing.fake_gsheet import create_bounty_infos, create_user_infos
+
+pytestmark = pytest.mark.usefixtures('no_delay')
+
+
+def test_reconfigure_only_restarts_changed_pairs(database):
+    # pylint: disable=protected-access
+    now = int(time.time() * 1000)
+    module = create_exchange_module(
+        FakeExchangeConfig(start_time=now - DAY_MS, end_time=now, trades=10, latency=0),
+        {'binance': 'date_time'})
+    user_infos = create_user_infos(3, ['binance'])
+    bounty_infos = create_bounty_infos(2, ['binance'], ['BTC/USDT'], now - DAY_MS, now + DAY_MS)
+    config = CCXTConfig(limits={'binance': 100}, update_interval=600,
+                        pagination={'binance': 'date_time'})
+    account_infos = create_account_infos(user_infos[:2], module)
+    fetcher = TradeFetcher(account_infos, bounty_infos[:1], config, database)
+
+    async def reconfigure() -> tuple[dict, dict, dict]:
+        await fetcher.reconfigure(account_infos, bounty_infos[:1])
+        first = dict(fetcher._tasks)
+        # account 1 rotated its secret, account 2 and campaign 2 are new
+        changed = dataclasses.replace(user_infos[1], secret='rotated')
+        await fetcher.reconfigure(
+            create_account_infos([user_infos[0], changed, user_infos[2]], module), bounty_infos)
+        second = dict(fetcher._tasks)
+        # campaign 1 is extended
+        extended = dataclasses.replace(bounty_infos[0], end_timestamp=now + 2 * DAY_MS)
+        await fetcher.reconfigure(fetcher._account_infos, [extended, bounty_infos[1]])
+        third = dict(fetcher._tasks)
+        await fetcher.cancel_tasks(list(third))
+        return first, second, third
+
+    first, second, third = asyncio.run(reconfigure())
+    account_0, account_1, account_2 = [('binance', f'api_key_{index}') for index in range(3)]
+    assert set(first) == {(account_0, 1), (account_1, 1)}
+    assert set(second) == {(account, campaign_id) for account in (account_0, account_1, account_2)
+                           for campaign_id in (1, 2)}
+    assert second[account_0, 1] is first[account_0, 1]
+    assert second[account_1, 1] is not first[account_1, 1]
+    # only the exchange of the changed account is closed, unchanged accounts keep theirs
+    assert module.stats['close'] == 1
+    assert fetcher._accounts[account_0] is account_infos[0]
+    assert all(third[key] is not second[key] for key in third if key[1] == 1)
+    assert all(third[key] is second[key] for key in third if key[1] == 2)
+
+
+def test_reconfigure_keeps_exchange_shared_with_changed_row(database):
+    # pylint: disable=protected-access
+    now = int(time.time() * 1000)
+    module = create_exchange_module(
+        FakeExchangeConfig(start_time=now - DAY_MS, end_time=now, trades=10, latency=0),
+        {'binance': 'date_time'})
+    user_infos = create_user_infos(1, ['binance'])
+    bounty_infos = create_bounty_infos(1, ['binance'], ['BTC/USDT'], now - DAY_MS, now + DAY_MS)
+    config = CCXTConfig(limits={'binance': 100}, update_interval=600,
+                        pagination={'binance': 'date_time'})
+    account_infos = create_account_infos(user_infos, module)
+    fetcher = TradeFetcher(account_infos, bounty_infos, config, database)
+    # the validation cache gives a renamed row with the same credentials the same exchange
+    renamed = AccountInfo(dataclasses.replace(user_infos[0], display_name='renamed'),
+                          account_infos[0].exchange)
+
+    async def reconfigure() -> None:
+        await fetcher.reconfigure(account_infos, bounty_infos)
+        await fetcher.reconfigure([renamed], bounty_infos)
+        await fetcher.cancel_tasks(list(fetcher._tasks))
+
+    asyncio.run(reconfigure())
+    assert fetcher._accounts['binance', 'api_key_0'] is renamed
+    assert module.stats['close'] == 0
+
+
+def test_source_not_read_keeps_current_infos(database):
+    # pylint: disable=protected-access
+    now = int(time.time() * 1000)
+    module = create_exchange_module(
+        FakeExchangeConfig(start_time=now - DAY_MS, end_time=now, trades=10, latency=0),
+        {'binance': 'date_time'})
+    account_infos = create_account_infos(create_user_infos(1, ['binance']), module)
+    bounty_infos = create_bounty_infos(1, ['binance'], ['BTC/USDT'], now - DAY_MS, now + DAY_MS)
+    account_source = SimpleNamespace(account_infos=None)
+    bounty_source = SimpleNamespace(info=[])
+    config = CCXTConfig(limits={'binance': 100}, update_interval=600,
+                        pagination={'binance': 'date_time'})
+    fetcher = TradeFetcher(account_infos, bounty_infos, config, database,
+                           account_source=account_source, bounty_source=bounty_source)
+
+    assert fetcher.get_source_infos() == (account_infos, [])
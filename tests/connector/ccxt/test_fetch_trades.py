@@ -0,0 +1,89 @@
+'''tests of TradeFetcher against a fake exchange and a sqlite database'''
+import asyncio
+import time
+
+import pytest
+from ccxt.base.errors import RateLimitExceeded
+
+from tracker.account.create_account_infos import create_account_infos
+from tracker.connector.ccxt.cursor import CursorStore
+from tracker.connector.ccxt.fetch_trades import TradeFetcher
+from tracker.connector.ccxt.get_config import CCXTConfig
+from tracker.database.database import DataBase
+from tracker.database.tracker_orm_data import SQLTrade
+from tracker.testing.fake_exchange import DAY_MS, FakeExchangeConfig, create_exchange_module
+from tracker.testing.fake_gsheet import create_bounty_infos, create_user_infos
+
+TRADES = 1000
+
+pytestmark = pytest.mark.usefixtures('no_delay')
+
+
+def create_fetcher(database: DataBase, rate_limit_error_rate: float = 0.):
+    '''fetcher of one account and one campaign of a fake exchange paginated by date time'''
+    now = int(time.time() * 1000)
+    exchange_config = FakeExchangeConfig(start_time=now - DAY_MS, end_time=now, trades=TRADES,
+                                         latency=0,
+                                         rate_limit_error_rate=rate_limit_error_rate)
+    module = create_exchange_module(exchange_config, {'binance': 'date_time'})
+    account_info = create_account_infos(create_user_infos(1, ['binance']), module)[0]
+    bounty_info = create_bounty_infos(1, ['binance'], ['BTC/USDT'],
+                                      now - DAY_MS, now + DAY_MS)[0]
+    config = CCXTConfig(limits={'binance': 100}, update_interval=600,
+                        pagination={'binance': 'date_time'})
+    fetcher = TradeFetcher([account_info], [bounty_info], config, database,
+                           cursor_store=CursorStore.create(database))
+    return fetcher, account_info, bounty_info
+
+
+def count_trades(database: DataBase) -> int:
+    '''trades stored'''
+    return len(database.query_sql(f'SELECT id FROM {SQLTrade.__tablename__}'))
+
+
+def load_cursors(database: DataBase) -> list:
+    '''cursors persisted in the database'''
+    return list(CursorStore.create(database)._cursors.values())  # pylint: disable=protected-access
+
+
+def test_fetch_stores_trades_and_advances_cursor(database):
+    fetcher, account_info, bounty_info = create_fetcher(database)
+    asyncio.run(fetcher.fetch(account_info, bounty_info))
+
+    assert count_trades(database) == TRADES
+    cursors = load_cursors(database)
+    assert len(cursors) == 1
+    assert cursors[0].fetched_until is not None
+    assert cursors[0].last_full_scan is not None
+
+
+def test_failed_page_does_not_move_cursor(database):
+    fetcher, account_info, bounty_info = create_fetcher(database)
+    fetch_my_trades = account_info.exchange.fetch_my_trades
+    calls = 0
+
+    async def fail_after_two_pages(*args, **kwargs):
+        nonlocal calls
+        calls += 1
+        if calls > 2:
+            raise RateLimitExceeded('429 Too Many Requests')
+        return await fetch_my_trades(*args, **kwargs)
+
+    account_info.exchange.fetch_my_trades = fail_after_two_pages
+    with pytest.raises(RateLimitExceeded):
+        asyncio.run(fetcher.fetch(account_info, bounty_info))
+
+    # the pages fetched before the failure are kept but the range is fetched again
+    assert 0 < count_trades(database) < TRADES
+    assert load_cursors(database) == []
+    cursor = fetcher._cursor_store.get(account_info, bounty_info)  # pylint: disable=protected-access
+    assert cursor.fetched_until is None
+    assert cursor.last_full_scan is None
+
+
+def test_rate_limit_errors_raise_once_retries_run_out(database):
+    fetcher, account_info, bounty_info = create_fetcher(database, rate_limit_error_rate=1.)
+    with pytest.raises(RateLimitExceeded):
+        asyncio.run(fetcher.fetch(account_info, bounty_info))
+    assert count_trades(database) == 0
+    assert load_cursors(database) == []
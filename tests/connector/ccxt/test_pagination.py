@@ -0,0 +1,66 @@
+'''tests of the pagination methods'''
+import asyncio
+
+import pytest
+from ccxt.base.errors import NetworkError, RateLimitExceeded
+
+from tracker.connector.ccxt.pagination import (collect_pages,
+                                               iter_pagination,
+                                               iter_pagination_by_time_slices,
+                                               retry_func)
+from tracker.testing.fake_exchange import DAY_MS, FakeExchangeConfig, create_exchange_module
+
+
+pytestmark = pytest.mark.usefixtures('no_delay')
+
+
+def create_failing_func(errors: list[Exception]):
+    '''raises the errors in order then returns a trade'''
+    async def func(symbol, since, limit, params):
+        if errors:
+            raise errors.pop(0)
+        return [{'id': '1', 'timestamp': since, 'takerOrMaker': 'maker'}]
+    return func
+
+
+def test_retry_func_returns_after_transient_errors():
+    func = create_failing_func([RateLimitExceeded('429'), NetworkError('reset')])
+    assert asyncio.run(retry_func(func, 'BTC/USDT', 5, 100)) == [
+        {'id': '1', 'timestamp': 5, 'takerOrMaker': 'maker'}]
+
+
+@pytest.mark.parametrize('error', [RateLimitExceeded('429'), NetworkError('reset')])
+def test_retry_func_raises_once_retries_run_out(error):
+    func = create_failing_func([error] * 3)
+    with pytest.raises(type(error)):
+        asyncio.run(retry_func(func, 'BTC/USDT', 5, 100))
+
+
+def test_pagination_raises_instead_of_ending_on_failed_page():
+    func = create_failing_func([RateLimitExceeded('429')] * 3)
+    with pytest.raises(RateLimitExceeded):
+        asyncio.run(collect_pages(
+            iter_pagination(func, 'date_time', 'user', 'BTC/USDT', 0, 100, 100)))
+
+
+@pytest.mark.parametrize('method', ['date_time', 'end_time'])
+def test_time_slices_yield_every_trade_once(method):
+    config = FakeExchangeConfig(start_time=0, end_time=DAY_MS, trades=1000, max_limit=50,
+                                latency=0)
+    module = create_exchange_module(config, {'binance': method})
+    exchange = module.binance({'apiKey': 'key'})
+    requested = []
+
+    async def fetch_my_trades(symbol, since, limit, params):
+        requested.append((since, dict(params or {})))
+        return await exchange.fetch_my_trades(symbol, since, limit, params)
+
+    pages = asyncio.run(collect_pages(iter_pagination_by_time_slices(
+        fetch_my_trades, method, 'user', 'BTC/USDT', 0, DAY_MS, 50,
+        slice_interval=DAY_MS // 7, max_concurrency=3)))
+
+    ids = [trade['id'] for trade in pages]
+    assert len(ids) == len(set(ids)) == 1000
+    if method == 'date_time':
+        # every request of a slice is bounded by the end of its slice
+        assert all('endTime' in params for _, params in requested)
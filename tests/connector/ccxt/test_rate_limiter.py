@@ -0,0 +1,74 @@
+'''tests of the token bucket and the shared rate limit scheduler'''
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from ccxt.base.errors import RateLimitExceeded
+
+from tracker.connector.ccxt.rate_limiter import RateLimitScheduler, TokenBucket
+
+
+def create_exchange(exchange_id: str = 'okex') -> SimpleNamespace:
+    '''exchange with the attributes read by the scheduler'''
+    return SimpleNamespace(id=exchange_id, rateLimit=10, enableRateLimit=True)
+
+
+def test_backoff_grows_over_rate_limit_errors_between_successes():
+    # the rate cannot be reduced so only the backoff slows down the requests
+    bucket = TokenBucket('okex', rate=100, min_rate=100, max_backoff=60)
+    backoffs = []
+    for _ in range(4):
+        bucket.penalize()
+        backoffs.append(bucket.backoff)
+        bucket.reward()
+    assert backoffs[-1] > 2 * backoffs[0]
+
+
+def test_backoff_decays_after_successes():
+    bucket = TokenBucket('okex', rate=100)
+    bucket.penalize()
+    for _ in range(50):
+        bucket.reward()
+    assert bucket.backoff < 1e-3
+    assert bucket.rate == bucket.base_rate
+
+
+def test_cost_above_capacity_is_served_and_charged():
+    bucket = TokenBucket('okex', rate=100, capacity=2)
+
+    async def acquire() -> float:
+        started = time.monotonic()
+        await asyncio.wait_for(bucket.acquire(cost=5), timeout=1)
+        await asyncio.wait_for(bucket.acquire(cost=1), timeout=1)
+        return time.monotonic() - started
+
+    # the excess of the first request is paid by the second one
+    assert asyncio.run(acquire()) >= 0.03
+
+
+def test_request_uses_method_cost_and_disables_ccxt_throttle():
+    scheduler = RateLimitScheduler({'okex': 1000}, capacity=10,
+                                   costs={'okex': {'fetch_my_trades': 4}})
+    exchange = create_exchange()
+
+    async def fetch_my_trades() -> list:
+        return []
+
+    asyncio.run(scheduler.request(exchange, fetch_my_trades))
+    assert exchange.enableRateLimit is False
+    assert scheduler.get_bucket(exchange).tokens == pytest.approx(6, abs=0.5)
+    assert scheduler.get_cost(exchange, 'fetch_balance') == 1
+
+
+def test_request_penalizes_bucket_on_rate_limit_error():
+    scheduler = RateLimitScheduler({'okex': 100})
+    exchange = create_exchange()
+
+    async def fetch_my_trades() -> list:
+        raise RateLimitExceeded('429')
+
+    with pytest.raises(RateLimitExceeded):
+        asyncio.run(scheduler.request(exchange, fetch_my_trades))
+    assert scheduler.get_bucket(exchange).rate == 50
+    assert scheduler.get_backoff(exchange) > 0
@@ -0,0 +1,70 @@
+'''tests of TradeWatcher streaming from the fake exchange module'''
+import asyncio
+import time
+
+import pytest
+
+from tracker.account.create_account_infos import create_account_infos
+from tracker.connector.ccxt.cursor import CursorStore
+from tracker.connector.ccxt.get_config import CCXTConfig
+from tracker.connector.ccxt.watch_trades import TradeWatcher
+from tracker.database.database import DataBase
+from tracker.database.tracker_orm_data import SQLTrade
+from tracker.testing.fake_exchange import FakeExchangeConfig, create_exchange_module
+from tracker.testing.fake_gsheet import create_bounty_infos, create_user_infos
+
+TRADES = 300
+# ms of trades made before the watcher starts and while it streams
+PAST = 3000
+FUTURE = 1500
+
+pytestmark = pytest.mark.usefixtures('no_delay')
+
+
+def create_watcher(database: DataBase, full_rescan_interval: float = 86400):
+    '''watcher of one account whose trades are made partly while it streams'''
+    now = int(time.time() * 1000)
+    module = create_exchange_module(
+        FakeExchangeConfig(start_time=now - PAST, end_time=now + FUTURE, trades=TRADES,
+                           latency=0),
+        {'binance': 'date_time'})
+    account_info = create_account_infos(create_user_infos(1, ['binance']), module)[0]
+    bounty_info = create_bounty_infos(1, ['binance'], ['BTC/USDT'],
+                                      now - PAST, now + FUTURE + 500)[0]
+    config = CCXTConfig(limits={'binance': 100}, update_interval=0.1,
+                        pagination={'binance': 'date_time'}, watch_exchanges=['binance'],
+                        full_rescan_interval=full_rescan_interval)
+    cursor_store = CursorStore.create(database, full_rescan_interval=full_rescan_interval)
+    watcher = TradeWatcher([account_info], [bounty_info], config, database,
+                           cursor_store=cursor_store, stream_module=module)
+    return watcher, module, account_info, bounty_info
+
+
+def count_trades(database: DataBase) -> int:
+    '''trades stored'''
+    return len(database.query_sql(f'SELECT id FROM {SQLTrade.__tablename__}'))
+
+
+def test_watcher_fills_gap_then_streams(database):
+    watcher, module, account_info, bounty_info = create_watcher(database)
+    started = int(time.time() * 1000)
+    asyncio.run(watcher.fetch(account_info, bounty_info))
+
+    # trades made after the rest catch up can only come from the stream
+    assert count_trades(database) == TRADES
+    assert module.stats['watch_my_trades'] == 1
+    cursor = watcher._cursor_store.get(account_info, bounty_info)  # pylint: disable=protected-access
+    # only the gap fill was a full scan
+    assert cursor.last_full_scan - started < 300
+
+
+def test_watcher_reconciles_with_rest_while_streaming(database):
+    watcher, module, account_info, bounty_info = create_watcher(database,
+                                                                full_rescan_interval=0.3)
+    started = int(time.time() * 1000)
+    asyncio.run(watcher.fetch(account_info, bounty_info))
+
+    assert count_trades(database) == TRADES
+    cursor = watcher._cursor_store.get(account_info, bounty_info)  # pylint: disable=protected-access
+    # full scans kept running after the gap fill while the stream was connected
+    assert cursor.last_full_scan - started >= 300
@@ -0,0 +1,88 @@
+'''tests of the sharded connector against the fake exchange module'''
+import asyncio
+import dataclasses
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from tracker.connector.ccxt.get_config import CCXTConfig
+from tracker.connector.shard import (HashRing,
+                                     ShardAssignment,
+                                     ShardCoordinator,
+                                     ShardWorker,
+                                     get_rate_share,
+                                     partition)
+from tracker.testing.fake_exchange import DAY_MS, FakeExchangeConfig, create_exchange_module
+from tracker.testing.fake_gsheet import create_bounty_infos, create_user_infos
+
+pytestmark = pytest.mark.usefixtures('no_delay')
+
+
+def test_partition_only_moves_accounts_of_removed_shard():
+    user_infos = create_user_infos(200, ['binance'])
+    before = partition(HashRing(range(4)), range(4), user_infos, [])
+    after = partition(HashRing(range(3)), range(3), user_infos, [])
+    api_keys = {shard: {user_info.api_key for user_info in assignment.user_infos}
+                for shard, assignment in after.items()}
+    for shard in range(3):
+        # accounts of the remaining shards stay, they only receive accounts of shard 3
+        assert {user_info.api_key for user_info in before[shard].user_infos} <= api_keys[shard]
+    assert sum(map(len, api_keys.values())) == 200
+
+
+def test_coordinator_publishes_nothing_before_accounts_are_read():
+    # pylint: disable=protected-access
+    account_validator = SimpleNamespace(account_infos=None)
+    bounty = SimpleNamespace(info=[])
+    coordinator = ShardCoordinator(2, account_validator, bounty, None, CCXTConfig(
+        limits={}, update_interval=600, pagination={}))
+    coordinator._queues = {shard: SimpleNamespace(put=[].append) for shard in coordinator.shards}
+    coordinator.publish()
+    assert not coordinator._sent
+    account_validator.account_infos = []
+    coordinator.publish()
+    assert set(coordinator._sent) == {0, 1}
+
+
+def test_rate_is_shared_by_workers_and_coordinator():
+    assert get_rate_share(1) == 1
+    assert get_rate_share(3) * 4 == 1
+
+
+def test_worker_reuses_unchanged_exchanges(database):
+    # pylint: disable=protected-access
+    now = int(time.time() * 1000)
+    module = create_exchange_module(
+        FakeExchangeConfig(start_time=now - DAY_MS, end_time=now, trades=10, latency=0),
+        {'binance': 'date_time', 'okex': 'date_time'})
+    config = CCXTConfig(limits={'binance': 100, 'okex': 100}, update_interval=600,
+                        pagination={'binance': 'date_time', 'okex': 'date_time'},
+                        reconfigure_interval=600, workers=2)
+    bounty_infos = create_bounty_infos(1, ['binance'], ['BTC/USDT'], now - DAY_MS, now + DAY_MS)
+    user_infos = create_user_infos(4, ['binance', 'okex'])
+    changed = dataclasses.replace(user_infos[1], secret='rotated')
+    worker = ShardWorker(0, None, database, config, module)
+
+    async def assign_twice() -> tuple[dict, dict]:
+        await worker.assign(ShardAssignment(user_infos[:3], bounty_infos))
+        first = {key: account_info.exchange
+                 for key, account_info in worker._account_infos.items()}
+        await asyncio.sleep(0.1)
+        await worker.assign(ShardAssignment([changed] + user_infos[2:], bounty_infos))
+        second = {key: account_info.exchange
+                  for key, account_info in worker._account_infos.items()}
+        await asyncio.sleep(0.1)
+        await worker.stop_fetcher()
+        return first, second
+
+    first, second = asyncio.run(assign_twice())
+    assert second[('binance', 'api_key_2')] is first[('binance', 'api_key_2')]
+    assert second[('okex', 'api_key_1')] is not first[('okex', 'api_key_1')]
+    assert ('binance', 'api_key_0') not in second
+    # the markets of each exchange are loaded once and set on every new exchange
+    assert module.stats['load_markets'] == 2
+    assert all(exchange.markets for exchange in second.values())
+    # public exchanges loading the markets, removed and changed accounts on reconfigure,
+    # then the assigned accounts when the worker stops
+    assert module.stats['close'] == 2 + 2 + 3
@@ -0,0 +1,21 @@
+'''tests of the prometheus metrics'''
+import pytest
+
+from tracker.core.metrics import Counter, Metric, Registry
+
+
+def test_metric_requires_samples():
+    class Untyped(Metric):  # pylint: disable=abstract-method
+        '''metric without samples'''
+
+    with pytest.raises(TypeError):
+        Untyped('tracker_untyped', 'no samples', registry=Registry())
+
+
+def test_counter_renders_samples():
+    registry = Registry()
+    counter = Counter('tracker_requests', 'requests', ('exchange',), registry=registry)
+    counter.inc('okex', amount=2)
+    assert registry.render() == ('# HELP tracker_requests requests\n'
+                                 '# TYPE tracker_requests counter\n'
+                                 'tracker_requests_total{exchange="okex"} 2.0\n')
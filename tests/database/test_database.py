@@ -0,0 +1,58 @@
+'''tests of DataBase on a sqlite database'''
+from sqlalchemy import select
+
+from tracker.database import database as database_module
+from tracker.database.tracker_orm_data import SQLTrade, SQLTradeCursor
+
+
+def create_cursor(**kwargs) -> SQLTradeCursor:
+    '''cursor of a test account market'''
+    return SQLTradeCursor(exchange_name='okex', api_key='key', campaign_id=1, market='BTC/USDT',
+                          **kwargs)
+
+
+def test_commit_task_list_writes_only_set_attributes(database):
+    database.commit_task_list_to_sql([create_cursor(fetched_until=1, last_id='a')])
+    database.commit_task_list_to_sql([create_cursor(fetched_until=2)])
+    cursors = database.query_sql(select(SQLTradeCursor.fetched_until, SQLTradeCursor.last_id))
+    assert cursors.to_dict('records') == [{'fetched_until': 2, 'last_id': 'a'}]
+
+
+def test_query_sql_accepts_text_and_chunks(database):
+    database.commit_task_list_to_sql([create_cursor(fetched_until=1)])
+    assert len(database.query_sql(f'SELECT * FROM {SQLTradeCursor.__tablename__}')) == 1
+    chunks = list(database.iter_query(select(SQLTradeCursor.__table__), chunk_size=1))
+    assert [len(chunk) for chunk in chunks] == [1]
+
+
+def test_query_sql_runs_strings_with_params_as_driver_sql(database):
+    database.commit_task_list_to_sql([create_cursor(fetched_until=1, last_id='a:b')])
+    query = f'SELECT fetched_until FROM {SQLTradeCursor.__tablename__} WHERE last_id = ?'
+    assert database.query_sql(query, params=('a:b',)).fetched_until.tolist() == [1]
+    chunks = list(database.iter_query(query, chunk_size=1, params=('a:b',)))
+    assert [len(chunk) for chunk in chunks] == [1]
+
+
+def test_in_memory_database_is_shared_by_connections():
+    database = database_module.DataBase(database_module.DBConfig(db_type='sqlite+pysqlite',
+                                                                 host=':memory:'))
+    database.commit_task_list_to_sql([create_cursor(fetched_until=1)])
+    assert len(database.query_sql(select(SQLTradeCursor.__table__))) == 1
+
+
+def test_partitions_are_created_once_before_first_trades_of_campaign(database, monkeypatch):
+    created = []
+    monkeypatch.setattr(database_module, 'create_campaign_partitions',
+                        lambda connection, campaign_ids: created.append(campaign_ids))
+    trade = {'exchange_name': 'okex', 'id': '1', 'takerOrMaker': 'maker', 'timestamp': 0}
+    database.upsert_rows(SQLTrade, [{**trade, 'campaign_id': 1}])
+    # sqlite trades are not partitioned
+    assert not created
+
+    database._partitioned_trades = True  # pylint: disable=protected-access
+    database.upsert_rows(SQLTrade, [{**trade, 'campaign_id': 1}, {**trade, 'campaign_id': 2}])
+    database.commit_task_list_to_sql([SQLTrade(**trade, campaign_id=2),
+                                      SQLTrade(**trade, campaign_id=3)])
+    database.upsert_rows(SQLTradeCursor, [{'exchange_name': 'okex', 'api_key': 'key',
+                                           'campaign_id': 4, 'market': 'BTC/USDT'}])
+    assert created == [{1, 2}, {3}]
@@ -0,0 +1,61 @@
+'''tests of the binary order book encoding'''
+import numpy as np
+import pytest
+
+from tracker.database.order_book_codec import OrderBookDecoder, OrderBookEncoder, to_integers
+
+
+def create_books(count: int, levels: int = 20, seed: int = 0) -> list[tuple[list, list]]:
+    '''(bids, asks) on a tick grid with sizes changing between snapshots'''
+    rng = np.random.default_rng(seed)
+    books = []
+    for _ in range(count):
+        mid = 100 + int(rng.integers(-5, 5)) * 0.01
+        bids = [[round(mid - i * 0.01, 2), float(rng.integers(1, 1000)) / 8]
+                for i in range(levels)]
+        asks = [[round(mid + (i + 1) * 0.01, 2), float(rng.integers(1, 1000)) / 8]
+                for i in range(levels)]
+        books.append((bids, asks))
+    return books
+
+
+@pytest.mark.parametrize('delta, compress', [(True, True), (True, False), (False, True)])
+def test_round_trip(delta, compress):
+    books = create_books(30)
+    # the depth changes so a keyframe is forced besides the interval
+    books[12] = (books[12][0][:5], books[12][1])
+    # values without a lossless decimal scale are stored as float bits
+    books[20] = ([[1 / 3, np.pi]] + books[20][0][1:], books[20][1])
+    encoder = OrderBookEncoder(keyframe_interval=10, delta=delta, compress=compress)
+    decoder = OrderBookDecoder()
+    keyframes = []
+    for bids, asks in books:
+        data, book, keyframe = encoder.encode(bids, asks)
+        keyframes.append(keyframe)
+        decoded = decoder.decode(data)
+        assert np.array_equal(decoded.bids, np.array(bids))
+        assert np.array_equal(decoded.asks, np.array(asks))
+        assert np.array_equal(decoded.levels, book.levels)
+    if delta:
+        # the interval, then the depth and the size scale changing and changing back
+        assert [index for index, keyframe in enumerate(keyframes) if keyframe] == [
+            0, 11, 12, 13, 20, 21]
+    else:
+        assert all(keyframes)
+
+
+def test_delta_without_previous_snapshot_raises():
+    encoder = OrderBookEncoder()
+    books = create_books(2)
+    encoder.encode(*books[0])
+    data, _, keyframe = encoder.encode(*books[1])
+    assert not keyframe
+    with pytest.raises(ValueError):
+        OrderBookDecoder().decode(data)
+
+
+def test_to_integers_uses_smallest_lossless_scale():
+    integers, scale = to_integers(np.array([1.25, 100.5]))
+    assert scale == 2 and integers.tolist() == [125, 10050]
+    _, scale = to_integers(np.array([1 / 3]))
+    assert scale == -1
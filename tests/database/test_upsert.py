@@ -0,0 +1,83 @@
+'''tests of the dialect aware bulk upsert'''
+import pytest
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from tracker.database.upsert import (INSERTED_COLUMN,
+                                     UpsertResult,
+                                     bulk_upsert,
+                                     create_upsert_statement)
+
+metadata = MetaData()
+items = Table('items', metadata,
+              Column('id', Integer, primary_key=True),
+              Column('name', String(10)),
+              Column('size', Integer))
+
+
+@pytest.fixture
+def connection():
+    '''connection to an in memory sqlite database with the items table'''
+    engine = create_engine('sqlite+pysqlite://', future=True)
+    metadata.create_all(engine)
+    with engine.begin() as connection:
+        yield connection
+
+
+def read_items(connection) -> list[tuple]:
+    '''rows of the items table by id'''
+    return connection.execute(select(items).order_by(items.c.id)).all()
+
+
+@pytest.mark.parametrize('count', [True, False])
+def test_bulk_upsert_inserts_then_updates(connection, count):
+    rows = [{'id': 1, 'name': 'a', 'size': 1}, {'id': 2, 'name': 'b', 'size': 2}]
+    first = bulk_upsert(connection, items, rows, count=count)
+    assert first == (UpsertResult(inserted=2) if count else UpsertResult(written=2))
+    result = bulk_upsert(connection, items, [{'id': 2, 'name': 'c', 'size': 3},
+                                             {'id': 3, 'name': 'd', 'size': 4}],
+                         chunk_size=1, count=count)
+    assert result.total == 2
+    # the rowcount of sqlite does not tell an update from an insert
+    assert result == (UpsertResult(inserted=1, updated=1) if count else UpsertResult(written=2))
+    assert read_items(connection) == [(1, 'a', 1), (2, 'c', 3), (3, 'd', 4)]
+
+
+def test_bulk_upsert_keeps_last_row_of_duplicate_keys(connection):
+    bulk_upsert(connection, items, [{'id': 1, 'name': 'a'}, {'id': 1, 'name': 'b'}])
+    assert read_items(connection) == [(1, 'b', None)]
+
+
+def test_bulk_upsert_does_not_overwrite_missing_columns(connection):
+    bulk_upsert(connection, items, [{'id': 1, 'name': 'a', 'size': 1},
+                                    {'id': 2, 'name': 'b', 'size': 2}])
+    bulk_upsert(connection, items, [{'id': 1, 'name': 'c'},
+                                    {'id': 2, 'size': 5},
+                                    {'id': 3, 'name': 'd', 'size': 6, 'extra': 'ignored'}])
+    assert read_items(connection) == [(1, 'c', 1), (2, 'b', 5), (3, 'd', 6)]
+
+
+@pytest.mark.parametrize('dialect, clause', [(postgresql.dialect(), 'ON CONFLICT (id) DO UPDATE'),
+                                             (sqlite.dialect(), 'ON CONFLICT (id) DO UPDATE'),
+                                             (mysql.dialect(), 'ON DUPLICATE KEY UPDATE')])
+def test_upsert_statement_of_each_dialect(dialect, clause):
+    statement = create_upsert_statement(items, dialect.name, ['id', 'name'])
+    compiled = str(statement.compile(dialect=dialect))
+    assert clause in compiled
+    # only the columns written are updated
+    assert 'size' not in compiled.split(clause)[1]
+
+
+def test_upsert_statement_without_update_columns():
+    statement = create_upsert_statement(items, 'postgresql', ['id'])
+    assert 'DO NOTHING' in str(statement.compile(dialect=postgresql.dialect()))
+    with pytest.raises(NotImplementedError):
+        create_upsert_statement(items, 'oracle', ['id'])
+
+
+def test_postgresql_upsert_returns_inserted_flag():
+    statement = create_upsert_statement(items, 'postgresql', ['id', 'name'])
+    statement = statement.values([{'id': 1, 'name': 'a'}, {'id': 2, 'name': 'b'}])
+    compiled = str(statement.returning(INSERTED_COLUMN).compile(dialect=postgresql.dialect()))
+    assert 'ON CONFLICT (id) DO UPDATE' in compiled
+    assert compiled.endswith('RETURNING (xmax = 0)')
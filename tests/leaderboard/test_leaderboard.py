@@ -0,0 +1,38 @@
+'''tests of the materialized leaderboard'''
+import pytest
+
+from tracker.database.tracker_orm_data import SQLTrade
+from tracker.leaderboard.leaderboard import Leaderboard
+from tracker.reward.get_config import RewardConfig
+from tracker.reward.reward import RewardEngine
+from tracker.testing.fake_gsheet import create_bounty_infos
+
+HOUR_MS = 3600 * 1000
+
+
+def create_trade(trade_id: str, api_key: str, amount: float,
+                 taker_or_maker: str = 'maker') -> SQLTrade:
+    '''trade of campaign 1 at its start'''
+    return SQLTrade(exchange_name='okex', id=trade_id, takerOrMaker=taker_or_maker, campaign_id=1,
+                    api_key=api_key, display_name=api_key, timestamp=0, symbol='BTC/USDT',
+                    price=1., amount=amount, cost=amount)
+
+
+def test_leaderboard_aggregates_volumes_and_reads_rewards_from_payouts(database):
+    bounty_info = create_bounty_infos(1, ['okex'], ['BTC/USDT'], 0, HOUR_MS)[0]
+    database.commit_task_list_to_sql([create_trade('1', 'a', 3.),
+                                      create_trade('2', 'a', 5., 'taker'),
+                                      create_trade('3', 'b', 1.)])
+    leaderboard = Leaderboard(database)
+
+    leaderboard_df = leaderboard.refresh(bounty_info)
+    assert leaderboard_df[['api_key', 'maker_volume', 'taker_volume']].values.tolist() == [
+        ['a', 3., 5.], ['b', 1., 0.]]
+    # no reward until the reward engine pays the campaign
+    assert leaderboard_df.reward.isnull().all()
+
+    config = RewardConfig(reward_period=None, max_reward_share=0.5)
+    payouts = RewardEngine(database, config).update(bounty_info).set_index('api_key')
+    leaderboard_df = leaderboard.get_leaderboard_df(bounty_info.campaign_id).set_index('api_key')
+    assert leaderboard_df.reward.to_dict() == pytest.approx(payouts.reward.to_dict())
+    assert leaderboard_df.reward.to_dict() == pytest.approx({'a': 500., 'b': 500.})
@@ -0,0 +1,45 @@
+'''tests of the order book writer against a sqlite database'''
+import numpy as np
+import pytest
+
+from tracker.connector.ccxt.ccxt_data import CCXTOrderBook
+from tracker.database.database import DataBase, DBConfig
+from tracker.database.order_book_codec import read_order_books
+from tracker.order_book.writer import OrderBookWriter
+
+
+@pytest.fixture
+def public_database(tmp_path):
+    '''empty order book database'''
+    database = DataBase(DBConfig(db_type='sqlite+pysqlite', host=str(tmp_path / 'public.sqlite'),
+                                 base='public'))
+    yield database
+    database.engine.dispose()
+
+
+def create_order_book(timestamp: int, size: float) -> CCXTOrderBook:
+    '''order book of two levels per side with the same size'''
+    return CCXTOrderBook(symbol='BTC/USDT', exchange_id='okex', timestamp=timestamp,
+                         bids=[[100., size], [99.5, size + 1]],
+                         asks=[[100.5, size], [101., size + 2]])
+
+
+def test_repeated_snapshots_round_trip(public_database):
+    writer = OrderBookWriter(public_database, keyframe_interval=3)
+    books = [create_order_book(1, 1.), create_order_book(2, 2.), create_order_book(2, 2.),
+             create_order_book(3, 3.5), create_order_book(2, 9.)]
+    writer.write(books[:3])
+    # a poll returning the same book again in the next batch
+    writer.write(books[2:])
+    writer.write([create_order_book(4, 0.25)])
+    writer.write([create_order_book(4, 0.25), create_order_book(5, 4.)])
+
+    expected = {book.timestamp: book for book in books[:2] + books[3:4]}
+    expected.update({4: create_order_book(4, 0.25), 5: create_order_book(5, 4.)})
+    decoded = dict(read_order_books(public_database, 'okex', 'BTC/USDT', 0, 10))
+    assert list(decoded) == [1, 2, 3, 4, 5]
+    for timestamp, book in decoded.items():
+        assert np.array_equal(book.bids, expected[timestamp].bids)
+        assert np.array_equal(book.asks, expected[timestamp].asks)
+    assert writer.written == 5
+    assert writer.skipped == 4
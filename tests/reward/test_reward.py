@@ -0,0 +1,57 @@
+'''tests of the reward scoring, accrual and capping'''
+import numpy as np
+import pandas as pd
+import pytest
+
+from tracker.reward.get_config import RewardConfig
+from tracker.reward.reward import cap_rewards, compute_payouts
+from tracker.testing.fake_gsheet import create_bounty_infos
+
+HOUR_MS = 3600 * 1000
+
+
+def test_cap_rewards_shares_excess_in_proportion():
+    rewards = cap_rewards(np.array([80., 15., 5.]), 0.5)
+    assert rewards == pytest.approx([50., 37.5, 12.5])
+
+
+def test_cap_rewards_caps_participants_pushed_over_the_cap():
+    # b goes over the cap with its share of the excess of a
+    rewards = cap_rewards(np.array([70., 25., 5.]), 0.4)
+    assert rewards == pytest.approx([40., 40., 20.])
+    assert rewards.sum() == pytest.approx(100.)
+
+
+def test_cap_rewards_keeps_excess_when_everyone_is_capped():
+    assert cap_rewards(np.array([50., 50., 0.]), 0.4) == pytest.approx([40., 40., 0.])
+
+
+def create_rollups(volumes: dict[str, list[float]]) -> pd.DataFrame:
+    '''hourly maker volume rollups of each api_key'''
+    return pd.DataFrame([{'campaign_id': 1, 'api_key': api_key, 'bucket_start': hour * HOUR_MS,
+                          'display_name': api_key, 'payout_address': None,
+                          'maker_volume': volume, 'taker_volume': 0., 'maker_cost': volume,
+                          'taker_cost': 0.}
+                         for api_key, hourly in volumes.items()
+                         for hour, volume in enumerate(hourly)])
+
+
+def test_payouts_cap_bucket_volume_and_exclude_flagged():
+    bounty_info = create_bounty_infos(1, ['okex'], ['BTC/USDT'], 0, 2 * HOUR_MS)[0]
+    rollups = create_rollups({'a': [100., 10.], 'b': [20., 10.], 'c': [50., 50.]})
+    config = RewardConfig(reward_period=HOUR_MS / 1000, max_bucket_volume=40.)
+    payouts = compute_payouts(rollups, bounty_info, config, {'c'}, now=2 * HOUR_MS)
+    rewards = payouts.set_index('api_key').reward.to_dict()
+    # 500 per hour shared by the capped scores 40 and 20, then 10 and 10, c is excluded
+    assert rewards == pytest.approx({'a': 500 * 40 / 60 + 250, 'b': 500 * 20 / 60 + 250, 'c': 0.})
+    assert payouts.set_index('api_key').excluded.to_dict() == {'a': False, 'b': False, 'c': True}
+
+
+def test_payouts_accrue_only_elapsed_periods():
+    bounty_info = create_bounty_infos(1, ['okex'], ['BTC/USDT'], 0, 4 * HOUR_MS)[0]
+    rollups = create_rollups({'a': [10.], 'b': [30.]})
+    config = RewardConfig(reward_period=HOUR_MS / 1000, max_reward_share=0.6)
+    payouts = compute_payouts(rollups, bounty_info, config, now=HOUR_MS // 2)
+    rewards = payouts.set_index('api_key').reward.to_dict()
+    # half of the first of four hours has elapsed, b is capped at 60% of it
+    assert rewards == pytest.approx({'a': 50., 'b': 75.})
@@ -0,0 +1,96 @@
+'''tests of the wash trade and self match detection'''
+import pandas as pd
+import pytest
+from sqlalchemy import select
+
+from tracker.database.tracker_orm_data import SQLCounterpartyPair, SQLTrade
+from tracker.surveillance.get_config import SurveillanceConfig
+from tracker.surveillance.wash_trade import WashTradeDetector, detect_trades
+
+# api_key: payout address, a and b are owned by the same person
+PAYOUT_ADDRESSES = {'a': '0xab', 'b': '0xab', 'c': '0xc', 'd': '0xd', 'e': '0xe'}
+HOUR_MS = 3600 * 1000
+
+
+def create_trade(trade_id: str, api_key: str, taker_or_maker: str,
+                 amount: float = 10., timestamp: int = 0, exchange_name: str = 'okex') -> dict:
+    '''trade row of campaign 1'''
+    return {'exchange_name': exchange_name, 'id': trade_id, 'takerOrMaker': taker_or_maker,
+            'campaign_id': 1, 'api_key': api_key, 'display_name': api_key,
+            'payout_address': PAYOUT_ADDRESSES[api_key], 'timestamp': timestamp,
+            'symbol': 'BTC/USDT', 'price': 1., 'amount': amount, 'cost': amount}
+
+
+TRADES = [
+    # a is filled by b of the same owner
+    create_trade('1', 'a', 'maker'), create_trade('1', 'b', 'taker'),
+    # c is filled by d, another participant
+    create_trade('2', 'c', 'maker'), create_trade('2', 'd', 'taker'),
+    # e is filled outside the campaign
+    create_trade('3', 'e', 'maker'),
+]
+
+
+def get_reasons(flags: pd.DataFrame) -> dict:
+    '''reason of each flagged account'''
+    return dict(zip(flags.api_key[flags.flagged], flags.reason[flags.flagged]))
+
+
+def test_detect_trades_flags_intra_cohort_and_self_matches():
+    flags = detect_trades(1, pd.DataFrame(TRADES), SurveillanceConfig())
+    assert get_reasons(flags) == {'a': 'intra_cohort,self_match', 'c': 'intra_cohort'}
+    assert flags.set_index('api_key').self_match_share.to_dict() == pytest.approx(
+        {'a': 1., 'b': 0., 'c': 0., 'd': 0., 'e': 0.})
+
+
+def test_min_maker_volume_exempts_small_accounts():
+    trades = TRADES + [create_trade('4', 'a', 'maker', amount=100.)]
+    config = SurveillanceConfig(min_maker_volume=20.)
+    # a has 10 of 110 maker volume filled by its owner, c has too little volume to be flagged
+    assert get_reasons(detect_trades(1, pd.DataFrame(trades), config)) == {'a': 'self_match'}
+
+
+def test_same_trade_id_on_other_exchange_is_not_a_fill():
+    # e is filled by d on another exchange with the same trade id
+    trades = TRADES + [create_trade('3', 'd', 'taker', exchange_name='binance')]
+    flags = detect_trades(1, pd.DataFrame(trades), SurveillanceConfig())
+    assert get_reasons(flags) == {'a': 'intra_cohort,self_match', 'c': 'intra_cohort'}
+
+
+def test_save_replaces_counterparty_pairs(database):
+    detector = WashTradeDetector(database, SurveillanceConfig())
+    database.upsert_rows(SQLTrade, TRADES)
+    database.upsert_rows(SQLCounterpartyPair, [
+        {'campaign_id': 1, 'maker_api_key': 'e', 'taker_api_key': 'c'},
+        {'campaign_id': 2, 'maker_api_key': 'e', 'taker_api_key': 'c'}])
+    detector.update(1)
+    pairs = database.query_sql(select(SQLCounterpartyPair.campaign_id,
+                                      SQLCounterpartyPair.maker_api_key,
+                                      SQLCounterpartyPair.taker_api_key))
+    # the stale pair of campaign 1 is deleted, other campaigns are left as is
+    assert sorted(map(tuple, pairs.to_numpy().tolist())) == [
+        (1, 'a', 'b'), (1, 'c', 'd'), (2, 'e', 'c')]
+
+
+def test_incremental_update_matches_full_detection(database):
+    config = SurveillanceConfig(max_intra_cohort_share=0.4, overlap=1)
+    detector = WashTradeDetector(database, config)
+    # the counterparty of a fill arrives later, then a trade older than the overlap is backfilled
+    batches = [[create_trade('1', 'a', 'maker', timestamp=HOUR_MS),
+                create_trade('2', 'c', 'maker', timestamp=HOUR_MS)],
+               [create_trade('1', 'b', 'taker', timestamp=HOUR_MS),
+                create_trade('5', 'c', 'maker', timestamp=2 * HOUR_MS)],
+               [create_trade('2', 'd', 'taker', timestamp=HOUR_MS),
+                create_trade('6', 'a', 'maker', timestamp=0)]]
+    for batch in batches:
+        database.upsert_rows(SQLTrade, batch)
+        detector.update(1)
+
+    campaign = detector.campaigns[1]
+    trades = database.query_sql(f'SELECT * FROM {SQLTrade.__tablename__}')
+    expected = detect_trades(1, trades, config).set_index('api_key').sort_index()
+    flags = detector.save(campaign).set_index('api_key').sort_index()
+    columns = ['maker_volume', 'intra_cohort_volume', 'self_match_volume', 'flagged']
+    pd.testing.assert_frame_equal(flags[columns], expected[columns])
+    assert get_reasons(flags.reset_index()) == {'a': 'intra_cohort,self_match',
+                                                'c': 'intra_cohort'}
@@ -0,0 +1,115 @@
+'''tests of the incremental campaign worksheet sync'''
+import datetime
+from collections import Counter
+from types import SimpleNamespace
+
+import gspread
+
+from tracker.database.tracker_orm_data import SQLTrade
+from tracker.sync.sheet import SYNC_OVERLAP_MS, GoogleSyncTrade
+
+
+class RecordingWorksheet:
+    '''gspread worksheet keeping the cell values written'''
+
+    def __init__(self, title: str) -> None:
+        self.title = title
+        self.rows: list[list] = []
+        self.calls = Counter()
+
+    def clear(self) -> None:
+        self.calls['clear'] += 1
+        self.rows = []
+
+    def resize(self, rows: int = None, cols: int = None) -> None:
+        pass
+
+    def update(self, range_name: str, values: list[list], value_input_option: str = None) -> None:
+        assert range_name == 'A1' and value_input_option == 'RAW'
+        self.rows = [list(row) for row in values]
+
+    def append_rows(self, values: list[list], value_input_option: str = None) -> None:
+        assert value_input_option == 'RAW'
+        self.calls['append_rows'] += len(values)
+        self.rows += [list(row) for row in values]
+
+    def batch_update(self, data: list[dict]) -> None:
+        self.calls['batch_update'] += len(data)
+        for update in data:
+            row_number = gspread.utils.a1_to_rowcol(update['range'].split(':')[0])[0]
+            self.rows[row_number - 1] = list(update['values'][0])
+
+    def get_all_values(self, value_render_option: str = None) -> list[list]:
+        assert value_render_option == 'UNFORMATTED_VALUE'
+        # the sheets api returns numbers as json numbers, whole numbers without a fraction
+        return [[int(value) if isinstance(value, float) and value.is_integer() else value
+                 for value in row] for row in self.rows]
+
+
+class RecordingSpreadsheet:
+    '''gspread spreadsheet of recording worksheets'''
+
+    def __init__(self) -> None:
+        self.worksheets: dict[str, RecordingWorksheet] = {}
+
+    def worksheet(self, title: str) -> RecordingWorksheet:
+        if title not in self.worksheets:
+            raise gspread.exceptions.WorksheetNotFound(title)
+        return self.worksheets[title]
+
+    def add_worksheet(self, title: str, rows: int, cols: int) -> RecordingWorksheet:
+        return self.worksheets.setdefault(title, RecordingWorksheet(title))
+
+
+def create_trade(trade_id: str, timestamp: int, amount: float = 2.) -> SQLTrade:
+    '''maker trade of campaign 1'''
+    return SQLTrade(exchange_name='okex', id=trade_id, takerOrMaker='maker', campaign_id=1,
+                    api_key='key', timestamp=timestamp, symbol='BTC/USDT', price=1., amount=amount,
+                    cost=amount, datetime=datetime.datetime.utcfromtimestamp(timestamp / 1000))
+
+
+def create_sync(database, trades_ss: RecordingSpreadsheet) -> GoogleSyncTrade:
+    '''sync of a new process to the recording spreadsheet'''
+    g_sheet = SimpleNamespace(governor_ss=RecordingSpreadsheet(), trades_ss=trades_ss,
+                              update_interval=600)
+    return GoogleSyncTrade(database, g_sheet)
+
+
+def test_rewritten_and_appended_rows_have_the_same_format(database):
+    trades_ss = RecordingSpreadsheet()
+    sync = create_sync(database, trades_ss)
+    database.commit_task_list_to_sql([create_trade('1', 1_600_000_000_000)])
+    sync.sync_campaign(1)
+    database.commit_task_list_to_sql([create_trade('2', 1_600_000_001_000)])
+    sync.sync_campaign(1)
+
+    header, *rows = trades_ss.worksheet('1').rows
+    datetime_column = header.index('datetime')
+    assert [row[datetime_column] for row in rows] == ['2020-09-13T12:26:40.000Z',
+                                                      '2020-09-13T12:26:41.000Z']
+    assert {tuple(map(type, row)) for row in rows} == {tuple(map(type, rows[0]))}
+
+
+def test_restart_reads_worksheet_and_patches_edited_rows(database):
+    trades_ss = RecordingSpreadsheet()
+    database.commit_task_list_to_sql([create_trade(str(index), 1_600_000_000_000 + index)
+                                      for index in range(3)])
+    create_sync(database, trades_ss).sync_campaign(1)
+    worksheet = trades_ss.worksheet('1')
+    written = [list(row) for row in worksheet.rows]
+
+    # the trade is edited after the overlap of the latest trade
+    timestamp = 1_600_000_000_000 + SYNC_OVERLAP_MS * 2
+    database.commit_task_list_to_sql([create_trade('0', 1_600_000_000_000, amount=5.),
+                                      create_trade('3', timestamp)])
+    sync = create_sync(database, trades_ss)
+    sync.sync_campaign(1)
+    assert worksheet.calls == Counter(clear=1, batch_update=1, append_rows=1)
+    assert worksheet.rows[2:4] == written[2:4]
+
+    database.commit_task_list_to_sql([create_trade('1', 1_600_000_000_001, amount=7.)])
+    sync.sync_campaign(1)
+    sync.sync_campaign(1)
+    assert worksheet.calls == Counter(clear=1, batch_update=2, append_rows=1)
+    amount_column = worksheet.rows[0].index('amount')
+    assert [row[amount_column] for row in worksheet.rows[1:]] == [5., 7., 2., 2.]
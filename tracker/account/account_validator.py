@@ -4,22 +4,30 @@ main function for account
 import logging
 import asyncio
 
-from tracker.account.create_account_infos import AccountInfo, create_account_infos
+from tracker.account.create_account_infos import AccountInfo
 from tracker.account.get_user_info import get_user_infos
-from tracker.account.validation import (update_validity_in_sheet,
-                                    validate_account_infos)
+from tracker.account.validation import ValidationCache, update_validity_in_sheet
+from tracker.connector.ccxt.rate_limiter import RateLimitScheduler
+from tracker.core.async_io import run_sheet
 from tracker.core.gsheet import GSheet
+from tracker.core.metrics import SHEET_SECONDS
 
 logger = logging.getLogger(__name__)
 
 
-async def get_validated_account_infos(g_sheet: GSheet) -> list[AccountInfo]:
-    '''get only valid account info'''
+async def get_validated_account_infos(g_sheet: GSheet,
+                                     scheduler: RateLimitScheduler = None,
+                                     validation_cache: ValidationCache = None) -> list[AccountInfo]:
+    '''get only valid account info, only rows not in the validation cache are validated'''
     worksheet = g_sheet.user_info_ws
-    user_infos = get_user_infos(g_sheet)
-    account_infos = create_account_infos(user_infos)
-    await validate_account_infos(account_infos)
-    update_validity_in_sheet(user_infos, worksheet)
+    validation_cache = validation_cache or ValidationCache()
+    # google sheet requests run in a thread so that the fetchers are not blocked
+    with SHEET_SECONDS.time('read_user_infos'):
+        user_infos = await run_sheet(get_user_infos, g_sheet)
+    with SHEET_SECONDS.time('validate_accounts'):
+        account_infos = await validation_cache.validate(user_infos, scheduler)
+    with SHEET_SECONDS.time('update_validity'):
+        await run_sheet(update_validity_in_sheet, user_infos, worksheet)
     return [account_info for account_info in account_infos if account_info.user_info.valid]
 
 
@@ -29,28 +37,44 @@ class AccountValidator:
     def __init__(self,
                  g_sheet: GSheet,
                  account_infos: list[AccountInfo] = None,
-                 update_interval: int = 600) -> None:
+                 update_interval: int = 600,
+                 scheduler: RateLimitScheduler = None,
+                 validation_cache: ValidationCache = None) -> None:
         self.g_sheet = g_sheet
         self.account_infos = account_infos
         self.update_interval = update_interval
+        self.scheduler = scheduler
+        self.validation_cache = validation_cache or ValidationCache()
 
     @classmethod
-    async def create(cls, g_sheet: GSheet, update_interval: float = 600) -> 'AccountValidator':
+    async def create(cls,
+                     g_sheet: GSheet,
+                     update_interval: float = 600,
+                     scheduler: RateLimitScheduler = None) -> 'AccountValidator':
         '''a default method of starting account validator'''
-        account_infos = await get_validated_account_infos(g_sheet)
-        return cls(g_sheet=g_sheet, account_infos=account_infos, update_interval=update_interval)
+        validation_cache = ValidationCache()
+        account_infos = await get_validated_account_infos(g_sheet, scheduler, validation_cache)
+        return cls(g_sheet=g_sheet, account_infos=account_infos,
+                   update_interval=update_interval, scheduler=scheduler,
+                   validation_cache=validation_cache)
 
     async def start(self) -> None:
         '''starts a async loop to periodically validated account info'''
         while True:
             try:
-                self.account_infos = await get_validated_account_infos(self.g_sheet)
+                self.account_infos = await get_validated_account_infos(
+                    self.g_sheet, self.scheduler, self.validation_cache)
                 await asyncio.sleep(self.update_interval)
             except TimeoutError as err:
                 logger.warning('%s: retry in 30sec', err)
                 await asyncio.sleep(30)
             except KeyboardInterrupt:
                 break
+            except Exception as err:
+                # the last validated accounts are kept until the sheet can be read again
+                logger.warning('%s: %s keep last account infos, retry in 30sec',
+                               type(err).__name__, err)
+                await asyncio.sleep(30)
 
 
 async def test():
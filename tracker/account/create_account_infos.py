@@ -2,6 +2,7 @@
 # pylint: disable=invalid-name
 import logging
 from dataclasses import dataclass
+from types import ModuleType
 import ccxt.async_support as ccxt
 from ccxt.base.exchange import Exchange
 from tracker.account.get_user_info import UserInfo
@@ -15,12 +16,13 @@ class AccountInfo:
     exchange: Exchange
 
 
-def create_account_infos(user_infos: list[UserInfo]) -> list[AccountInfo]:
-    '''create a list of exchange class from credentials'''
+def create_account_infos(user_infos: list[UserInfo],
+                         exchange_module: ModuleType = ccxt) -> list[AccountInfo]:
+    '''create a list of exchange class from credentials, exchange_module can be a fake for testing'''
     account_infos = []
     for user_info in user_infos:
         try:
-            exchange = getattr(ccxt, user_info.exchange_name)(
+            exchange = getattr(exchange_module, user_info.exchange_name)(
                 {
                     "enableRateLimit": user_info.enable_rate_limit,
                     "defaultType": user_info.type,
@@ -26,23 +26,17 @@ class UserInfo:  # pylint: disable=[too-many-instance-attributes, invalid-name]
     type: str = 'spot'
 
 
+def parse_user_infos(dataframe: pd.DataFrame) -> list[UserInfo]:
+    '''user infos of the rows of the user info worksheet with a timestamp'''
+    return [UserInfo(**row) for row in dataframe.to_dict('records') if row.get('Timestamp')]
+
+
 def get_user_infos(sheet: GSheet) -> list[UserInfo]:
-    '''get all account infos from api keys'''
-    try:
-        user_infos = []
-        worksheet = sheet.user_info_ws
-        dataframe = sheet.get_worksheet_as_dataframe(worksheet)
-        # replace nan with none to convert to dictionary
-        dataframe = dataframe.replace({pd.NA: None})
-        for _, row in dataframe.iterrows():
-            row_dict = row.to_dict()
-            user_info = UserInfo(**row_dict)
-            if not user_info.Timestamp:
-                continue
-            user_infos.append(user_info)
-        return user_infos
-    except Exception:
-        return []
+    '''
+    get all account infos from api keys, parsed again only when the worksheet changed.
+    errors are raised so that a failed read is not taken for a sheet without accounts
+    '''
+    return sheet.read_worksheet(sheet.user_info_ws, parse_user_infos)
 
 
 def test() -> None:
@@ -1,20 +1,90 @@
 '''gets and validate account info from google sheet'''
 # pylint: disable=invalid-name
 import asyncio
+import functools
+import hashlib
 import logging
+import math
+import time
+from dataclasses import dataclass
+from types import ModuleType
+
+import ccxt.async_support as ccxt
 import gspread
 from ccxt.base.errors import AuthenticationError
+from ccxt.base.exchange import Exchange
 from tracker.core.gsheet import GSheet
 from tracker.account.get_user_info import UserInfo
-from tracker.account.create_account_infos import AccountInfo
+from tracker.account.create_account_infos import AccountInfo, create_account_infos
+from tracker.connector.ccxt.rate_limiter import VALIDATION_PRIORITY, RateLimitScheduler
 logger = logging.getLogger(__name__)
 
+VALIDATION_TTL = 24 * 60 * 60  # seconds before unchanged credentials are validated again
+MARKETS_TTL = 24 * 60 * 60  # seconds before the markets of an exchange are loaded again
+
+# exchange_name, api_key, hash of secret and passphrase, type, enable_rate_limit
+ValidationKey = tuple[str, str, str, str, bool]
+
+
+def get_validation_key(user_info: UserInfo) -> ValidationKey:
+    '''
+    identifies the credentials and exchange options of a row, the secret is only kept as a hash.
+    the exchange of a cached validation is reused so every option it is created with is part of it
+    '''
+    secret = f'{user_info.secret}:{user_info.passphrase}'
+    return (user_info.exchange_name, user_info.api_key,
+            hashlib.sha256(secret.encode()).hexdigest(),
+            user_info.type, user_info.enable_rate_limit)
+
 
-async def validate_account_info(account_info: AccountInfo) -> None:
-    '''loads the market and check if account can be validated'''
+class MarketCache:
+    '''markets of each exchange loaded once without credentials and shared by all accounts'''
+
+    def __init__(self, ttl: float = MARKETS_TTL) -> None:
+        self.ttl = ttl
+        self._markets: dict[str, tuple[float, dict, dict]] = {}  # loaded_at, markets, currencies
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    async def load(self, exchange: Exchange, scheduler: RateLimitScheduler = None) -> None:
+        '''set the markets of the exchange, loaded by the first account of the exchange'''
+        lock = self._locks.setdefault(exchange.id, asyncio.Lock())
+        async with lock:
+            if (exchange.id not in self._markets or
+                    time.monotonic() - self._markets[exchange.id][0] > self.ttl):
+                public = type(exchange)({'enableRateLimit': True})
+                try:
+                    if scheduler:
+                        markets = await scheduler.request(public, public.load_markets,
+                                                          priority=VALIDATION_PRIORITY)
+                    else:
+                        markets = await public.load_markets()
+                finally:
+                    await public.close()
+                self._markets[exchange.id] = (time.monotonic(), markets, public.currencies)
+                logger.info('loaded %s markets of %s', len(markets), exchange.id)
+        _, markets, currencies = self._markets[exchange.id]
+        exchange.set_markets(markets, currencies)
+
+
+async def validate_account_info(account_info: AccountInfo,
+                                markets: MarketCache,
+                                scheduler: RateLimitScheduler = None) -> bool:
+    '''
+    set the shared markets and check if account can be authenticated,
+    returns False if the check failed for another reason, e.g. rate limit or network errors,
+    then the validity of the account is left as is to be checked again later
+    '''
+    exchange = account_info.exchange
     try:
-        await account_info.exchange.load_markets()
-        await account_info.exchange.close()
+        await markets.load(exchange, scheduler)
+        # markets are public, the credentials are checked with a private request
+        check = exchange.fetch_balance
+        if not exchange.has.get('fetchBalance'):
+            check = functools.partial(exchange.load_markets, True)
+        if scheduler:
+            await scheduler.request(exchange, check, priority=VALIDATION_PRIORITY)
+        else:
+            await check()
 
     except AuthenticationError as error:
         account_info.user_info.valid = False
@@ -22,9 +92,18 @@ async def validate_account_info(account_info: AccountInfo) -> None:
         await account_info.exchange.close()
         logger.warning('%s: %s not able to be authenticated. skipping user',
                        account_info.user_info.display_name, error)
-        return
+        return True
+    except Exception as error:  #pylint: disable=broad-except
+        # a failure of one account must not stop the validation of the others
+        if account_info.user_info.valid is None:
+            account_info.user_info.reason = type(error).__name__
+        logger.warning('%s: %s not validated, retry on next update',
+                       account_info.user_info.display_name, error)
+        return False
 
     account_info.user_info.valid = True
+    account_info.user_info.reason = None
+    return True
 
 def check_duplicated_api(account_infos: list[AccountInfo]) -> None:
     '''check for duplicated api key and disable them'''
@@ -37,13 +116,91 @@ def check_duplicated_api(account_infos: list[AccountInfo]) -> None:
                            account_info.user_info.display_name)
         api_keys.append(account_info.user_info.api_key)
 
-async def validate_account_infos(account_infos: list[AccountInfo]) -> None:
+async def validate_account_infos(account_infos: list[AccountInfo],
+                                 scheduler: RateLimitScheduler = None,
+                                 markets: MarketCache = None) -> None:
     '''run all validation account task asynchronously'''
+    markets = markets or MarketCache()
     tasks = []
-    check_duplicated_api(account_infos)
     for account_info in account_infos:
-        tasks.append(validate_account_info(account_info))
+        tasks.append(validate_account_info(account_info, markets, scheduler))
     await asyncio.gather(*tasks)
+    # after validation so that it does not mark duplicates valid again
+    check_duplicated_api(account_infos)
+
+
+@dataclass
+class CachedValidation:
+    '''validation result of credentials and the exchange reused while they are unchanged'''
+    exchange: Exchange
+    valid: bool
+    reason: str
+    validated_at: float
+
+
+class ValidationCache:
+    '''
+    keeps the validation of each credentials for ttl seconds,
+    so that only new, changed or expired rows of the sheet are validated every update
+    '''
+
+    def __init__(self, ttl: float = VALIDATION_TTL, exchange_module: ModuleType = ccxt) -> None:
+        self.ttl = ttl
+        self.exchange_module = exchange_module
+        self.markets = MarketCache()
+        self._entries: dict[ValidationKey, CachedValidation] = {}
+
+    async def validate(self,
+                       user_infos: list[UserInfo],
+                       scheduler: RateLimitScheduler = None) -> list[AccountInfo]:
+        '''
+        account infos of the rows with their validity set,
+        unchanged rows reuse the exchange of their previous validation
+        '''
+        now = time.monotonic()
+        account_infos = []
+        pending: list[tuple[ValidationKey, AccountInfo]] = []
+        entries = self._entries
+        seen = set()
+        for user_info in user_infos:
+            key = get_validation_key(user_info)
+            seen.add(key)
+            entry = entries.get(key)
+            if entry is None:
+                created = create_account_infos([user_info], self.exchange_module)
+                if not created:
+                    continue
+                account_info = created[0]
+            else:
+                account_info = AccountInfo(user_info=user_info, exchange=entry.exchange)
+                user_info.valid = entry.valid
+                user_info.reason = entry.reason
+            if entry is None or now - entry.validated_at > self.ttl:
+                pending.append((key, account_info))
+            account_infos.append(account_info)
+
+        validated = await asyncio.gather(
+            *[validate_account_info(account_info, self.markets, scheduler)
+              for _, account_info in pending])
+        for (key, account_info), is_validated in zip(pending, validated):
+            previous = entries.get(key)
+            if not is_validated and previous is not None:
+                # the previous validation is kept and, as it is expired, retried next update
+                continue
+            # new credentials that failed to be checked keep their exchange and are retried
+            entries[key] = CachedValidation(account_info.exchange,
+                                            account_info.user_info.valid,
+                                            account_info.user_info.reason,
+                                            now if is_validated else -math.inf)
+        # entries are kept until they expire so that a failed or partial read of the sheet
+        # does not drop them, credentials removed from the sheet are dropped once expired
+        for key in [key for key, entry in entries.items()
+                    if key not in seen and now - entry.validated_at > self.ttl]:
+            del entries[key]
+        check_duplicated_api(account_infos)
+        logger.info('validated %s of %s accounts, %s to retry', sum(validated),
+                    len(account_infos), len(pending) - sum(validated))
+        return account_infos
 
 
 def update_validity_in_sheet(user_infos: list[UserInfo], ws: gspread.Worksheet) -> None:
@@ -0,0 +1,21 @@
+'''starts the archive of closed campaigns and old order books'''
+import asyncio
+
+from tracker.archive.archiver import Archiver
+from tracker.archive.get_config import ArchiveConfig
+from tracker.core.gsheet import GSheet
+from tracker.core.logger import setup_logging
+from tracker.database.database import DB_PUBLIC_CREDENTIAL_LOCATION, DataBase, DBConfig
+
+
+async def main() -> None:
+    '''starts the archive loop'''
+    logger = setup_logging()
+    logger.info('starting archive')
+    archiver = Archiver(DataBase(),
+                        DataBase(DBConfig.create(DB_PUBLIC_CREDENTIAL_LOCATION)),
+                        ArchiveConfig.create())
+    await archiver.start(GSheet.create())
+
+if __name__ == '__main__':
+    asyncio.run(main())
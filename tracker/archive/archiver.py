@@ -0,0 +1,217 @@
+'''
+Archives closed campaigns and old order books of the databases to partitioned parquet files.
+Trades are written to trades/campaign_id=/exchange_name=/date=/part-0.parquet and
+order books to order_book/exchange_id=/date=/<symbol>.parquet, sorted by time so that
+the statistics of the row groups skip the rows out of a time range.
+Files are written to a temporary name then renamed, so an archive can be run again
+after a failure, and the rows are deleted from the database only once their files are written.
+'''
+import asyncio
+import logging
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import yaml
+from sqlalchemy import and_, delete, func, select
+from tracker.archive.get_config import ArchiveConfig
+from tracker.archive.reader import ORDER_BOOKS, TRADES, ArchiveReader, to_date
+from tracker.bounty.bounty import BountyInfo, get_bounty_infos
+from tracker.core.async_io import run_database, run_sheet
+from tracker.core.gsheet import GSheet
+from tracker.database.database import DataBase
+from tracker.database.order_book_codec import OrderBookEncoder, read_order_books
+from tracker.database.order_book_orm_data import SQLOrderBookSnapshot
+from tracker.database.tracker_orm_data import SQLTrade
+
+logger = logging.getLogger(__name__)
+
+DAY = 24 * 60 * 60 * 1000
+# rows of trades read from the database at once
+CHUNK_SIZE = 100000
+# written in the directory of an archived campaign, ignored by the readers as it starts with _
+MANIFEST = '_manifest.yml'
+
+
+class Archiver:
+    '''writes the trades of closed campaigns and the order books of old days to the archive'''
+
+    def __init__(self,
+                 database: DataBase,
+                 public_database: DataBase,
+                 config: ArchiveConfig) -> None:
+        self.database = database
+        self.public_database = public_database
+        self.config = config
+        self.reader = ArchiveReader(config.root)
+
+    def write(self, directory: str, name: str, dataframe: pd.DataFrame) -> str:
+        '''write the dataframe as a parquet file of the directory, replacing it if it exists'''
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{name}.parquet')
+        # files starting with a dot are not read as part of the dataset
+        temporary_path = os.path.join(directory, f'.{name}.parquet.tmp')
+        pq.write_table(pa.Table.from_pandas(dataframe, preserve_index=False), temporary_path,
+                       row_group_size=self.config.row_group_size,
+                       compression=self.config.compression)
+        os.replace(temporary_path, path)
+        return path
+
+    def get_campaign_directory(self, campaign_id: int) -> str:
+        '''directory of the trades of the campaign'''
+        return os.path.join(self.config.root, TRADES, f'campaign_id={campaign_id}')
+
+    def is_campaign_archived(self, campaign_id: int) -> bool:
+        '''if every trade of the campaign has been written'''
+        return os.path.exists(os.path.join(self.get_campaign_directory(campaign_id), MANIFEST))
+
+    def write_trades(self, campaign_id: int, trades: pd.DataFrame) -> int:
+        '''write the trades of a day, the partition columns are only in the directory names'''
+        for (exchange_name, date), day_trades in trades.groupby(['exchange_name', 'date']):
+            directory = os.path.join(self.get_campaign_directory(campaign_id),
+                                     f'exchange_name={exchange_name}', f'date={date}')
+            self.write(directory, 'part-0', day_trades
+                       .drop(columns=['campaign_id', 'exchange_name', 'date'])
+                       .sort_values(['symbol', 'timestamp']))
+        return len(trades)
+
+    def archive_campaign(self, campaign_id: int) -> int:
+        '''write the trades of the campaign day by day, returns the number of trades'''
+        query = (select(SQLTrade.__table__)
+                 .where(SQLTrade.campaign_id == campaign_id)
+                 .order_by(SQLTrade.timestamp))
+        count = 0
+        pending = pd.DataFrame()
+        for chunk in self.database.iter_query(query, CHUNK_SIZE):
+            days, inverse = np.unique(chunk.timestamp.to_numpy() // DAY, return_inverse=True)
+            chunk['date'] = np.array([to_date(day * DAY) for day in days])[inverse]
+            pending = pd.concat([pending, chunk], ignore_index=True)
+            # trades are ordered by time so the days before the last one are complete
+            last_date = pending.date.iloc[-1]
+            count += self.write_trades(campaign_id, pending[pending.date != last_date])
+            pending = pending[pending.date == last_date]
+        count += self.write_trades(campaign_id, pending)
+
+        archived = len(self.reader.read_trades(campaign_id, columns=['timestamp']))
+        if archived != count:
+            raise ValueError(f'campaign {campaign_id}: {archived} trades archived of {count}')
+        with open(os.path.join(self.get_campaign_directory(campaign_id), MANIFEST), 'w') as file:
+            yaml.safe_dump({'campaign_id': campaign_id,
+                            'trades': count,
+                            'archived_at': int(time.time() * 1000)}, file)
+        logger.info('campaign %s archived with %s trades', campaign_id, count)
+        if self.config.delete_archived:
+            with self.database.engine.begin() as connection:
+                connection.execute(delete(SQLTrade).where(SQLTrade.campaign_id == campaign_id))
+            logger.info('campaign %s trades deleted from the database', campaign_id)
+        return count
+
+    def archive_campaigns(self, bounty_infos: list[BountyInfo], now: int = None) -> list[int]:
+        '''archive the campaigns ended for the retention, returns the campaigns archived'''
+        now = now or int(time.time() * 1000)
+        retention = int(self.config.campaign_retention * 1000)
+        archived = []
+        for bounty_info in bounty_infos:
+            if (bounty_info.end_timestamp + retention < now and
+                    not self.is_campaign_archived(bounty_info.campaign_id)):
+                self.archive_campaign(bounty_info.campaign_id)
+                archived.append(bounty_info.campaign_id)
+        return archived
+
+    def archive_order_book_day(self, exchange_id: str, symbol: str, day_start: int) -> int:
+        '''
+        write the snapshots of a market day, the first one is encoded again as a keyframe
+        if it is delta encoded so that the file is decoded alone, returns the number of snapshots
+        '''
+        market = and_(SQLOrderBookSnapshot.exchange_id == exchange_id,
+                      SQLOrderBookSnapshot.symbol == symbol)
+        snapshots = self.public_database.query_sql(
+            select(SQLOrderBookSnapshot.timestamp, SQLOrderBookSnapshot.keyframe,
+                   SQLOrderBookSnapshot.bid_count, SQLOrderBookSnapshot.ask_count,
+                   SQLOrderBookSnapshot.data)
+            .where(market,
+                   SQLOrderBookSnapshot.timestamp >= day_start,
+                   SQLOrderBookSnapshot.timestamp < day_start + DAY)
+            .order_by(SQLOrderBookSnapshot.timestamp))
+        if snapshots.empty:
+            return 0
+        if not snapshots.keyframe[0]:
+            first_time = int(snapshots.timestamp[0])
+            _, book = next(read_order_books(self.public_database, exchange_id, symbol,
+                                            first_time, first_time))
+            data, _, _ = OrderBookEncoder().encode(book.bids.tolist(), book.asks.tolist())
+            snapshots.loc[0, ['keyframe', 'data']] = [True, data]
+        snapshots.insert(0, 'symbol', symbol)
+        directory = os.path.join(self.config.root, ORDER_BOOKS, f'exchange_id={exchange_id}',
+                                 f'date={to_date(day_start)}')
+        self.write(directory, symbol.replace('/', '-'), snapshots)
+        return len(snapshots)
+
+    def archive_order_books(self, now: int = None) -> int:
+        '''
+        archive the days of every market older than the retention, returns the number of days.
+        the rows are deleted up to the keyframe of the first snapshot kept
+        '''
+        now = now or int(time.time() * 1000)
+        cutoff = (now - int(self.config.order_book_retention * 1000)) // DAY * DAY
+        markets = self.public_database.query_sql(
+            select(SQLOrderBookSnapshot.exchange_id, SQLOrderBookSnapshot.symbol,
+                   func.min(SQLOrderBookSnapshot.timestamp).label('timestamp'))
+            .group_by(SQLOrderBookSnapshot.exchange_id, SQLOrderBookSnapshot.symbol))
+        days = 0
+        for exchange_id, symbol, first_time in markets.itertuples(index=False):
+            for day_start in range(int(first_time) // DAY * DAY, cutoff, DAY):
+                path = os.path.join(self.config.root, ORDER_BOOKS, f'exchange_id={exchange_id}',
+                                    f'date={to_date(day_start)}',
+                                    f'{symbol.replace("/", "-")}.parquet')
+                if not os.path.exists(path):
+                    self.archive_order_book_day(exchange_id, symbol, day_start)
+                    days += 1
+            if self.config.delete_archived:
+                self.delete_order_books(exchange_id, symbol, cutoff)
+        logger.info('archived %s days of order books before %s', days, to_date(cutoff))
+        return days
+
+    def delete_order_books(self, exchange_id: str, symbol: str, cutoff: int) -> None:
+        '''delete the snapshots before cutoff, the keyframe of the snapshots kept is kept'''
+        market = and_(SQLOrderBookSnapshot.exchange_id == exchange_id,
+                      SQLOrderBookSnapshot.symbol == symbol)
+        keyframe_time = self.public_database.query_sql(
+            select(func.max(SQLOrderBookSnapshot.timestamp).label('timestamp'))
+            .where(market, SQLOrderBookSnapshot.keyframe,
+                   SQLOrderBookSnapshot.timestamp <= cutoff)).timestamp[0]
+        if pd.isnull(keyframe_time):
+            return
+        with self.public_database.engine.begin() as connection:
+            connection.execute(delete(SQLOrderBookSnapshot).where(
+                market, SQLOrderBookSnapshot.timestamp < min(int(keyframe_time), cutoff)))
+
+    async def start(self, g_sheet: GSheet) -> None:
+        '''archive closed campaigns and old order books every update interval'''
+        while True:
+            try:
+                bounty_infos = await run_sheet(get_bounty_infos, g_sheet)
+                await run_database(self.archive_campaigns, list(bounty_infos.values()))
+                await run_database(self.archive_order_books)
+            except Exception as error:  #pylint: disable=broad-except
+                logger.exception('%s: retry in 5min', error)
+                await asyncio.sleep(300)
+                continue
+            await asyncio.sleep(self.config.update_interval)
+
+
+def test() -> None:
+    '''module test'''
+    # pylint: disable=import-outside-toplevel
+    from tracker.database.database import DB_PUBLIC_CREDENTIAL_LOCATION, DBConfig
+    archiver = Archiver(DataBase(), DataBase(DBConfig.create(DB_PUBLIC_CREDENTIAL_LOCATION)),
+                        ArchiveConfig.create())
+    print(archiver.archive_campaigns(list(get_bounty_infos(GSheet.create()).values())))
+    print(archiver.archive_order_books())
+
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,37 @@
+'''get archive config'''
+import logging
+from dataclasses import dataclass
+
+from tracker.core.utils import load_yml
+
+logger = logging.getLogger(__name__)
+
+CONFIG_LOCATION = './config/archive_config.yml'
+
+
+@dataclass
+class ArchiveConfig:
+    '''defines the config file attributes'''
+    root: str = './data/archive'  # directory of the parquet datasets
+    campaign_retention: float = 604800  # seconds after its end before a campaign is archived
+    order_book_retention: float = 2592000  # seconds of order books kept in the database
+    delete_archived: bool = False  # delete archived rows from the database
+    row_group_size: int = 100000  # rows of a parquet row group, the unit of predicate pushdown
+    compression: str = 'zstd'
+    update_interval: float = 86400  # seconds between archives
+
+    @classmethod
+    def create(cls, config_file_location=CONFIG_LOCATION) -> 'ArchiveConfig':
+        '''provides a default method to create archive config class'''
+        config = load_yml(config_file_location)
+        return cls(**config)
+
+
+def test() -> None:
+    '''module test'''
+    config = ArchiveConfig.create()
+    print(config)
+
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,120 @@
+'''
+Reads the parquet archive with predicate and column pushdown: partitions not matching the filters
+are not listed, row groups are skipped by the statistics of their columns
+and only the columns asked are read, from memory mapped files.
+usage: python -m tracker.archive.reader --campaign-id 9
+'''
+import argparse
+import os
+import time
+from typing import Iterator, Optional
+
+import pandas as pd
+import pyarrow.parquet as pq
+from tracker.archive.get_config import ArchiveConfig
+from tracker.database.order_book_codec import DecodedOrderBook, OrderBookDecoder
+
+# datasets of the archive root, partitioned with hive directories, e.g. campaign_id=9
+TRADES = 'trades'
+ORDER_BOOKS = 'order_book'
+# (column, operator, value) as accepted by pyarrow, partition columns included
+Filters = list[tuple[str, str, object]]
+
+
+def to_date(timestamp: int) -> str:
+    '''utc date partition of a timestamp in ms'''
+    return time.strftime('%Y-%m-%d', time.gmtime(timestamp / 1000))
+
+
+def get_time_filters(start_time: int = None, end_time: int = None) -> Filters:
+    '''filters of a time range in ms, the date filters prune the partitions'''
+    filters = []
+    if start_time is not None:
+        filters += [('date', '>=', to_date(start_time)), ('timestamp', '>=', start_time)]
+    if end_time is not None:
+        filters += [('date', '<=', to_date(end_time)), ('timestamp', '<=', end_time)]
+    return filters
+
+
+class ArchiveReader:
+    '''reads the datasets of the archive root'''
+
+    def __init__(self, root: str = ArchiveConfig.root) -> None:
+        self.root = root
+
+    def read(self,
+             dataset: str,
+             columns: list[str] = None,
+             filters: Filters = None) -> pd.DataFrame:
+        '''rows of the dataset matching all filters, empty if nothing is archived'''
+        path = os.path.join(self.root, dataset)
+        if not os.path.isdir(path):
+            return pd.DataFrame(columns=columns)
+        table = pq.read_table(path, columns=columns, filters=filters or None,
+                              partitioning='hive', memory_map=True)
+        return table.to_pandas()
+
+    def read_trades(self,
+                    campaign_id: int = None,
+                    exchange_name: str = None,
+                    symbol: str = None,
+                    start_time: int = None,
+                    end_time: int = None,
+                    columns: list[str] = None) -> pd.DataFrame:
+        '''trades with the columns of SQLTrade, all campaigns and markets if not provided'''
+        filters = get_time_filters(start_time, end_time)
+        for column, value in (('campaign_id', campaign_id),
+                              ('exchange_name', exchange_name),
+                              ('symbol', symbol)):
+            if value is not None:
+                filters.append((column, '=', value))
+        return self.read(TRADES, columns, filters)
+
+    def read_order_books(self,
+                         exchange_id: str,
+                         symbol: str,
+                         start_time: int,
+                         end_time: int,
+                         depth: int = None) -> Iterator[tuple[int, DecodedOrderBook]]:
+        '''
+        yields (timestamp, order book) of a market between start and end time in ms,
+        every archived day starts with a keyframe so decoding starts at the day of start time
+        '''
+        day_start = int(pd.Timestamp(to_date(start_time), tz='UTC').timestamp() * 1000)
+        snapshots = self.read(ORDER_BOOKS, ['timestamp', 'data'],
+                              [('exchange_id', '=', exchange_id), ('symbol', '=', symbol)] +
+                              get_time_filters(day_start, end_time))
+        decoder = OrderBookDecoder()
+        for timestamp, data in snapshots.sort_values('timestamp').itertuples(index=False):
+            book = decoder.decode(data)
+            if timestamp >= start_time:
+                yield int(timestamp), book.truncate(depth)
+
+    def get_archived_campaign_ids(self) -> list[int]:
+        '''campaigns with archived trades'''
+        path = os.path.join(self.root, TRADES)
+        if not os.path.isdir(path):
+            return []
+        return sorted(int(name.split('=')[1]) for name in os.listdir(path)
+                      if name.startswith('campaign_id='))
+
+
+def main() -> None:
+    '''print the archived trades of a campaign'''
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--root', default=ArchiveConfig.create().root)
+    parser.add_argument('--campaign-id', type=int)
+    parser.add_argument('--columns', nargs='*')
+    args = parser.parse_args()
+    reader = ArchiveReader(args.root)
+    if args.campaign_id is None:
+        print('archived campaigns:', reader.get_archived_campaign_ids())
+        return
+    started = time.perf_counter()
+    trades = reader.read_trades(args.campaign_id, columns=args.columns)
+    print(trades)
+    print(f'read {len(trades)} trades in {time.perf_counter() - started:.2f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -6,7 +6,9 @@ from dataclasses import dataclass
 
 import pandas as pd
 import requests
+from tracker.core.async_io import run_sheet
 from tracker.core.gsheet import GSheet
+from tracker.core.metrics import SHEET_SECONDS
 
 logger = logging.getLogger(__name__)
 
@@ -26,38 +28,31 @@ class BountyInfo:
     active: bool
 
 
+def parse_bounty_infos(df: pd.DataFrame) -> dict[int, BountyInfo]:
+    '''all bounty infos of the campaign worksheet by campaign_id'''
+    logger.debug('bounty df: %s', df)
+    return {row['campaign_id']: BountyInfo(**row) for row in df.to_dict('records')}
+
+
+def get_bounty_infos(sheet: GSheet) -> dict[int, BountyInfo]:
+    '''bounty infos by campaign_id, parsed again only when the campaign worksheet changed'''
+    return sheet.read_worksheet(sheet.campaigns_ws, parse_bounty_infos)
+
+
 def get_active_bounty_infos(sheet: GSheet) -> list[BountyInfo]:
     '''get active bounty infos from campaign setup'''
-    bounty_infos = []
-    ws = sheet.campaigns_ws
-    df = sheet.get_worksheet_as_dataframe(ws)
-    # replace nan with none to convert to dictionary
-    logger.debug('bounty df: %s', df)
-    df = df.replace({pd.NA: None})
-    for _, row in df.iterrows():
-        if not row['active']:
-            continue
-        row_dict = row.to_dict()
-        bounty_info = BountyInfo(**row_dict)
-        bounty_infos.append(bounty_info)
+    bounty_infos = [bounty_info for bounty_info in get_bounty_infos(sheet).values()
+                    if bounty_info.active]
     logger.info('bounty_info: %s', bounty_infos)
     return bounty_infos
 
 
 def get_bounty_info_from_campaign_id(sheet: GSheet, campaign_id: int) -> BountyInfo:
     '''get bounty info from campaign id from campaign worksheet'''
-    ws = sheet.campaigns_ws
-    df = sheet.get_worksheet_as_dataframe(ws)
-    # replace nan with none to convert to dictionary
-    logger.debug('bounty df: %s', df)
-    df = df.replace({pd.NA: None})
-    # TODO: To vectorize
-    for _, row in df.iterrows():
-        if row['campaign_id'] == campaign_id:
-            row_dict = row.to_dict()
-            bounty_info = BountyInfo(**row_dict)
-            return bounty_info
-    raise KeyError('Value not found')
+    bounty_infos = get_bounty_infos(sheet)
+    if campaign_id not in bounty_infos:
+        raise KeyError('Value not found')
+    return bounty_infos[campaign_id]
 
 
 class Bounty:
@@ -77,13 +72,18 @@ class Bounty:
         '''start a loop to check for new bounty every 10 minutes'''
         while True:
             try:
-                self.get_active_bounty_infos()
+                with SHEET_SECONDS.time('read_bounty_infos'):
+                    await run_sheet(self.get_active_bounty_infos)
                 await asyncio.sleep(600)
             except requests.exceptions.ReadTimeout as error:
                 logger.error('%s encountered, retrying in 10min', error)
                 await asyncio.sleep(600)
             except KeyboardInterrupt:
                 break
+            except Exception as error:
+                # the last active bounties are kept until the sheet can be read again
+                logger.error('%s: %s encountered, retrying in 10min', type(error).__name__, error)
+                await asyncio.sleep(600)
 
 
 def test() -> None:
@@ -5,6 +5,7 @@ and commits to database as a standalone service
 
 import logging
 import asyncio
+import time
 from abc import ABC, abstractmethod
 from typing import Protocol
 
@@ -18,6 +19,14 @@ from sqlalchemy.orm.decl_api import DeclarativeMeta
 from tracker.account.create_account_infos import AccountInfo
 from tracker.bounty.bounty import BountyInfo
 from tracker.connector.ccxt.get_config import CCXTConfig
+from tracker.connector.ccxt.rate_limiter import RateLimitScheduler
+from tracker.core.async_io import run_database
+from tracker.core.metrics import (DATABASE_SECONDS,
+                                  FETCH_ERRORS,
+                                  FETCH_LAST_SUCCESS,
+                                  FETCH_LOOPS,
+                                  FETCH_SECONDS,
+                                  ROWS_UPSERTED)
 logger = logging.getLogger(__name__)
 
 
@@ -27,10 +36,32 @@ class DataBase(Protocol):
     def commit_task_list_to_sql(self, task: list[DeclarativeMeta]) -> None:
         '''commit list of tasks to database'''
 
+    def upsert_rows(self, SQL_class: DeclarativeMeta, rows: list[dict]) -> None:  # pylint: disable=invalid-name
+        '''insert or update rows of dictionary into table of orm class'''
+
     def query_sql(self, sql_query: str, **kwargs) -> pd.DataFrame:
         '''get query from database'''
 
 
+class AccountSource(Protocol):
+    '''refreshes the validated accounts, e.g. AccountValidator'''
+    account_infos: list[AccountInfo]
+
+
+class BountySource(Protocol):
+    '''refreshes the active bounties, e.g. Bounty'''
+    info: list[BountyInfo]
+
+
+AccountKey = tuple[str, str]  # exchange_name, api_key
+TaskKey = tuple[AccountKey, int]  # account key, campaign_id
+
+
+def get_account_key(account_info: AccountInfo) -> AccountKey:
+    '''identifies an account across validations which create new account infos'''
+    return account_info.user_info.exchange_name, account_info.user_info.api_key
+
+
 class BaseFetcher(ABC):
     '''Defines the base methods required to fetch data from server using CCXT'''
 
@@ -39,29 +70,61 @@ class BaseFetcher(ABC):
             account_infos: list[AccountInfo],
             bounty_infos: list[BountyInfo],
             config: CCXTConfig,
-            database: DataBase) -> None:
+            database: DataBase,
+            scheduler: RateLimitScheduler = None,
+            account_source: AccountSource = None,
+            bounty_source: BountySource = None) -> None:
         self._account_infos = account_infos
         self._bounty_infos = bounty_infos
         self._config = config
         self._database = database
+        # requests are only throttled by each exchange instance if no scheduler is provided
+        self._scheduler = scheduler
+        # accounts and bounties are followed from the sources if provided
+        self._account_source = account_source
+        self._bounty_source = bounty_source
+        self._accounts: dict[AccountKey, AccountInfo] = {}
+        self._bounties: dict[int, BountyInfo] = {}
+        self._tasks: dict[TaskKey, asyncio.Task] = {}
+        self._reconfigure_lock = asyncio.Lock()
 
-    def commit_task_list_to_sql(self, task: list[DeclarativeMeta]):
-        '''commit list of tasks to database'''
-        self._database.commit_task_list_to_sql(task)
+    async def commit_task_list_to_sql(self, task: list[DeclarativeMeta]):
+        '''commit list of tasks to database without blocking the event loop'''
+        with DATABASE_SECONDS.time('commit'):
+            await run_database(self._database.commit_task_list_to_sql, task)
 
-    def query_sql(self, sql_query: str, **kwargs) -> pd.DataFrame:
-        '''query sql from database'''
-        return self._database.query_sql(sql_query, **kwargs)
+    async def upsert_rows(self, SQL_class: DeclarativeMeta, rows: list[dict]):  # pylint: disable=invalid-name
+        '''insert or update rows of dictionary into database without blocking the event loop'''
+        with DATABASE_SECONDS.time('upsert'):
+            await run_database(self._database.upsert_rows, SQL_class, rows)
+        ROWS_UPSERTED.inc(SQL_class.__tablename__, amount=len(rows))
+
+    async def query_sql(self, sql_query: str, **kwargs) -> pd.DataFrame:
+        '''query sql from database without blocking the event loop'''
+        with DATABASE_SECONDS.time('query'):
+            return await run_database(self._database.query_sql, sql_query, **kwargs)
 
     @abstractmethod
     async def fetch(self, account_info: AccountInfo, bounty_info: BountyInfo) -> None:
         '''fetch method for ccxt defines here'''
 
+    async def fetch_and_record(self, account_info: AccountInfo, bounty_info: BountyInfo) -> None:
+        '''fetch and record its error or the time of its success in the metrics'''
+        exchange_name = account_info.user_info.exchange_name
+        labels = (exchange_name, account_info.user_info.display_name, bounty_info.campaign_id)
+        try:
+            with FETCH_SECONDS.time(exchange_name):
+                await self.fetch(account_info, bounty_info)
+        except Exception as error:
+            FETCH_ERRORS.inc(exchange_name, type(error).__name__)
+            raise
+        FETCH_LAST_SUCCESS.set(time.time(), *labels)
+
     async def loop(self, account_info: AccountInfo, bounty_info: BountyInfo) -> asyncio.Future:
         '''starts looping the fetch method for account info indefinitely'''
         while True:
             try:
-                await self.fetch(account_info, bounty_info)
+                await self.fetch_and_record(account_info, bounty_info)
                 await asyncio.sleep(self._config.update_interval)
             except OnMaintenance as error:
                 logger.warning(
@@ -69,9 +132,12 @@ class BaseFetcher(ABC):
                 )
                 await asyncio.sleep(600)
             except RateLimitExceeded as error:
+                delay = 300
+                if self._scheduler:
+                    delay = self._scheduler.get_backoff(account_info.exchange)
                 logger.warning(
-                    '%s rate limit exceeded waiting additional 5min', error)
-                await asyncio.sleep(300)
+                    '%s rate limit exceeded waiting additional %ss', error, delay)
+                await asyncio.sleep(delay)
             except (ExchangeError, InvalidNonce, RequestTimeout, TimeoutError) as error:
                 logger.warning(
                     '%s waiting additional 5min', error)
@@ -84,14 +150,102 @@ class BaseFetcher(ABC):
                 logger.exception('Unexpected error encountered %s wait additional 5min', error)
                 await asyncio.sleep(300)
 
+    def start_task(self, account_key: AccountKey, campaign_id: int) -> None:
+        '''start the fetch loop of an account and bounty pair'''
+        self._tasks[account_key, campaign_id] = asyncio.create_task(
+            self.loop(self._accounts[account_key], self._bounties[campaign_id]))
+
+    async def cancel_tasks(self, task_keys: list[TaskKey]) -> None:
+        '''cancel the fetch loops and wait until they are cancelled'''
+        tasks = [self._tasks.pop(task_key) for task_key in task_keys]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for account_key, campaign_id in task_keys:
+            FETCH_LAST_SUCCESS.remove(account_key[0],
+                                      self._accounts[account_key].user_info.display_name,
+                                      campaign_id)
+        FETCH_LOOPS.set(len(self._tasks))
+
+    async def close_account(self, account_info: AccountInfo) -> None:
+        '''close connections of an account that is not fetched anymore'''
+        await account_info.exchange.close()
+
+    async def reconfigure(self,
+                          account_infos: list[AccountInfo],
+                          bounty_infos: list[BountyInfo]) -> None:
+        '''
+        diff the account and bounty pairs with the running fetch loops,
+        loops of removed or changed pairs are cancelled and new pairs are started.
+        unchanged accounts keep their exchange and cursor so nothing is fetched again
+        '''
+        async with self._reconfigure_lock:
+            await self._reconfigure(account_infos, bounty_infos)
+
+    async def _reconfigure(self,
+                           account_infos: list[AccountInfo],
+                           bounty_infos: list[BountyInfo]) -> None:
+        accounts = {get_account_key(account_info): account_info
+                    for account_info in account_infos}
+        bounties = {bounty_info.campaign_id: bounty_info for bounty_info in bounty_infos}
+        removed_accounts = [
+            account_key for account_key, account_info in self._accounts.items()
+            if account_key not in accounts or
+            accounts[account_key].user_info != account_info.user_info]
+        removed_bounties = [
+            campaign_id for campaign_id, bounty_info in self._bounties.items()
+            if bounties.get(campaign_id) != bounty_info]
+        cancelled = [task_key for task_key in self._tasks
+                     if task_key[0] in removed_accounts or task_key[1] in removed_bounties]
+        await self.cancel_tasks(cancelled)
+        # a changed row with the same credentials gets the exchange of the cached validation
+        exchanges = {id(account_info.exchange) for account_info in accounts.values()}
+        for account_key in removed_accounts:
+            account_info = self._accounts.pop(account_key)
+            if id(account_info.exchange) not in exchanges:
+                await self.close_account(account_info)
+        for campaign_id in removed_bounties:
+            del self._bounties[campaign_id]
+
+        for account_key, account_info in accounts.items():
+            self._accounts.setdefault(account_key, account_info)
+        self._bounties.update(bounties)
+        started = 0
+        for account_key in self._accounts:
+            for campaign_id in self._bounties:
+                if (account_key, campaign_id) not in self._tasks:
+                    self.start_task(account_key, campaign_id)
+                    started += 1
+        self._account_infos = list(self._accounts.values())
+        self._bounty_infos = list(self._bounties.values())
+        FETCH_LOOPS.set(len(self._tasks))
+        if started or cancelled:
+            logger.info('fetch loops started: %s, cancelled: %s, running: %s',
+                        started, len(cancelled), len(self._tasks))
+
+    def get_source_infos(self) -> tuple[list[AccountInfo], list[BountyInfo]]:
+        '''
+        latest accounts and bounties of the sources,
+        current ones without a source or if the source has not been read yet
+        '''
+        account_infos = self._account_infos
+        bounty_infos = self._bounty_infos
+        if self._account_source and self._account_source.account_infos is not None:
+            account_infos = self._account_source.account_infos
+        if self._bounty_source and self._bounty_source.info is not None:
+            bounty_infos = self._bounty_source.info
+        return account_infos, bounty_infos
+
     async def start(self) -> None:
-        '''start the loop for all account info'''
-        tasks = []
-        for account_info in self._account_infos:
-            for bounty_info in self._bounty_infos:
-                tasks.append(asyncio.create_task(
-                    self.loop(account_info, bounty_info)))
-        await asyncio.gather(*tasks)
+        '''start the loop for all account info then follow the changes of the sources'''
+        try:
+            await self.reconfigure(self._account_infos, self._bounty_infos)
+            while True:
+                await asyncio.sleep(self._config.reconfigure_interval)
+                if self._account_source or self._bounty_source:
+                    await self.reconfigure(*self.get_source_infos())
+        finally:
+            await self.cancel_tasks(list(self._tasks))
 
     async def close_all(self) -> None:
         '''close connections to all accountexchange'''
@@ -2,10 +2,13 @@
 # pylint: disable=[invalid-name, too-many-instance-attributes, too-few-public-methods]
 import logging
 import json
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, fields
+from functools import lru_cache
 import time
-from typing import Optional, Protocol, Tuple
+from datetime import datetime
+from typing import Any, Callable, Optional, Protocol, Tuple
 
+import numpy as np
 from sqlalchemy.orm.decl_api import DeclarativeMeta
 
 logger = logging.getLogger(__name__)
@@ -26,6 +29,12 @@ class BountyInfo(Protocol):
     campaign_id: int
 
 
+@lru_cache(maxsize=None)
+def get_column_keys(SQL_class: DeclarativeMeta) -> frozenset[str]:
+    '''column names of the orm class, computed once per class'''
+    return frozenset(SQL_class.__table__.columns.keys())
+
+
 @dataclass
 class CCXTBase:
     '''Base implementation for all CCXT Data Class'''
@@ -44,7 +53,7 @@ class CCXTBase:
             sql_dict.update(asdict(bounty_info))
         sql_dict.update(asdict(self))
         orm_dict = {}
-        keys = SQL_class.__table__.columns.keys()
+        keys = get_column_keys(SQL_class)
         for key, value in sql_dict.items():
             if key in keys:
                 if serialize_list and isinstance(value, list):
@@ -96,3 +105,65 @@ class CCXTOrderBook(CCXTBase):
         self = cls(**order_book)
         self.exchange_id = exchange_id
         return self
+
+
+def timestamp_to_datetime(record: dict) -> datetime:
+    '''utc datetime of the timestamp in ms of the ccxt record'''
+    return datetime.utcfromtimestamp(record['timestamp'] / 1000)
+
+
+# trade datetime is stored as a timestamp type instead of the iso string of ccxt
+TRADE_CONVERTERS = {'datetime': timestamp_to_datetime}
+
+
+class RowConverter:
+    '''
+    converts a page of ccxt dictionaries into row dictionaries of an orm class in one pass,
+    skipping the data class and orm object created per record by to_orm_class
+    '''
+
+    def __init__(self,
+                 SQL_class: DeclarativeMeta,
+                 data_class: type = CCXTTrade,
+                 user_info: UserInfo = None,
+                 bounty_info: BountyInfo = None,
+                 converters: dict[str, Callable[[dict], Any]] = None) -> None:
+        keys = get_column_keys(SQL_class)
+        # column: function of the record returning the column value
+        self.converters = converters or {}
+        data_keys = {data_field.name for data_field in fields(data_class)}
+        # columns from the ccxt record, the rest are constant for the account and bounty
+        self.record_keys = [key for key in keys if key in data_keys]
+        self.constants = {}
+        for info in (user_info, bounty_info):
+            if info is None:
+                continue
+            for key in keys:
+                if key not in data_keys and hasattr(info, key):
+                    self.constants[key] = getattr(info, key)
+
+    def convert(self,
+                records: list[dict],
+                start_timestamp: int = None,
+                end_timestamp: int = None) -> list[dict]:
+        '''convert records within the timestamp window (inclusive) into row dictionaries'''
+        if not records:
+            return []
+        if start_timestamp is not None or end_timestamp is not None:
+            timestamps = np.fromiter((record['timestamp'] for record in records),
+                                     dtype=np.int64, count=len(records))
+            mask = np.ones(len(records), dtype=bool)
+            if start_timestamp is not None:
+                mask &= timestamps >= start_timestamp
+            if end_timestamp is not None:
+                mask &= timestamps <= end_timestamp
+            records = [records[i] for i in np.flatnonzero(mask)]
+        rows = []
+        for record in records:
+            row = self.constants.copy()
+            for key in self.record_keys:
+                row[key] = record.get(key)
+            for key, converter in self.converters.items():
+                row[key] = converter(record)
+            rows.append(row)
+        return rows
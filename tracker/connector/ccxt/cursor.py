@@ -0,0 +1,135 @@
+'''
+Keeps the high water mark of trades fetched per (exchange, api_key, campaign_id, market)
+so that the fetcher resumes from the last fetched time instead of the campaign start
+'''
+import logging
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+import pandas as pd
+from tracker.account.create_account_infos import AccountInfo
+from tracker.bounty.bounty import BountyInfo
+from tracker.connector.ccxt.base_fetcher import DataBase
+from tracker.database.tracker_orm_data import SQLTradeCursor
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FetchWindow:
+    '''time range in ms to be fetched for an account market'''
+    start_time: int
+    end_time: int
+    full_scan: bool
+
+
+@dataclass
+class TradeCursor:
+    '''last position fetched for an account market'''
+    exchange_name: str
+    api_key: str
+    campaign_id: int
+    market: str
+    fetched_until: Optional[int] = None
+    last_timestamp: Optional[int] = None
+    last_id: Optional[str] = None
+    last_full_scan: Optional[int] = None
+
+    def __post_init__(self) -> None:
+        # nullable integer columns are read back as float by pandas
+        for name in ('campaign_id', 'fetched_until', 'last_timestamp', 'last_full_scan'):
+            value = getattr(self, name)
+            if value is not None:
+                setattr(self, name, int(value))
+
+    @property
+    def key(self) -> tuple[str, str, int, str]:
+        '''primary key of the cursor'''
+        return (self.exchange_name, self.api_key, self.campaign_id, self.market)
+
+    def to_orm_class(self) -> SQLTradeCursor:
+        '''convert cursor to orm class'''
+        return SQLTradeCursor(**asdict(self))
+
+
+class CursorStore:
+    '''stores trade cursors in memory, they are persisted by the fetcher after the trades'''
+
+    def __init__(self,
+                 cursors: dict[tuple, TradeCursor] = None,
+                 overlap: float = 3600,
+                 full_rescan_interval: float = 86400,
+                 full_rescan: bool = False) -> None:
+        self._cursors = cursors or {}
+        self.overlap = overlap
+        self.full_rescan_interval = full_rescan_interval
+        self.full_rescan = full_rescan
+
+    @classmethod
+    def create(cls,
+               database: DataBase,
+               overlap: float = 3600,
+               full_rescan_interval: float = 86400,
+               full_rescan: bool = False) -> 'CursorStore':
+        '''load all cursors saved in the database'''
+        dataframe = database.query_sql(
+            f'SELECT * FROM {SQLTradeCursor.__tablename__}')
+        # replace nan with none to convert to dictionary
+        dataframe = dataframe.astype(object).where(pd.notnull(dataframe), None)
+        cursors = {}
+        for row_dict in dataframe.to_dict('records'):
+            cursor = TradeCursor(**row_dict)
+            cursors[cursor.key] = cursor
+        logger.info('loaded %s trade cursors', len(cursors))
+        return cls(cursors, overlap, full_rescan_interval, full_rescan)
+
+    def get(self, account_info: AccountInfo, bounty_info: BountyInfo) -> TradeCursor:
+        '''get the cursor of the account market, creates an empty cursor if not found'''
+        user_info = account_info.user_info
+        key = (user_info.exchange_name, user_info.api_key,
+               bounty_info.campaign_id, bounty_info.market)
+        if key not in self._cursors:
+            self._cursors[key] = TradeCursor(*key)
+        return self._cursors[key]
+
+    def get_window(self,
+                   cursor: TradeCursor,
+                   bounty_info: BountyInfo,
+                   now: int) -> Optional[FetchWindow]:
+        '''
+        returns the time range to fetch, starting from the last fetched time minus overlap.
+        fetch from campaign start if it is a full rescan.
+        returns None if the campaign has ended and has been fully rescanned after the end.
+        '''
+        overlap = int(self.overlap * 1000)
+        campaign_closed = now > bounty_info.end_timestamp + overlap
+        if (campaign_closed and cursor.last_full_scan and
+                cursor.last_full_scan > bounty_info.end_timestamp + overlap):
+            return None
+        full_scan = (self.full_rescan or campaign_closed or
+                     cursor.fetched_until is None or
+                     cursor.last_full_scan is None or
+                     (self.full_rescan_interval and
+                      now - cursor.last_full_scan >= self.full_rescan_interval * 1000))
+        start_time = bounty_info.start_timestamp
+        if not full_scan:
+            start_time = max(start_time, cursor.fetched_until - overlap)
+        return FetchWindow(start_time, bounty_info.end_timestamp, full_scan)
+
+    @staticmethod
+    def update_last_trade(cursor: TradeCursor, trades: list[dict]) -> TradeCursor:
+        '''keep the latest trade seen in a page of trades'''
+        if trades:
+            latest_trade = max(trades, key=lambda trade: trade['timestamp'])
+            if latest_trade['timestamp'] >= (cursor.last_timestamp or 0):
+                cursor.last_timestamp = latest_trade['timestamp']
+                cursor.last_id = latest_trade['id']
+        return cursor
+
+    @staticmethod
+    def advance(cursor: TradeCursor, window: FetchWindow, now: int) -> TradeCursor:
+        '''move the cursor to now after all trades in the window are fetched'''
+        cursor.fetched_until = max(now, cursor.fetched_until or 0)
+        if window.full_scan:
+            cursor.last_full_scan = now
+        return cursor
@@ -3,12 +3,26 @@ Fetch Trades from Exchange using CCXT
 '''
 import asyncio
 import logging
+import time
+from typing import AsyncIterator, Protocol
 
 from tracker.account.create_account_infos import AccountInfo
 from tracker.bounty.bounty import BountyInfo
-from tracker.connector.ccxt.base_fetcher import BaseFetcher
-from tracker.connector.ccxt.ccxt_data import CCXTTrade
-from tracker.connector.ccxt.pagination import pagination
+from tracker.connector.ccxt.base_fetcher import (AccountSource,
+                                                 BaseFetcher,
+                                                 BountySource,
+                                                 DataBase)
+from tracker.connector.ccxt.ccxt_data import CCXTTrade, RowConverter, TRADE_CONVERTERS
+from tracker.connector.ccxt.cursor import CursorStore, FetchWindow
+from tracker.connector.ccxt.get_config import CCXTConfig
+from tracker.connector.ccxt.pagination import (PAGINATION_METHODS,
+                                               SLICEABLE_METHODS,
+                                               collect_pages,
+                                               iter_pagination,
+                                               iter_pagination_by_time_slices)
+from tracker.connector.ccxt.rate_limiter import RateLimitScheduler
+from tracker.core.async_io import run_database
+from tracker.core.metrics import DATABASE_SECONDS, PAGINATION_PAGES, TRADES_CONVERTED
 from tracker.database.tracker_orm_data import SQLTrade
 
 logger = logging.getLogger(__name__)
@@ -17,61 +31,142 @@ HOUR_MS = 60 * 60 * 1000
 MAX_LOOKBACK_FOR_TRADES_IN_MS = 7*24 * HOUR_MS
 
 
+class Leaderboard(Protocol):
+    '''function used in leaderboard for fetcher class'''
+
+    def refresh(self, bounty_info: BountyInfo, api_keys: list[str] = None) -> None:
+        '''recompute leaderboard of participants in api_keys'''
+
+
 class TradeFetcher(BaseFetcher):
     '''
     provides the implementation to fetch trades using CCXT
     '''
+
+    def __init__(
+            self,
+            account_infos: list[AccountInfo],
+            bounty_infos: list[BountyInfo],
+            config: CCXTConfig,
+            database: DataBase,
+            cursor_store: CursorStore = None,
+            scheduler: RateLimitScheduler = None,
+            leaderboard: Leaderboard = None,
+            account_source: AccountSource = None,
+            bounty_source: BountySource = None) -> None:
+        super().__init__(account_infos, bounty_infos, config, database, scheduler,
+                         account_source, bounty_source)
+        # fetch from campaign start every interval if no cursor store is provided
+        self._cursor_store = cursor_store
+        self._leaderboard = leaderboard
+
+    async def refresh_leaderboard(self,
+                                  account_info: AccountInfo,
+                                  bounty_info: BountyInfo) -> None:
+        '''update the leaderboard of the account after its trades are upserted'''
+        if self._leaderboard:
+            with DATABASE_SECONDS.time('leaderboard'):
+                await run_database(self._leaderboard.refresh,
+                                   bounty_info, [account_info.user_info.api_key])
+
     async def fetch(self, account_info: AccountInfo, bounty_info: BountyInfo) -> None:
         '''update all latest trades based on api every interval'''
         exchange = account_info.exchange
-        logger.info('fetching %s for %s', account_info.user_info.display_name, bounty_info.campaign_id)
-        if exchange.has['fetchMyTrades']:
-            trades = await self.fetch_my_trades_by_symbol(account_info, bounty_info)
-        else:
+        now = int(time.time() * 1000)
+        cursor = None
+        window = FetchWindow(bounty_info.start_timestamp, bounty_info.end_timestamp, True)
+        if self._cursor_store:
+            cursor = self._cursor_store.get(account_info, bounty_info)
+            window = self._cursor_store.get_window(cursor, bounty_info, now)
+            if window is None:
+                logger.debug('%s already fetched for ended campaign %s',
+                             account_info.user_info.display_name, bounty_info.campaign_id)
+                return
+        logger.info('fetching %s for %s from %s, full scan: %s',
+                    account_info.user_info.display_name, bounty_info.campaign_id,
+                    window.start_time, window.full_scan)
+        if not exchange.has['fetchMyTrades']:
             raise NotImplementedError()
-        orm_list = []
-        if not trades:
-            return
-
-        for trade in trades:
-            ccxt_trade = CCXTTrade(**trade)
-            if (ccxt_trade.timestamp < bounty_info.start_timestamp or
-                    ccxt_trade.timestamp > bounty_info.end_timestamp):
-                continue
-
-            orm = ccxt_trade.to_orm_class(
-                SQLTrade, account_info.user_info, bounty_info)
-            orm_list.append(orm)
-
-        logger.debug('orm_trade_list \n %s', orm_list)
-        logger.info('orm_trade_list len: %s, display_name: %s',
-                    len(orm_list),
+        converter = RowConverter(SQLTrade, CCXTTrade, account_info.user_info, bounty_info,
+                                 TRADE_CONVERTERS)
+        exchange_name = account_info.user_info.exchange_name
+        total_rows = 0
+        pages = 0
+        # each page is committed as it arrives so memory is bounded by the page size
+        # and a failure does not lose the pages already fetched
+        async for trades in self.iter_my_trades_by_symbol(account_info, bounty_info, window):
+            pages += 1
+            rows = converter.convert(
+                trades, bounty_info.start_timestamp, bounty_info.end_timestamp)
+            TRADES_CONVERTED.inc(exchange_name, amount=len(rows))
+            logger.debug('trade_rows \n %s', rows)
+            if rows:
+                await self.upsert_rows(SQLTrade, rows)
+            total_rows += len(rows)
+            if cursor:
+                self._cursor_store.update_last_trade(cursor, trades)
+
+        PAGINATION_PAGES.observe(pages, exchange_name)
+        logger.info('trade_rows len: %s, display_name: %s',
+                    total_rows,
                     account_info.user_info.display_name)
-        self.commit_task_list_to_sql(orm_list)
-
-    async def fetch_my_trades_by_symbol(self,
-                                        account_info: AccountInfo,
-                                        bounty_info: BountyInfo) -> list[dict]:
-        '''fetch trades by symbol and returns a list of trade json by ccxt'''
-
-        limit = self._config.limits[account_info.user_info.exchange_name]
-        method = self._config.pagination.get(
-            account_info.user_info.exchange_name)
+        if total_rows:
+            await self.refresh_leaderboard(account_info, bounty_info)
+        # cursor is committed after all pages so it never moves ahead of the trades
+        if cursor:
+            cursor = self._cursor_store.advance(cursor, window, now)
+            await self.commit_task_list_to_sql([cursor.to_orm_class()])
+
+    def iter_my_trades_by_symbol(self,
+                                 account_info: AccountInfo,
+                                 bounty_info: BountyInfo,
+                                 window: FetchWindow = None) -> AsyncIterator[list[dict]]:
+        '''fetch trades by symbol and returns an async iterator of pages of trade json by ccxt'''
+
+        exchange_name = account_info.user_info.exchange_name
+        limit = self._config.limits[exchange_name]
+        method = self._config.pagination.get(exchange_name)
         display_name = account_info.user_info.display_name
         market = bounty_info.market
         start_time = bounty_info.start_timestamp
         end_time = bounty_info.end_timestamp
+        if window:
+            start_time = window.start_time
+            end_time = window.end_time
         func = account_info.exchange.fetch_my_trades
-        # TODO: add cache to start from latest trade fetched to reduce server load
+        if self._scheduler:
+            func = self._scheduler.throttle(account_info.exchange, func)
+
+        slice_interval = self._config.slice_intervals.get(exchange_name)
+        sliceable = method in SLICEABLE_METHODS or method not in PAGINATION_METHODS
+        # no trades can exist after now, do not slice the future
+        slice_end_time = min(end_time, int(time.time() * 1000))
+        if slice_interval and sliceable and slice_end_time - start_time > slice_interval * 1000:
+            return iter_pagination_by_time_slices(
+                func=func,
+                method=method,
+                display_name=display_name,
+                symbol=market,
+                start_time=start_time,
+                end_time=slice_end_time,
+                limit=limit,
+                slice_interval=int(slice_interval * 1000),
+                max_concurrency=self._config.max_concurrent_slices)
+        return iter_pagination(func=func,
+                               method=method,
+                               display_name=display_name,
+                               symbol=market,
+                               start_time=start_time,
+                               end_time=end_time,
+                               limit=limit)
 
-        results = await pagination(func=func,
-                                   method=method,
-                                   display_name=display_name,
-                                   symbol=market,
-                                   start_time=start_time,
-                                   end_time=end_time,
-                                   limit=limit)
-        return results
+    async def fetch_my_trades_by_symbol(self,
+                                        account_info: AccountInfo,
+                                        bounty_info: BountyInfo,
+                                        window: FetchWindow = None) -> list[dict]:
+        '''fetch trades by symbol and returns a list of trade json by ccxt'''
+        return await collect_pages(
+            self.iter_my_trades_by_symbol(account_info, bounty_info, window))
 
 # pylint: disable=[import-outside-toplevel]
 
@@ -83,19 +178,25 @@ async def test() -> None:
     from tracker.database.database import DataBase
     from tracker.account.account_validator import get_validated_account_infos
     from tracker.bounty.bounty import get_active_bounty_infos
-    from tracker.connector.ccxt.get_config import CCXTConfig
 
     setup_logging()
     database = DataBase()
     gsheet = GSheet.create()
-    account_infos = await get_validated_account_infos(gsheet)
-    bounty_infos = get_active_bounty_infos(gsheet)
     config = CCXTConfig.create()
+    scheduler = RateLimitScheduler(config.rate_limits, costs=config.rate_limit_costs)
+    account_infos = await get_validated_account_infos(gsheet, scheduler)
+    bounty_infos = get_active_bounty_infos(gsheet)
+    cursor_store = CursorStore.create(database,
+                                      overlap=config.cursor_overlap,
+                                      full_rescan_interval=config.full_rescan_interval,
+                                      full_rescan=config.full_rescan)
     fetcher = TradeFetcher(
         account_infos=account_infos,
         bounty_infos=bounty_infos,
         config=config,
         database=database,
+        cursor_store=cursor_store,
+        scheduler=scheduler,
     )
     await fetcher.start()
 
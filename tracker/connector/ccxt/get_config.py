@@ -1,7 +1,7 @@
 '''get ccxt config'''
 # pylint: disable=[invalid-name, too-many-instance-attributes]
 import logging
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 from tracker.core.utils import load_yml
 
@@ -16,6 +16,22 @@ class CCXTConfig:
     limits: dict[str, int]  # exchange_name: read_limit
     update_interval: float
     pagination: dict[str, str]  # exchange_name: pagination_method
+    cursor_overlap: float = 3600  # seconds refetched before the last fetched time
+    full_rescan_interval: float = 86400  # seconds between fetches from campaign start
+    full_rescan: bool = False  # always fetch from campaign start
+    # exchange_name: requests per second shared by all accounts, defaults to ccxt rateLimit
+    rate_limits: dict[str, float] = field(default_factory=dict)
+    # exchange_name: {ccxt method: tokens per request}, weight of the endpoints costing more than 1
+    rate_limit_costs: dict[str, dict[str, float]] = field(default_factory=dict)
+    # exchange_name: seconds per time slice fetched concurrently, only for since and endTime
+    slice_intervals: dict[str, float] = field(default_factory=dict)
+    max_concurrent_slices: int = 4  # slices paginated at the same time per account market
+    # exchange_name streamed with websocket, requires ccxt pro
+    watch_exchanges: list[str] = field(default_factory=list)
+    # seconds between checks of account and bounty changes to start or cancel fetch loops
+    reconfigure_interval: float = 60
+    # processes fetching a shard of the accounts each, 1 runs in the main process
+    workers: int = 1
 
     @classmethod
     def create(cls, config_file_location=CONFIG_LOCATION) -> 'CCXTConfig':
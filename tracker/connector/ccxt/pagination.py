@@ -2,11 +2,22 @@
 # pylint: disable=too-many-arguments
 import asyncio
 import logging
-from typing import Callable
+from typing import AsyncIterator, Callable
 
-from ccxt.base.errors import NetworkError, ExchangeNotAvailable
+from ccxt.base.errors import NetworkError, ExchangeNotAvailable, RateLimitExceeded
 logger = logging.getLogger(__name__)
 
+# seconds to wait between pages and after a rate limit error,
+# a throttled function overrides these as its scheduler spaces the requests
+PAGE_DELAY = 1
+RATE_LIMIT_DELAY = 60
+NETWORK_ERROR_DELAY = 60
+
+
+def get_page_delay(func: Callable) -> float:
+    '''seconds to wait before fetching the next page'''
+    return getattr(func, 'page_delay', PAGE_DELAY)
+
 
 async def retry_func(func,
                      symbol: str,
@@ -14,30 +25,40 @@ async def retry_func(func,
                      limit: int,
                      params: dict = None,
                      retry: int = 3) -> list[dict]:
-    '''retry function call up to retry times and raise error if result is not returned'''
+    '''
+    retry function call up to retry times and raise the last error if result is not returned,
+    so that a failed page is never mistaken for the end of the pagination
+    '''
     for i in range(retry):
+        last_attempt = i == retry - 1
         try:
             return await func(symbol, start_time, limit, params)
+        except RateLimitExceeded as error:
+            logger.warning('%s: rate limit exceeded', error)
+            if last_attempt:
+                raise
+            await asyncio.sleep(getattr(func, 'rate_limit_delay', RATE_LIMIT_DELAY))
         except (ExchangeNotAvailable, NetworkError) as error:
             logger.warning('%s: network error encountered', error)
-            await asyncio.sleep(60)
+            if last_attempt:
+                raise
+            await asyncio.sleep(getattr(func, 'network_error_delay', NETWORK_ERROR_DELAY))
         except Exception as error:
             logger.exception(
                 'Retry %s, Unknown Exception Encountered: %s', retry, error)
-            if i == retry - 1:
+            if last_attempt:
                 raise error
             await asyncio.sleep(60)
 
 
-async def pagination_by_date_time(func: Callable,
-                                  display_name: str,
-                                  symbol: str,
-                                  start_time: int,
-                                  end_time: int,
-                                  limit: int,
-                                  params: dict = None) -> list[dict]:
-    '''standard pagination method for ccxt'''
-    all_results = []
+async def iter_pagination_by_date_time(func: Callable,
+                                       display_name: str,
+                                       symbol: str,
+                                       start_time: int,
+                                       end_time: int,
+                                       limit: int,
+                                       params: dict = None) -> AsyncIterator[list[dict]]:
+    '''standard pagination method for ccxt, yields each page from oldest to latest'''
     while start_time < end_time:
         results = await retry_func(func, symbol, start_time, limit, params)
         if results:
@@ -45,22 +66,23 @@ async def pagination_by_date_time(func: Callable,
                         len(results),
                         display_name,
                         symbol)
+            yield results
+            if start_time == results[len(results) - 1]['timestamp']:
+                break
             start_time = results[len(results) - 1]['timestamp']
-            all_results += results
-            await asyncio.sleep(1)
+            await asyncio.sleep(get_page_delay(func))
             continue
         break
 
 
-async def pagination_by_end_time(func: Callable,
-                                 display_name: str,
-                                 symbol: str,
-                                 start_time: int,
-                                 end_time: int,
-                                 limit: int,
-                                 params: dict = None) -> list[dict]:
-    '''pagination by end time method'''
-    all_results = []
+async def iter_pagination_by_end_time(func: Callable,
+                                      display_name: str,
+                                      symbol: str,
+                                      start_time: int,
+                                      end_time: int,
+                                      limit: int,
+                                      params: dict = None) -> AsyncIterator[list[dict]]:
+    '''pagination by end time method, yields each page from latest to oldest'''
     while end_time > start_time:
         params = {'endTime': end_time}
         results = await retry_func(func, symbol, start_time, limit, params)
@@ -72,23 +94,21 @@ async def pagination_by_end_time(func: Callable,
             if end_time == results[0]['timestamp']:
                 break
             end_time = results[0]['timestamp']
-            all_results += results
-            await asyncio.sleep(1)
+            yield results
+            await asyncio.sleep(get_page_delay(func))
             continue
         break
-    return all_results
 
 
-async def pagination_by_earliest_id(func: Callable,
-                                    display_name: str,
-                                    symbol: str,
-                                    start_time: int,
-                                    end_time: int,
-                                    limit: int,
-                                    params: dict = None) -> list[dict]:
-    '''pagination for okex exchange'''
+async def iter_pagination_by_earliest_id(func: Callable,
+                                         display_name: str,
+                                         symbol: str,
+                                         start_time: int,
+                                         end_time: int,
+                                         limit: int,
+                                         params: dict = None) -> AsyncIterator[list[dict]]:
+    '''pagination for okex exchange, yields each page from latest to oldest'''
     earliest_id = None
-    all_results = []
     while end_time > start_time:
         params = {}
         if earliest_id:
@@ -101,7 +121,7 @@ async def pagination_by_earliest_id(func: Callable,
                         len(results),
                         display_name,
                         symbol)
-            all_results += results
+            yield results
             earliest_id = results[0]['order']
             if len(results) > 1:
                 earliest_id = results[1]['order']
@@ -111,15 +131,172 @@ async def pagination_by_earliest_id(func: Callable,
         if earliest_id == -1:
             break
 
+
+async def collect_pages(pages: AsyncIterator[list[dict]]) -> list[dict]:
+    '''returns all results of the pages in a single list'''
+    all_results = []
+    async for results in pages:
+        all_results += results
     return all_results
 
+
+async def pagination_by_date_time(func: Callable,
+                                  display_name: str,
+                                  symbol: str,
+                                  start_time: int,
+                                  end_time: int,
+                                  limit: int,
+                                  params: dict = None) -> list[dict]:
+    '''standard pagination method for ccxt'''
+    return await collect_pages(iter_pagination_by_date_time(
+        func, display_name, symbol, start_time, end_time, limit, params))
+
+
+async def pagination_by_end_time(func: Callable,
+                                 display_name: str,
+                                 symbol: str,
+                                 start_time: int,
+                                 end_time: int,
+                                 limit: int,
+                                 params: dict = None) -> list[dict]:
+    '''pagination by end time method'''
+    return await collect_pages(iter_pagination_by_end_time(
+        func, display_name, symbol, start_time, end_time, limit, params))
+
+
+async def pagination_by_earliest_id(func: Callable,
+                                    display_name: str,
+                                    symbol: str,
+                                    start_time: int,
+                                    end_time: int,
+                                    limit: int,
+                                    params: dict = None) -> list[dict]:
+    '''pagination for okex exchange'''
+    return await collect_pages(iter_pagination_by_earliest_id(
+        func, display_name, symbol, start_time, end_time, limit, params))
+
+
+# methods that accept both a start and an end time so the range can be sliced
+SLICEABLE_METHODS = ("date_time", "end_time")
+
 PAGINATION_METHODS = {
-    "date_time": pagination_by_date_time,
-    "end_time": pagination_by_end_time,
-    "earliest_id": pagination_by_earliest_id
+    "date_time": iter_pagination_by_date_time,
+    "end_time": iter_pagination_by_end_time,
+    "earliest_id": iter_pagination_by_earliest_id
 }
 
 
+def iter_pagination(func: Callable,
+                    method: str,
+                    display_name: str,
+                    symbol: str,
+                    start_time: int,
+                    end_time: int,
+                    limit: int,
+                    params: dict = None) -> AsyncIterator[list[dict]]:
+    '''returns an async iterator of pages so that each page can be processed as it arrives'''
+    pagination_method = PAGINATION_METHODS.get(
+        method, iter_pagination_by_date_time)
+    return pagination_method(
+        func, display_name, symbol, start_time,
+        end_time, limit, params)
+
+
+def split_time_range(start_time: int,
+                     end_time: int,
+                     slice_interval: int) -> list[tuple[int, int]]:
+    '''split [start_time, end_time] into consecutive slices of slice_interval ms'''
+    return [(slice_start, min(slice_start + slice_interval, end_time))
+            for slice_start in range(start_time, end_time, slice_interval)]
+
+
+def get_slice_params(method: str, slice_end: int, params: dict = None) -> dict:
+    '''params of a slice, date time pagination is bounded by endTime where it is accepted'''
+    if method == 'date_time':
+        return {**(params or {}), 'endTime': slice_end}
+    return params
+
+
+async def iter_slice_pages(func: Callable,
+                           method: str,
+                           display_name: str,
+                           symbol: str,
+                           slice_start: int,
+                           slice_end: int,
+                           limit: int,
+                           is_last: bool,
+                           params: dict = None) -> AsyncIterator[list[dict]]:
+    '''
+    yields the pages of a slice restricted to [slice_start, slice_end), the last slice includes
+    its end, so consecutive slices never return the same trade. consecutive pages of a slice
+    overlap at their boundary timestamp and only the keys of the previous page are kept
+    to drop the repeated trades, memory is bounded by a page
+    '''
+    previous_keys = set()
+    async for results in iter_pagination(func, method, display_name, symbol, slice_start,
+                                         slice_end, limit,
+                                         get_slice_params(method, slice_end, params)):
+        page_keys = set()
+        unique_results = []
+        for result in results:
+            timestamp = result['timestamp']
+            if timestamp < slice_start or timestamp > slice_end or (
+                    timestamp == slice_end and not is_last):
+                continue
+            key = (result['id'], result['takerOrMaker'])
+            page_keys.add(key)
+            if key not in previous_keys:
+                unique_results.append(result)
+        previous_keys = page_keys
+        if unique_results:
+            yield unique_results
+
+
+async def iter_pagination_by_time_slices(func: Callable,
+                                         method: str,
+                                         display_name: str,
+                                         symbol: str,
+                                         start_time: int,
+                                         end_time: int,
+                                         limit: int,
+                                         slice_interval: int,
+                                         max_concurrency: int = 4,
+                                         params: dict = None) -> AsyncIterator[list[dict]]:
+    '''
+    paginate each time slice concurrently for exchanges accepting both since and endTime,
+    yields the pages as they arrive from any slice
+    '''
+    queue = asyncio.Queue(maxsize=max_concurrency * 2)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    slices = split_time_range(start_time, end_time, slice_interval)
+
+    async def fetch_slice(slice_start: int, slice_end: int) -> None:
+        async with semaphore:
+            async for results in iter_slice_pages(func, method, display_name, symbol,
+                                                  slice_start, slice_end, limit,
+                                                  slice_end == end_time, params):
+                await queue.put(results)
+
+    async def fetch_all_slices() -> None:
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            await queue.put(None)
+
+    tasks = [asyncio.create_task(fetch_slice(*time_slice)) for time_slice in slices]
+    producer = asyncio.create_task(fetch_all_slices())
+    logger.info('pagination slices: %s, display_name: %s, market:%s ',
+                len(slices), display_name, symbol)
+    try:
+        while (results := await queue.get()) is not None:
+            yield results
+        # raise error of a failed slice
+        await producer
+    finally:
+        for task in tasks + [producer]:
+            task.cancel()
+
+
 async def pagination(func: Callable,
                      method: str,
                      display_name: str,
@@ -129,9 +306,6 @@ async def pagination(func: Callable,
                      limit: int,
                      params: dict = None) -> list[dict]:
     '''returns full result'''
-    pagination_method = PAGINATION_METHODS.get(
-        method, pagination_by_date_time)
-    results = await pagination_method(
-        func, display_name, symbol, start_time,
-        end_time, limit, params)
-    return results
\ No newline at end of file
+    return await collect_pages(iter_pagination(
+        func, method, display_name, symbol, start_time,
+        end_time, limit, params))
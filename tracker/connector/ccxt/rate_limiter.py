@@ -0,0 +1,208 @@
+'''
+Shared rate limit scheduler for all requests sent to an exchange.
+Each ccxt exchange instance only throttles itself, the scheduler throttles
+all accounts of the same exchange together with a token bucket.
+'''
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Any, Awaitable, Callable
+
+from ccxt.base.errors import DDoSProtection
+from ccxt.base.exchange import Exchange
+from tracker.core.metrics import (EXCHANGE_RATE_LIMIT_WAIT_SECONDS,
+                                  EXCHANGE_REQUEST_SECONDS,
+                                  EXCHANGE_REQUESTS)
+
+logger = logging.getLogger(__name__)
+
+# lower value is served first
+PAGINATION_PRIORITY = 0  # next page of a pagination in progress
+DEFAULT_PRIORITY = 1  # first page of a pagination
+VALIDATION_PRIORITY = 2  # account validation
+# backoff kept after a successful request, repeated rate limit errors still double it
+BACKOFF_DECAY = 0.75
+
+
+class TokenBucket:
+    '''token bucket that serves waiters by priority and slows down after rate limit errors'''
+
+    def __init__(self,
+                 name: str,
+                 rate: float,
+                 capacity: float = 1,
+                 min_rate: float = None,
+                 max_backoff: float = 300) -> None:
+        self.name = name
+        self.base_rate = rate  # requests per second
+        self.rate = rate
+        self.min_rate = min_rate or rate / 16
+        self.capacity = capacity
+        self.max_backoff = max_backoff
+        self.tokens = capacity
+        self.backoff = 0.
+        self.backoff_until = 0.
+        self._updated = time.monotonic()
+        self._counter = itertools.count()
+        self._waiters: list[list] = []
+        self._dispatcher: asyncio.Task = None
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def get_delay(self, cost: float = 1) -> float:
+        '''
+        seconds until a request of cost can be sent, a cost above capacity waits for a full
+        bucket and leaves it in debt so that the following requests wait for the excess
+        '''
+        now = time.monotonic()
+        self._refill(now)
+        if now < self.backoff_until:
+            return self.backoff_until - now
+        cost = min(cost, self.capacity)
+        if self.tokens >= cost:
+            return 0
+        return (cost - self.tokens) / self.rate
+
+    async def acquire(self, cost: float = 1, priority: int = DEFAULT_PRIORITY) -> None:
+        '''wait until the request is allowed to be sent'''
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, [priority, next(self._counter), cost, future])
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        # a cancelled waiter is skipped by the dispatcher
+        await future
+
+    async def _dispatch(self) -> None:
+        while self._waiters:
+            _, _, cost, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            delay = self.get_delay(cost)
+            if delay > 0:
+                # a waiter with higher priority may arrive while sleeping
+                await asyncio.sleep(delay)
+                continue
+            heapq.heappop(self._waiters)
+            self.tokens -= cost
+            future.set_result(None)
+
+    def penalize(self) -> None:
+        '''halve the rate and back off exponentially after a rate limit error'''
+        self.rate = max(self.rate / 2, self.min_rate)
+        self.backoff = min(max(self.backoff * 2, 1 / self.rate), self.max_backoff)
+        self.backoff_until = time.monotonic() + self.backoff
+        self.tokens = 0
+        logger.warning('%s rate limited, rate reduced to %.2f/s, backoff %.1fs',
+                       self.name, self.rate, self.backoff)
+
+    def reward(self) -> None:
+        '''recover the rate and decay the backoff slowly after a successful request'''
+        self.backoff *= BACKOFF_DECAY
+        if self.rate < self.base_rate:
+            self.rate = min(self.base_rate, self.rate + self.base_rate / 20)
+
+
+class RateLimitScheduler:
+    '''provides a token bucket per exchange shared by all accounts'''
+
+    def __init__(self,
+                 rate_limits: dict[str, float] = None,
+                 capacity: float = 1,
+                 max_backoff: float = 300,
+                 share: float = 1,
+                 costs: dict[str, dict[str, float]] = None) -> None:
+        self.rate_limits = rate_limits or {}  # exchange_id: requests per second
+        # exchange_id: {method name: tokens per request}, requests cost 1 by default
+        self.costs = costs or {}
+        # fraction of the exchange rate used when processes share the same api limits
+        self.share = share
+        self.capacity = capacity
+        self.max_backoff = max_backoff
+        self._buckets: dict[str, TokenBucket] = {}
+
+    def get_bucket(self, exchange: Exchange) -> TokenBucket:
+        '''get token bucket of the exchange, rate defaults to ccxt rateLimit of the exchange'''
+        if exchange.id not in self._buckets:
+            rate = self.rate_limits.get(exchange.id, 1000 / exchange.rateLimit) * self.share
+            self._buckets[exchange.id] = TokenBucket(
+                exchange.id, rate, self.capacity, max_backoff=self.max_backoff)
+        return self._buckets[exchange.id]
+
+    def get_cost(self, exchange: Exchange, method: str) -> float:
+        '''tokens taken by a request of the exchange method, its weight for the exchange'''
+        return self.costs.get(exchange.id, {}).get(method, 1)
+
+    def get_backoff(self, exchange: Exchange) -> float:
+        '''seconds to wait before the exchange accepts requests again'''
+        return max(self.get_bucket(exchange).backoff_until - time.monotonic(), 0)
+
+    async def request(self,
+                      exchange: Exchange,
+                      func: Callable[..., Awaitable],
+                      *args,
+                      priority: int = DEFAULT_PRIORITY,
+                      cost: float = None,
+                      **kwargs) -> Any:
+        '''
+        send a request through the token bucket of the exchange,
+        cost defaults to the weight of the method in costs
+        '''
+        bucket = self.get_bucket(exchange)
+        method = getattr(func, '__name__', 'request')
+        if cost is None:
+            cost = self.get_cost(exchange, method)
+        # the bucket spaces the requests, ccxt would throttle them a second time
+        exchange.enableRateLimit = False
+        started = time.perf_counter()
+        await bucket.acquire(cost, priority)
+        sent = time.perf_counter()
+        EXCHANGE_RATE_LIMIT_WAIT_SECONDS.observe(sent - started, exchange.id)
+        try:
+            result = await func(*args, **kwargs)
+        except DDoSProtection as error:
+            # includes RateLimitExceeded
+            bucket.penalize()
+            EXCHANGE_REQUESTS.inc(exchange.id, method, type(error).__name__)
+            raise
+        except Exception as error:
+            EXCHANGE_REQUESTS.inc(exchange.id, method, type(error).__name__)
+            raise
+        finally:
+            EXCHANGE_REQUEST_SECONDS.observe(time.perf_counter() - sent, exchange.id, method)
+        EXCHANGE_REQUESTS.inc(exchange.id, method, 'ok')
+        bucket.reward()
+        return result
+
+    def throttle(self, exchange: Exchange, func: Callable[..., Awaitable]) -> 'ThrottledFunction':
+        '''wrap func so that every call goes through the scheduler'''
+        return ThrottledFunction(self, exchange, func)
+
+
+class ThrottledFunction:
+    '''
+    wraps an exchange method for pagination, the first call is sent with default priority
+    and the following pages with pagination priority
+    '''
+    # the token bucket already spaces and backs off the requests
+    page_delay = 0
+    rate_limit_delay = 0
+
+    def __init__(self,
+                 scheduler: RateLimitScheduler,
+                 exchange: Exchange,
+                 func: Callable[..., Awaitable]) -> None:
+        self.scheduler = scheduler
+        self.exchange = exchange
+        self.func = func
+        self.calls = 0
+
+    async def __call__(self, *args, **kwargs) -> Any:
+        priority = PAGINATION_PRIORITY if self.calls else DEFAULT_PRIORITY
+        self.calls += 1
+        return await self.scheduler.request(
+            self.exchange, self.func, *args, priority=priority, **kwargs)
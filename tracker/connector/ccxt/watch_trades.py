@@ -0,0 +1,185 @@
+'''
+Stream trades from exchange websocket using ccxt pro where supported.
+REST pagination fills the gap before streaming and after reconnects, catches up once
+the stream is subscribed and reconciles the campaign with a full scan every full rescan
+interval while streaming.
+'''
+import asyncio
+import logging
+import time
+from types import ModuleType
+
+from ccxt.base.errors import NetworkError
+from ccxt.base.exchange import Exchange
+from tracker.account.create_account_infos import AccountInfo
+from tracker.bounty.bounty import BountyInfo
+from tracker.connector.ccxt.base_fetcher import (AccountKey,
+                                                 AccountSource,
+                                                 BountySource,
+                                                 DataBase,
+                                                 get_account_key)
+from tracker.connector.ccxt.ccxt_data import CCXTTrade, RowConverter, TRADE_CONVERTERS
+from tracker.connector.ccxt.cursor import CursorStore, FetchWindow, TradeCursor
+from tracker.connector.ccxt.fetch_trades import Leaderboard, TradeFetcher
+from tracker.connector.ccxt.get_config import CCXTConfig
+from tracker.connector.ccxt.rate_limiter import RateLimitScheduler
+from tracker.core.metrics import TRADES_CONVERTED
+from tracker.database.tracker_orm_data import SQLTrade
+
+try:
+    import ccxt.pro as ccxtpro
+except ImportError:
+    try:
+        import ccxtpro
+    except ImportError:
+        ccxtpro = None
+
+logger = logging.getLogger(__name__)
+
+RECONNECT_DELAY = 5
+
+
+def create_stream_exchange(exchange: Exchange, stream_module: ModuleType) -> Exchange:
+    '''create the websocket exchange with the same credentials as the rest exchange'''
+    return getattr(stream_module, exchange.id)({
+        # the scheduler throttles rest requests only, the websocket exchange throttles itself
+        "enableRateLimit": True,
+        "apiKey": exchange.apiKey,
+        "secret": exchange.secret,
+        "password": exchange.password,
+    })
+
+
+class TradeWatcher(TradeFetcher):
+    '''
+    fetch trades with websocket for exchanges configured in CCXTConfig.watch_exchanges,
+    the other exchanges are polled with rest every update interval
+    '''
+
+    def __init__(
+            self,
+            account_infos: list[AccountInfo],
+            bounty_infos: list[BountyInfo],
+            config: CCXTConfig,
+            database: DataBase,
+            cursor_store: CursorStore = None,
+            scheduler: RateLimitScheduler = None,
+            leaderboard: Leaderboard = None,
+            account_source: AccountSource = None,
+            bounty_source: BountySource = None,
+            stream_module: ModuleType = ccxtpro) -> None:
+        super().__init__(account_infos, bounty_infos, config, database,
+                         cursor_store, scheduler, leaderboard, account_source, bounty_source)
+        # module providing the websocket exchange classes, e.g. a fake for testing
+        self._stream_module = stream_module
+        self._stream_exchanges: dict[AccountKey, Exchange] = {}
+
+    def get_stream_exchange(self, account_info: AccountInfo) -> Exchange:
+        '''get websocket exchange of the account, returns None if not supported'''
+        user_info = account_info.user_info
+        if (self._stream_module is None or
+                user_info.exchange_name not in self._config.watch_exchanges):
+            return None
+        key = get_account_key(account_info)
+        if key not in self._stream_exchanges:
+            exchange = create_stream_exchange(account_info.exchange, self._stream_module)
+            if not exchange.has.get('watchMyTrades'):
+                logger.warning('%s does not support watchMyTrades, polling with rest',
+                               user_info.exchange_name)
+                exchange = None
+            self._stream_exchanges[key] = exchange
+        return self._stream_exchanges[key]
+
+    async def fetch(self, account_info: AccountInfo, bounty_info: BountyInfo) -> None:
+        '''fill the gap with rest then stream trades until the campaign ends'''
+        while True:
+            await super().fetch(account_info, bounty_info)
+            stream_exchange = self.get_stream_exchange(account_info)
+            if stream_exchange is None:
+                return
+            try:
+                await self.watch(stream_exchange, account_info, bounty_info)
+                return
+            except NetworkError as error:
+                logger.warning('%s: %s stream disconnected, filling gap with rest',
+                               error, account_info.user_info.display_name)
+                await asyncio.sleep(RECONNECT_DELAY)
+
+    async def reconcile(self, account_info: AccountInfo, bounty_info: BountyInfo) -> None:
+        '''rest fetch of the cursor window while streaming, catches trades the stream missed'''
+        try:
+            await super().fetch(account_info, bounty_info)
+        except Exception as error:  #pylint: disable=broad-except
+            # the full scan is still due so it is started again by the stream
+            logger.warning('%s: reconciliation of %s failed', error,
+                           account_info.user_info.display_name)
+
+    def is_full_scan_due(self, cursor: TradeCursor, bounty_info: BountyInfo, now: int) -> bool:
+        '''if the full rescan interval has passed since the last full scan of the cursor'''
+        window = self._cursor_store.get_window(cursor, bounty_info, now)
+        return window is not None and window.full_scan
+
+    async def watch(self,
+                    exchange: Exchange,
+                    account_info: AccountInfo,
+                    bounty_info: BountyInfo) -> None:
+        '''
+        stream trades of the campaign market and upsert them as they arrive.
+        a rest fetch runs alongside once subscribed, for the trades made between the gap fill
+        and the subscription, then whenever a full scan is due
+        '''
+        converter = RowConverter(SQLTrade, CCXTTrade, account_info.user_info, bounty_info,
+                                 TRADE_CONVERTERS)
+        cursor = None
+        if self._cursor_store:
+            cursor = self._cursor_store.get(account_info, bounty_info)
+        # trades received while the stream stays connected are complete up to now
+        window = FetchWindow(bounty_info.start_timestamp, bounty_info.end_timestamp, False)
+        logger.info('watching %s for %s',
+                    account_info.user_info.display_name, bounty_info.campaign_id)
+        reconciliation: asyncio.Task = None
+        subscribed = False
+        try:
+            while (now := int(time.time() * 1000)) <= bounty_info.end_timestamp:
+                try:
+                    trades = await asyncio.wait_for(
+                        exchange.watch_my_trades(bounty_info.market),
+                        timeout=self._config.update_interval)
+                except asyncio.TimeoutError:
+                    trades = []
+                rows = converter.convert(
+                    trades, bounty_info.start_timestamp, bounty_info.end_timestamp)
+                TRADES_CONVERTED.inc(account_info.user_info.exchange_name, amount=len(rows))
+                if rows:
+                    logger.info('streamed trade_rows len: %s, display_name: %s',
+                                len(rows), account_info.user_info.display_name)
+                    await self.upsert_rows(SQLTrade, rows)
+                    await self.refresh_leaderboard(account_info, bounty_info)
+                if cursor:
+                    self._cursor_store.update_last_trade(cursor, trades)
+                    self._cursor_store.advance(cursor, window, now)
+                    await self.commit_task_list_to_sql([cursor.to_orm_class()])
+                    # advancing the stream cursor never counts as a full scan,
+                    # the window of the first fetch starts before the subscription by overlap
+                    if ((reconciliation is None or reconciliation.done()) and
+                            (not subscribed or self.is_full_scan_due(cursor, bounty_info, now))):
+                        reconciliation = asyncio.create_task(
+                            self.reconcile(account_info, bounty_info))
+                subscribed = True
+        finally:
+            if reconciliation:
+                reconciliation.cancel()
+
+    async def close_account(self, account_info: AccountInfo) -> None:
+        '''close rest and websocket connections of an account that is not fetched anymore'''
+        await super().close_account(account_info)
+        stream_exchange = self._stream_exchanges.pop(get_account_key(account_info), None)
+        if stream_exchange:
+            await stream_exchange.close()
+
+    async def close_all(self) -> None:
+        '''close connections to all rest and websocket exchanges'''
+        await super().close_all()
+        for exchange in self._stream_exchanges.values():
+            if exchange:
+                await exchange.close()
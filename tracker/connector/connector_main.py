@@ -3,11 +3,18 @@ import asyncio
 
 from tracker.account.account_validator import AccountValidator
 from tracker.bounty.bounty import Bounty
+from tracker.connector.ccxt.cursor import CursorStore
 from tracker.connector.ccxt.fetch_trades import TradeFetcher
 from tracker.connector.ccxt.get_config import CCXTConfig
+from tracker.connector.ccxt.rate_limiter import RateLimitScheduler
+from tracker.connector.ccxt.watch_trades import TradeWatcher
+from tracker.connector.shard import ShardCoordinator, get_rate_share
+from tracker.core.async_io import LoopLagMonitor
 from tracker.core.gsheet import GSheet
 from tracker.core.logger import setup_logging
-from tracker.database.database import DataBase
+from tracker.core.metrics import create_metrics_server
+from tracker.database.database import DataBase, DBConfig
+from tracker.leaderboard.leaderboard import Leaderboard
 
 
 async def main() -> None:
@@ -17,23 +24,52 @@ async def main() -> None:
 
     database = DataBase()
     g_sheet = GSheet.create()
+    config = CCXTConfig.create()
+    # shared by all accounts so that requests to the same exchange are throttled together,
+    # the validation of the sharded mode takes a share of the rate like each worker
+    scheduler = RateLimitScheduler(config.rate_limits, share=get_rate_share(config.workers),
+                                   costs=config.rate_limit_costs)
 
-    account_validator = await AccountValidator.create(g_sheet)
+    account_validator = await AccountValidator.create(g_sheet, scheduler=scheduler)
     account_infos = account_validator.account_infos
 
     bounty = Bounty(g_sheet)
     bounty_infos = bounty.info
 
-    config = CCXTConfig.create()
-    fetcher = TradeFetcher(
+    if config.workers > 1:
+        # accounts are fetched by worker processes, this process validates and assigns them
+        coordinator = ShardCoordinator(config.workers, account_validator, bounty,
+                                       DBConfig.create(), config)
+        await asyncio.gather(account_validator.start(),
+                             bounty.start(),
+                             coordinator.start(),
+                             LoopLagMonitor().start(),
+                             create_metrics_server('connector').start())
+        return
+
+    cursor_store = CursorStore.create(database,
+                                      overlap=config.cursor_overlap,
+                                      full_rescan_interval=config.full_rescan_interval,
+                                      full_rescan=config.full_rescan)
+    # stream trades with websocket if any exchange is configured for it
+    fetcher_class = TradeWatcher if config.watch_exchanges else TradeFetcher
+    fetcher = fetcher_class(
         account_infos=account_infos,
         bounty_infos=bounty_infos,
         config=config,
         database=database,
+        cursor_store=cursor_store,
+        scheduler=scheduler,
+        leaderboard=Leaderboard(database),
+        # new signups and campaigns are fetched as the validator and bounty refresh
+        account_source=account_validator,
+        bounty_source=bounty,
     )
     await asyncio.gather(account_validator.start(),
                          bounty.start(),
-                         fetcher.start())
+                         fetcher.start(),
+                         LoopLagMonitor().start(),
+                         create_metrics_server('connector').start())
 
 if __name__ == '__main__':
     asyncio.run(main())
@@ -0,0 +1,309 @@
+'''
+Sharded run mode of the connector.
+The coordinator validates accounts and partitions (account, bounty) pairs between
+worker processes by consistent hash of api_key, each worker runs its own TradeFetcher.
+An account only moves to another worker when workers are added or removed,
+and only the workers whose accounts changed reconfigure their fetcher.
+'''
+import asyncio
+import bisect
+import dataclasses
+import hashlib
+import importlib
+import logging
+import multiprocessing
+import queue
+from dataclasses import dataclass
+from multiprocessing.process import BaseProcess
+from types import ModuleType
+from typing import Iterable, Optional
+
+from ccxt.base.errors import BaseError
+from tracker.account.account_validator import AccountValidator
+from tracker.account.create_account_infos import AccountInfo, create_account_infos
+from tracker.account.get_user_info import UserInfo
+from tracker.account.validation import MarketCache
+from tracker.bounty.bounty import Bounty, BountyInfo
+from tracker.connector.ccxt.base_fetcher import AccountKey, get_account_key
+from tracker.connector.ccxt.cursor import CursorStore
+from tracker.connector.ccxt.fetch_trades import TradeFetcher
+from tracker.connector.ccxt.get_config import CCXTConfig
+from tracker.connector.ccxt.rate_limiter import RateLimitScheduler
+from tracker.connector.ccxt.watch_trades import TradeWatcher
+from tracker.core.logger import setup_logging
+from tracker.core.metrics import create_metrics_server
+from tracker.database.database import DataBase, DBConfig
+from tracker.leaderboard.leaderboard import Leaderboard
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EXCHANGE_MODULE = 'ccxt.async_support'
+# seconds between checks of worker processes and account changes
+CHECK_INTERVAL = 10
+
+
+def get_rate_share(workers: int) -> float:
+    '''
+    fraction of the exchange rate limits used by each process,
+    the coordinator validating accounts counts as a process besides the workers
+    '''
+    return 1 / (workers + 1) if workers > 1 else 1
+
+
+def hash_key(key: str) -> int:
+    '''stable hash of key across processes, python hash is salted per process'''
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+
+class HashRing:
+    '''consistent hash ring of shards with virtual nodes to spread keys evenly'''
+
+    def __init__(self, shards: Iterable[int], replicas: int = 100) -> None:
+        points = sorted((hash_key(f'{shard}:{replica}'), shard)
+                        for shard in shards for replica in range(replicas))
+        self._hashes = [point for point, _ in points]
+        self._shards = [shard for _, shard in points]
+
+    def get_shard(self, key: str) -> int:
+        '''shard of the first virtual node clockwise from the key'''
+        index = bisect.bisect(self._hashes, hash_key(key)) % len(self._hashes)
+        return self._shards[index]
+
+
+@dataclass
+class ShardAssignment:
+    '''accounts and bounties fetched by a worker, sent from the coordinator'''
+    user_infos: list[UserInfo]
+    bounty_infos: list[BountyInfo]
+
+
+def partition(ring: HashRing,
+              shards: Iterable[int],
+              user_infos: list[UserInfo],
+              bounty_infos: list[BountyInfo]) -> dict[int, ShardAssignment]:
+    '''assign each account with every bounty to the shard of its api_key'''
+    assignments = {shard: ShardAssignment([], list(bounty_infos)) for shard in shards}
+    for user_info in sorted(user_infos, key=lambda user_info: user_info.api_key):
+        assignments[ring.get_shard(user_info.api_key)].user_infos.append(user_info)
+    return assignments
+
+
+class ShardWorker:
+    '''runs a TradeFetcher in a worker process for the accounts assigned to it'''
+
+    def __init__(self,
+                 shard: int,
+                 assignments: multiprocessing.Queue,
+                 database: DataBase,
+                 config: CCXTConfig,
+                 exchange_module: ModuleType | str = DEFAULT_EXCHANGE_MODULE) -> None:
+        self.shard = shard
+        self.assignments = assignments
+        self.database = database
+        self.config = config
+        if isinstance(exchange_module, str):
+            exchange_module = importlib.import_module(exchange_module)
+        self.exchange_module = exchange_module
+        # exchange rate limits are shared by all accounts, each process gets an even share
+        self.scheduler = RateLimitScheduler(config.rate_limits,
+                                            share=get_rate_share(config.workers),
+                                            costs=config.rate_limit_costs)
+        # markets are loaded once per exchange and set on the exchange of every account
+        self.markets = MarketCache()
+        self._account_infos: dict[AccountKey, AccountInfo] = {}
+        self.cursor_store = CursorStore.create(database,
+                                               overlap=config.cursor_overlap,
+                                               full_rescan_interval=config.full_rescan_interval,
+                                               full_rescan=config.full_rescan)
+        self.leaderboard = Leaderboard(database)
+        # stream trades with websocket if any exchange is configured for it
+        self.fetcher_class = TradeWatcher if config.watch_exchanges else TradeFetcher
+        self.fetcher: Optional[TradeFetcher] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def get_assignment(self) -> Optional[ShardAssignment]:
+        '''wait for the next assignment, returns None on timeout or when stopped'''
+        try:
+            return self.assignments.get(timeout=1)
+        except queue.Empty:
+            return None
+
+    async def stop_fetcher(self) -> None:
+        '''cancel the running fetcher and close its exchanges'''
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            await self.fetcher.close_all()
+        self._task = None
+        self.fetcher = None
+        self._account_infos = {}
+
+    async def load_markets(self, account_info: AccountInfo) -> None:
+        '''set the shared markets on the exchange, it loads them itself if they fail to load'''
+        try:
+            await self.markets.load(account_info.exchange, self.scheduler)
+        except BaseError as error:
+            logger.warning('%s: markets of %s not loaded for %s', error,
+                           account_info.user_info.exchange_name,
+                           account_info.user_info.display_name)
+
+    async def get_account_infos(self, user_infos: list[UserInfo]) -> list[AccountInfo]:
+        '''
+        account infos of the assigned accounts, unchanged accounts keep their exchange
+        and only the new or changed ones get a new exchange with the shared markets.
+        exchanges of removed or changed accounts are closed by the fetcher reconfigure
+        '''
+        account_infos = {}
+        new_user_infos = []
+        for user_info in user_infos:
+            key = (user_info.exchange_name, user_info.api_key)
+            account_info = self._account_infos.get(key)
+            if account_info is not None and account_info.user_info == user_info:
+                account_infos[key] = account_info
+            else:
+                new_user_infos.append(user_info)
+        new_account_infos = create_account_infos(new_user_infos, self.exchange_module)
+        await asyncio.gather(*[self.load_markets(account_info)
+                               for account_info in new_account_infos])
+        for account_info in new_account_infos:
+            account_infos[get_account_key(account_info)] = account_info
+        self._account_infos = account_infos
+        return list(account_infos.values())
+
+    async def assign(self, assignment: ShardAssignment) -> None:
+        '''start the fetcher or reconfigure it with the assigned accounts'''
+        logger.info('worker %s assigned %s accounts', self.shard, len(assignment.user_infos))
+        account_infos = await self.get_account_infos(assignment.user_infos)
+        if self.fetcher:
+            # only loops of accounts and bounties that changed are restarted
+            await self.fetcher.reconfigure(account_infos, assignment.bounty_infos)
+            return
+        self.fetcher = self.fetcher_class(account_infos=account_infos,
+                                          bounty_infos=assignment.bounty_infos,
+                                          config=self.config,
+                                          database=self.database,
+                                          cursor_store=self.cursor_store,
+                                          scheduler=self.scheduler,
+                                          leaderboard=self.leaderboard)
+        self._task = asyncio.create_task(self.fetcher.start())
+
+    async def start(self) -> None:
+        '''apply assignments from the coordinator until the stop sentinel is received'''
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                assignment = await loop.run_in_executor(None, self.get_assignment)
+                if isinstance(assignment, ShardAssignment):
+                    await self.assign(assignment)
+                elif assignment == 'stop':
+                    return
+        finally:
+            await self.stop_fetcher()
+
+
+def run_worker(shard: int,
+               assignments: multiprocessing.Queue,
+               db_config: DBConfig,
+               config: CCXTConfig,
+               exchange_module_name: str = DEFAULT_EXCHANGE_MODULE) -> None:
+    '''entry point of a worker process'''
+    setup_logging(log_filename=f'./logs/worker_{shard}.log')
+
+    async def main() -> None:
+        worker = ShardWorker(shard, assignments, DataBase(db_config), config,
+                             exchange_module_name)
+        # each worker serves its own metrics on the ports following the connector
+        metrics_task = asyncio.create_task(
+            create_metrics_server('connector', offset=shard + 1).start())
+        try:
+            await worker.start()
+        finally:
+            metrics_task.cancel()
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+
+
+class ShardCoordinator:
+    '''starts the worker processes and sends them their accounts when they change'''
+
+    def __init__(self,
+                 workers: int,
+                 account_validator: AccountValidator,
+                 bounty: Bounty,
+                 db_config: DBConfig,
+                 config: CCXTConfig,
+                 exchange_module_name: str = DEFAULT_EXCHANGE_MODULE,
+                 check_interval: float = CHECK_INTERVAL) -> None:
+        self.shards = list(range(workers))
+        self.ring = HashRing(self.shards)
+        self.account_validator = account_validator
+        self.bounty = bounty
+        self.db_config = db_config
+        self.config = dataclasses.replace(config, workers=workers)
+        self.exchange_module_name = exchange_module_name
+        self.check_interval = check_interval
+        self._context = multiprocessing.get_context('spawn')
+        self._processes: dict[int, BaseProcess] = {}
+        self._queues: dict[int, multiprocessing.Queue] = {}
+        self._sent: dict[int, ShardAssignment] = {}
+
+    def start_worker(self, shard: int) -> None:
+        '''start the process of a shard, its assignment is sent again'''
+        self._queues[shard] = self._context.Queue()
+        process = self._context.Process(
+            target=run_worker,
+            args=(shard, self._queues[shard], self.db_config, self.config,
+                  self.exchange_module_name),
+            name=f'tracker_worker_{shard}',
+            daemon=True)
+        process.start()
+        self._processes[shard] = process
+        self._sent.pop(shard, None)
+        logger.info('started worker %s with pid %s', shard, process.pid)
+
+    def restart_dead_workers(self) -> None:
+        '''restart the workers that exited unexpectedly'''
+        for shard, process in self._processes.items():
+            if not process.is_alive():
+                logger.warning('worker %s exited with %s, restarting', shard, process.exitcode)
+                self.start_worker(shard)
+
+    def publish(self) -> None:
+        '''
+        send the assignment of each worker if it changed since it was last sent,
+        nothing is sent until both the accounts and the bounties have been read
+        '''
+        if self.account_validator.account_infos is None or self.bounty.info is None:
+            return
+        user_infos = [account_info.user_info
+                      for account_info in self.account_validator.account_infos]
+        assignments = partition(self.ring, self.shards, user_infos, self.bounty.info)
+        for shard, assignment in assignments.items():
+            if self._sent.get(shard) == assignment:
+                continue
+            self._queues[shard].put(assignment)
+            self._sent[shard] = assignment
+
+    async def start(self) -> None:
+        '''start workers then keep them alive and in sync with account and bounty changes'''
+        for shard in self.shards:
+            self.start_worker(shard)
+        try:
+            while True:
+                self.restart_dead_workers()
+                self.publish()
+                await asyncio.sleep(self.check_interval)
+        finally:
+            self.stop()
+
+    def stop(self, timeout: float = 10) -> None:
+        '''ask workers to stop and terminate the ones that do not'''
+        for shard, process in self._processes.items():
+            if process.is_alive():
+                self._queues[shard].put('stop')
+        for process in self._processes.values():
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
@@ -0,0 +1,142 @@
+'''
+Runs blocking database and google sheet calls in bounded thread pools
+so that the event loop keeps serving the exchanges, and measures the event loop lag
+'''
+import asyncio
+import functools
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+import numpy as np
+
+from tracker.core.metrics import EXECUTOR_PENDING, LOOP_LAG_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncExecutor:
+    '''
+    thread pool for blocking calls awaited from the event loop,
+    callers wait for a slot when max_pending calls are already queued
+    '''
+
+    def __init__(self, name: str, max_workers: int = 4, max_pending: int = 100) -> None:
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix=name)
+        # created for the running loop as an executor outlives asyncio.run in scripts
+        self._slots: dict[asyncio.AbstractEventLoop, asyncio.Semaphore] = {}
+        self.pending = 0
+        self.completed = 0
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        '''run func in a worker thread and return its result'''
+        loop = asyncio.get_running_loop()
+        if loop not in self._slots:
+            self._slots = {loop: asyncio.Semaphore(self.max_pending)}
+        async with self._slots[loop]:
+            self.pending += 1
+            try:
+                return await loop.run_in_executor(
+                    self._executor, functools.partial(func, *args, **kwargs))
+            finally:
+                self.pending -= 1
+                self.completed += 1
+
+    def shutdown(self, wait: bool = True) -> None:
+        '''stop the worker threads after the submitted calls'''
+        self._executor.shutdown(wait)
+
+
+# sqlalchemy engines are thread safe and pool a connection per worker
+database_executor = AsyncExecutor('database', max_workers=4, max_pending=200)
+# google sheet requests share a quota, one at a time keeps them ordered
+sheet_executor = AsyncExecutor('gsheet', max_workers=1, max_pending=50)
+EXECUTOR_PENDING.set_function(lambda: database_executor.pending, 'database')
+EXECUTOR_PENDING.set_function(lambda: sheet_executor.pending, 'gsheet')
+
+
+async def run_database(func: Callable, *args, **kwargs) -> Any:
+    '''run a blocking database call off the event loop'''
+    return await database_executor.run(func, *args, **kwargs)
+
+
+async def run_sheet(func: Callable, *args, **kwargs) -> Any:
+    '''run a blocking google sheet call off the event loop'''
+    return await sheet_executor.run(func, *args, **kwargs)
+
+
+class LoopLagMonitor:
+    '''
+    measures how late the event loop wakes up a task sleeping for interval,
+    a lag close to the duration of a call means the call blocked the loop
+    '''
+
+    def __init__(self,
+                 interval: float = 0.25,
+                 window: int = 2400,
+                 log_interval: float = 60,
+                 warn_lag: float = 0.5) -> None:
+        self.interval = interval
+        self.log_interval = log_interval
+        self.warn_lag = warn_lag
+        self.lags: deque[float] = deque(maxlen=window)
+        self.max_lag = 0.
+        for quantile, stat in (('0.5', 'p50'), ('0.99', 'p99'), ('1', 'max')):
+            LOOP_LAG_SECONDS.set_function(functools.partial(self.get_stat, stat), quantile)
+
+    def record(self, lag: float) -> None:
+        '''record the lag of a wake up in seconds'''
+        self.lags.append(lag)
+        self.max_lag = max(self.max_lag, lag)
+
+    def get_stats(self) -> dict[str, float]:
+        '''lag percentiles in seconds over the window and the max since start'''
+        if not self.lags:
+            return {'p50': 0., 'p99': 0., 'max': 0., 'max_since_start': self.max_lag}
+        lags = np.fromiter(self.lags, dtype=float)
+        return {'p50': float(np.percentile(lags, 50)),
+                'p99': float(np.percentile(lags, 99)),
+                'max': float(lags.max()),
+                'max_since_start': self.max_lag}
+
+    def get_stat(self, stat: str) -> float:
+        '''a single lag stat in seconds, e.g. p99'''
+        return self.get_stats()[stat]
+
+    async def start(self) -> None:
+        '''sleep for interval forever and record how late each wake up is'''
+        last_log = time.monotonic()
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self.record(max(now - started - self.interval, 0.))
+            if now - last_log >= self.log_interval:
+                last_log = now
+                stats = self.get_stats()
+                log = logger.warning if stats['max'] >= self.warn_lag else logger.info
+                log('event loop lag p50: %.3fs, p99: %.3fs, max: %.3fs, '
+                    'pending database: %s, pending sheet: %s',
+                    stats['p50'], stats['p99'], stats['max'],
+                    database_executor.pending, sheet_executor.pending)
+
+
+async def test() -> None:
+    '''module test, the lag stays low while blocking calls run in the executor'''
+    monitor = LoopLagMonitor(interval=0.01)
+    task = asyncio.create_task(monitor.start())
+    await asyncio.gather(*[run_database(time.sleep, 0.1) for _ in range(20)])
+    print('executor', monitor.get_stats())
+    time.sleep(0.3)
+    await asyncio.sleep(0.05)
+    print('blocking', monitor.get_stats())
+    task.cancel()
+
+
+if __name__ == '__main__':
+    asyncio.run(test())
@@ -1,6 +1,9 @@
 '''Initialize google connection'''
+import hashlib
+import json
 import logging
 from dataclasses import dataclass
+from typing import Any, Callable
 
 import gspread
 import gspread_dataframe as gd
@@ -34,6 +37,52 @@ class GoogleConfig:
         return cls(**config_dict)
 
 
+def values_to_dataframe(values: list[list]) -> pd.DataFrame:
+    '''dataframe of worksheet values with the first row as header, empty cells are None'''
+    if not values:
+        return pd.DataFrame()
+    header = values[0]
+    width = len(header)
+    # the sheets api omits trailing empty cells of each row
+    rows = [[None if value == '' else value for value in row[:width]] + [None] * (width - len(row))
+            for row in values[1:]]
+    dataframe = pd.DataFrame(rows, columns=header, dtype=object)
+    dataframe = dataframe.dropna(axis=0, how='all')
+    return dataframe.loc[:, [column != '' for column in dataframe.columns]]
+
+
+class WorksheetReader:
+    '''
+    reads the used range of a worksheet and parses it only when its values changed,
+    the sheets api has no revision per worksheet so the values are fingerprinted
+    '''
+
+    def __init__(self, worksheet: gspread.Worksheet, parse: Callable[[pd.DataFrame], Any]) -> None:
+        self.worksheet = worksheet
+        self.parse = parse
+        self.fingerprint: str = None
+        self.parsed: Any = None
+
+    def get_values(self) -> list[list]:
+        '''values of the used range, trailing empty rows and columns are not sent'''
+        data = self.worksheet.spreadsheet.values_get(
+            self.worksheet.title,
+            params={'valueRenderOption': 'UNFORMATTED_VALUE',
+                    'dateTimeRenderOption': 'FORMATTED_STRING'})
+        return data.get('values', [])
+
+    def read(self) -> Any:
+        '''parsed worksheet, the cached result is returned if the values are unchanged'''
+        values = self.get_values()
+        fingerprint = hashlib.sha1(json.dumps(values, default=str).encode()).hexdigest()
+        if fingerprint != self.fingerprint:
+            logger.debug('worksheet %s changed, parsing %s rows',
+                         self.worksheet.title, len(values))
+            self.parsed = self.parse(values_to_dataframe(values))
+            self.fingerprint = fingerprint
+        return self.parsed
+
+
 class GSheet:
     '''Provides the interface to google sheet'''
 
@@ -47,6 +96,7 @@ class GSheet:
             config.governor_spreadsheet_name)
         self.campaigns_ws = self.governor_ss.worksheet(config.campaigns_name)
         self.trades_ss = self.get_spreadsheet(config.trades_spreadsheet_name)
+        self._readers: dict[tuple[int, Callable], WorksheetReader] = {}
 
     @classmethod
     def create(cls, config_file_location: str = CONFIG_LOCATION) -> 'GSheet':
@@ -65,6 +115,18 @@ class GSheet:
         dataframe = dataframe.dropna(axis=1, how='all')
         return dataframe
 
+    def read_worksheet(self,
+                       worksheet: gspread.Worksheet,
+                       parse: Callable[[pd.DataFrame], Any]) -> Any:
+        '''
+        worksheet parsed by parse from a dataframe of its values,
+        the parsed objects are cached and shared until the values change
+        '''
+        key = (worksheet.id, parse)
+        if key not in self._readers:
+            self._readers[key] = WorksheetReader(worksheet, parse)
+        return self._readers[key].read()
+
     @staticmethod
     def set_sheet_with_df(worksheet: gspread.Worksheet,
                           dataframe: pd.DataFrame,
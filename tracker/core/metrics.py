@@ -0,0 +1,321 @@
+'''
+Counters, gauges and histograms of the fetch, pagination, database and sheet stages
+served in the prometheus text format on a local http endpoint.
+usage: curl http://127.0.0.1:9108/metrics
+'''
+import asyncio
+import bisect
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Iterator
+
+from tracker.core.utils import load_yml
+
+logger = logging.getLogger(__name__)
+
+CONFIG_LOCATION = './config/metrics_config.yml'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# seconds, from a fast database commit to a slow pagination
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+@dataclass
+class MetricsConfig:
+    '''metrics endpoint of each program, port 0 disables it'''
+    host: str = '127.0.0.1'
+    ports: dict[str, int] = field(default_factory=dict)  # program: port
+
+    @classmethod
+    def create(cls, config_file_location: str = CONFIG_LOCATION) -> 'MetricsConfig':
+        '''provides a default method to create metrics config class'''
+        return cls(**load_yml(config_file_location))
+
+
+def format_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    '''labels of a sample with the values escaped'''
+    if not names:
+        return ''
+    labels = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', r'\\').replace('"', r'\"')
+                         .replace('\n', r'\n'))
+        for name, value in zip(names, values))
+    return '{' + labels + '}'
+
+
+class Metric(ABC):
+    '''base of a metric with a value per combination of label values'''
+    type = 'untyped'
+
+    def __init__(self,
+                 name: str,
+                 documentation: str,
+                 labelnames: tuple[str, ...] = (),
+                 registry: 'Registry' = None) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        (REGISTRY if registry is None else registry).register(self)
+
+    def check_labels(self, labels: tuple) -> tuple[str, ...]:
+        '''label values as strings, one per label name'''
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f'{self.name} expects labels {self.labelnames}, got {labels}')
+        return tuple(str(label) for label in labels)
+
+    @abstractmethod
+    def samples(self) -> Iterator[tuple[str, tuple, tuple, float]]:
+        '''name suffix, label names, label values and value of each sample'''
+
+    def render(self) -> str:
+        '''metric in the prometheus text format'''
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        for suffix, names, values, value in self.samples():
+            lines.append(f'{self.name}{suffix}{format_labels(names, values)} {value!r}')
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    '''value that only increases'''
+    type = 'counter'
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        '''increase the value of the labels by amount'''
+        labels = self.check_labels(labels)
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.) + amount
+
+    def get(self, *labels) -> float:
+        '''current value of the labels'''
+        return self._values.get(self.check_labels(labels), 0.)
+
+    def samples(self) -> Iterator[tuple[str, tuple, tuple, float]]:
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield '_total', self.labelnames, labels, value
+
+
+class Gauge(Metric):
+    '''value that can go up and down, or computed by a function when scraped'''
+    type = 'gauge'
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._values: dict[tuple, float] = {}
+        self._functions: dict[tuple, Callable[[], float]] = {}
+
+    def set(self, value: float, *labels) -> None:
+        '''set the value of the labels'''
+        labels = self.check_labels(labels)
+        with self._lock:
+            self._values[labels] = value
+
+    def set_function(self, function: Callable[[], float], *labels) -> None:
+        '''compute the value of the labels when scraped'''
+        labels = self.check_labels(labels)
+        with self._lock:
+            self._functions[labels] = function
+
+    def remove(self, *labels) -> None:
+        '''stop exporting the labels, e.g. of an account that is not fetched anymore'''
+        labels = self.check_labels(labels)
+        with self._lock:
+            self._values.pop(labels, None)
+            self._functions.pop(labels, None)
+
+    def get(self, *labels) -> float:
+        '''current value of the labels'''
+        labels = self.check_labels(labels)
+        if labels in self._functions:
+            return float(self._functions[labels]())
+        return self._values.get(labels, 0.)
+
+    def samples(self) -> Iterator[tuple[str, tuple, tuple, float]]:
+        with self._lock:
+            values = list(self._values.items())
+            functions = list(self._functions.items())
+        for labels, value in values:
+            yield '', self.labelnames, labels, value
+        for labels, function in functions:
+            yield '', self.labelnames, labels, float(function())
+
+
+class Histogram(Metric):
+    '''count of observations per bucket with their sum, e.g. latencies'''
+    type = 'histogram'
+
+    def __init__(self, *args, buckets: tuple[float, ...] = DEFAULT_BUCKETS, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: dict[tuple, list[int]] = {}
+        self._sums: dict[tuple, float] = {}
+
+    def observe(self, value: float, *labels) -> None:
+        '''add an observation to the first bucket above value'''
+        labels = self.check_labels(labels)
+        with self._lock:
+            if labels not in self._counts:
+                # last bucket is +Inf
+                self._counts[labels] = [0] * (len(self.buckets) + 1)
+                self._sums[labels] = 0.
+            self._counts[labels][bisect.bisect_left(self.buckets, value)] += 1
+            self._sums[labels] += value
+
+    @contextmanager
+    def time(self, *labels) -> Iterator[None]:
+        '''observe the seconds spent in the block'''
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def get_count(self, *labels) -> int:
+        '''number of observations of the labels'''
+        return sum(self._counts.get(self.check_labels(labels), []))
+
+    def samples(self) -> Iterator[tuple[str, tuple, tuple, float]]:
+        with self._lock:
+            counts = {labels: list(bucket_counts)
+                      for labels, bucket_counts in self._counts.items()}
+            sums = dict(self._sums)
+        names = self.labelnames + ('le',)
+        for labels, bucket_counts in counts.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), bucket_counts):
+                cumulative += count
+                bound = '+Inf' if bound == float('inf') else repr(float(bound))
+                yield '_bucket', names, labels + (bound,), cumulative
+            yield '_sum', self.labelnames, labels, sums[labels]
+            yield '_count', self.labelnames, labels, cumulative
+
+
+class Registry:
+    '''metrics rendered together on the endpoint'''
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> None:
+        '''add a metric, names are unique'''
+        if metric.name in self._metrics:
+            raise ValueError(f'metric {metric.name} is already registered')
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        '''all metrics in the prometheus text format'''
+        return '\n'.join(metric.render() for metric in self._metrics.values()) + '\n'
+
+
+REGISTRY = Registry()
+
+# exchange requests sent through the rate limit scheduler
+EXCHANGE_REQUESTS = Counter('tracker_exchange_requests', 'requests sent to exchanges',
+                            ('exchange', 'method', 'status'))
+EXCHANGE_REQUEST_SECONDS = Histogram('tracker_exchange_request_seconds',
+                                     'latency of exchange requests', ('exchange', 'method'))
+EXCHANGE_RATE_LIMIT_WAIT_SECONDS = Histogram('tracker_exchange_rate_limit_wait_seconds',
+                                             'time waiting for a rate limit token',
+                                             ('exchange',))
+# fetch of the trades of an account for a campaign
+FETCH_SECONDS = Histogram('tracker_fetch_seconds', 'duration of a fetch of an account campaign',
+                          ('exchange',))
+FETCH_ERRORS = Counter('tracker_fetch_errors', 'fetches failed by error', ('exchange', 'error'))
+FETCH_LAST_SUCCESS = Gauge('tracker_fetch_last_success_timestamp_seconds',
+                           'unix time of the last successful fetch of an account campaign',
+                           ('exchange', 'account', 'campaign_id'))
+FETCH_LOOPS = Gauge('tracker_fetch_loops', 'running fetch loops of account campaigns')
+PAGINATION_PAGES = Histogram('tracker_pagination_pages', 'pages fetched by a pagination',
+                             ('exchange',), buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000))
+TRADES_CONVERTED = Counter('tracker_trades_converted', 'trades converted to rows',
+                           ('exchange',))
+# database calls awaited from the event loop, including the wait for a worker thread
+ROWS_UPSERTED = Counter('tracker_rows_upserted', 'rows upserted', ('table',))
+DATABASE_SECONDS = Histogram('tracker_database_seconds', 'duration of database calls',
+                             ('operation',))
+# google sheet
+SHEET_SECONDS = Histogram('tracker_sheet_seconds', 'duration of google sheet stages', ('stage',))
+# event loop
+LOOP_LAG_SECONDS = Gauge('tracker_event_loop_lag_seconds', 'event loop lag over the window',
+                         ('quantile',))
+EXECUTOR_PENDING = Gauge('tracker_executor_pending', 'blocking calls waiting or running',
+                         ('executor',))
+
+
+class MetricsServer:
+    '''serves the registry at /metrics over http'''
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 9108,
+                 registry: Registry = REGISTRY) -> None:
+        self.host = host
+        self.port = port
+        self.registry = registry
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        '''answer a single http request and close the connection'''
+        try:
+            request_line = await reader.readline()
+            # headers are not used
+            while (await reader.readline()).strip():
+                pass
+            parts = request_line.decode(errors='replace').split()
+            if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] == '/metrics':
+                status, content_type, body = '200 OK', CONTENT_TYPE, self.registry.render()
+            else:
+                status, content_type, body = '404 Not Found', 'text/plain', 'not found\n'
+            data = body.encode()
+            writer.write(f'HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n'
+                         f'Content-Length: {len(data)}\r\nConnection: close\r\n\r\n'.encode())
+            writer.write(data)
+            await writer.drain()
+        except ConnectionError as error:
+            logger.debug('metrics request failed: %s', error)
+        finally:
+            writer.close()
+
+    async def start(self) -> None:
+        '''serve until cancelled, does nothing if port is 0'''
+        if not self.port:
+            return
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        logger.info('serving metrics on http://%s:%s/metrics', self.host, self.port)
+        async with server:
+            await server.serve_forever()
+
+
+def create_metrics_server(program: str, offset: int = 0) -> MetricsServer:
+    '''metrics server of a program in config/metrics_config.yml, offset is added to its port'''
+    config = MetricsConfig.create()
+    port = config.ports.get(program, 0)
+    return MetricsServer(config.host, port + offset if port else 0)
+
+
+async def test() -> None:
+    '''module test, scrape the endpoint'''
+    registry = Registry()
+    requests = Counter('test_requests', 'requests', ('exchange',), registry=registry)
+    latency = Histogram('test_seconds', 'latency', ('exchange',), buckets=(0.1, 1),
+                        registry=registry)
+    requests.inc('okex')
+    latency.observe(0.5, 'okex')
+    server = MetricsServer(port=9199, registry=registry)
+    task = asyncio.create_task(server.start())
+    await asyncio.sleep(0.1)
+    reader, writer = await asyncio.open_connection('127.0.0.1', 9199)
+    writer.write(b'GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n')
+    print((await reader.read()).decode())
+    writer.close()
+    task.cancel()
+
+
+if __name__ == '__main__':
+    asyncio.run(test())
@@ -1,18 +1,26 @@
 '''Helper Class for database action'''
 import logging
 from dataclasses import dataclass
+from typing import Iterator
 
 import pandas as pd
-from sqlalchemy import create_engine
+from sqlalchemy import Table, create_engine, inspect
+from sqlalchemy.engine import Connection
+from sqlalchemy.pool import QueuePool, StaticPool
+from sqlalchemy.sql import Executable
 from sqlalchemy.orm.decl_api import DeclarativeMeta
 from sqlalchemy.orm import Session
 from tracker.core.utils import load_yml
 from tracker.database import tracker_orm_data, order_book_orm_data
+from tracker.database.migration import create_campaign_partitions, is_partitioned, migrate
+from tracker.database.upsert import DEFAULT_CHUNK_SIZE, UpsertResult, bulk_upsert
 
 logger = logging.getLogger(__name__)
 
 DB_TRACKER_CREDENTIAL_LOCATION = './credentials/database_config.yml'
 DB_PUBLIC_CREDENTIAL_LOCATION = './credentials/public_database_config.yml'
+# rows of each dataframe yielded by DataBase.iter_query
+DEFAULT_QUERY_CHUNK_SIZE = 100000
 
 
 @dataclass
@@ -28,6 +36,13 @@ class DBConfig:
     password: str | None = None
     #TODO: seperate orm_base for different database (tracker and public)
     base: str = 'tracker'
+    # connections kept open by the engine and opened above it under load
+    pool_size: int = 5
+    max_overflow: int = 10
+    # test connections before use, servers close idle connections
+    pool_pre_ping: bool = True
+    # seconds after which a connection is opened again
+    pool_recycle: int = 3600
 
     @classmethod
     def create(cls, config_file_location: str = DB_TRACKER_CREDENTIAL_LOCATION) -> 'DBConfig':
@@ -38,7 +53,7 @@ class DBConfig:
     def get_connector(self) -> str:
         '''get connector string'''
         if self.db_type == 'sqlite+pysqlite':
-            return f"{self.db_type}:///{self.host}"
+            return f"{self.db_type}:///{self.host or ':memory:'}"
         if self.db_type == 'postgresql':
             return (f'{self.db_type}://{self.user}:{self.password}'
                     f'@{self.host}/{self.database}'
@@ -48,21 +63,43 @@ class DBConfig:
                     f'@{self.host}/{self.database}'
                     f'?ssl_ca={self.sslrootcert}')
 
+    def get_engine_options(self) -> dict:
+        '''pool parameters of create_engine'''
+        if self.db_type.startswith('sqlite') and self.host in (None, '', ':memory:'):
+            # every connection to sqlite in memory opens its own empty database,
+            # a single connection is shared by all threads instead
+            return {'poolclass': StaticPool, 'connect_args': {'check_same_thread': False}}
+        options = {'pool_size': self.pool_size,
+                   'max_overflow': self.max_overflow,
+                   'pool_pre_ping': self.pool_pre_ping,
+                   'pool_recycle': self.pool_recycle}
+        if self.db_type.startswith('sqlite'):
+            # sqlite files are not pooled by default, a pooled connection moves between threads
+            options.update(poolclass=QueuePool, connect_args={'check_same_thread': False})
+        return options
+
 
 class DataBase:
     '''helper interface for other script'''
 
-    def __init__(self, db_config: DBConfig = DBConfig.create()):
-        '''initialize database parameters'''
+    def __init__(self, db_config: DBConfig = None):
+        '''initialize database parameters, the tracker config is loaded if not provided'''
+        db_config = db_config or DBConfig.create()
+        # partitions of the trades table are created on the first upsert of a campaign
+        self._partitioned_trades: bool = None
+        self._campaign_partitions: set[int] = set()
         self.connector = db_config.get_connector()
+        # every query of the instance reuses the connections of the engine pool
         self.engine = create_engine(
-            self.connector, echo=False, future=True)
+            self.connector, echo=False, future=True, **db_config.get_engine_options())
         # temporarily split
         if db_config.base == 'tracker':
             self.base = tracker_orm_data.Base
             # this will create a table if it does not exists in the database
             # or load the table if it exists
             self.base.metadata.create_all(self.engine)
+            # upgrade tables created by an older schema
+            migrate(self.engine)
         # temporarily split
         if db_config.base == 'public':
             self.base = order_book_orm_data.Base
@@ -70,13 +107,60 @@ class DataBase:
             # or load the table if it exists
             self.base.metadata.create_all(self.engine)
 
-    def commit_task_list_to_sql(self, task_list: list[DeclarativeMeta]) -> None:
-        '''commit list of task to database'''
-        with Session(self.engine) as session:
-            for task in task_list:
-                session.merge(task)
-            session.commit()
+    def commit_task_list_to_sql(self, task_list: list[DeclarativeMeta]) -> UpsertResult:
+        '''
+        commit list of task to database with a bulk upsert in a single transaction,
+        only the attributes set on a task are written as session.merge does
+        '''
+        rows_by_table = {}
+        for task in task_list:
+            table = task.__table__
+            values = inspect(task).dict
+            rows_by_table.setdefault(table, []).append(
+                {key: values[key] for key in table.columns.keys() if key in values})
+        for table, rows in rows_by_table.items():
+            self.create_campaign_partitions(table, rows)
+        result = UpsertResult()
+        with self.engine.begin() as connection:
+            for table, rows in rows_by_table.items():
+                result += bulk_upsert(connection, table, rows)
         logger.debug('commited: %s', task_list)
+        return result
+
+    def upsert_rows(self,
+                    SQL_class: DeclarativeMeta,  # pylint: disable=invalid-name
+                    rows: list[dict],
+                    chunk_size: int = DEFAULT_CHUNK_SIZE,
+                    count: bool = False) -> UpsertResult:
+        '''
+        insert or update rows of dictionary into the table of the orm class,
+        count: report inserted and updated rows exactly at the cost of a query per chunk
+        '''
+        self.create_campaign_partitions(SQL_class.__table__, rows)
+        with self.engine.begin() as connection:
+            result = bulk_upsert(connection, SQL_class.__table__, rows, chunk_size, count)
+        logger.debug('upserted %s into %s', result, SQL_class.__tablename__)
+        return result
+
+    def create_campaign_partitions(self, table: Table, rows: list[dict]) -> None:
+        '''
+        create the partitions of the campaigns of trade rows not yet seen when trades are
+        partitioned, otherwise their trades go to the default partition and the partition
+        of the campaign cannot be created anymore
+        '''
+        if table.name != tracker_orm_data.SQLTrade.__tablename__:
+            return
+        if self._partitioned_trades is None:
+            with self.engine.connect() as connection:
+                self._partitioned_trades = is_partitioned(connection, table.name)
+        if not self._partitioned_trades:
+            return
+        campaign_ids = {int(row['campaign_id']) for row in rows} - self._campaign_partitions
+        if campaign_ids:
+            with self.engine.begin() as connection:
+                create_campaign_partitions(connection, campaign_ids)
+            self._campaign_partitions |= campaign_ids
+            logger.info('created trades partitions of campaigns %s', sorted(campaign_ids))
 
     def replace_table_with_task(self, task: DeclarativeMeta, table: str) -> None:
         '''delete table then create a table in place of it with the task'''
@@ -87,19 +171,51 @@ class DataBase:
             session.commit()
         logger.debug('commited: %s', task)
 
-    def query_sql(self, sql_query: str, **kwargs) -> pd.DataFrame:
+    def connect(self, sql_query: str | Executable) -> Connection:
+        '''
+        connection of the engine pool to read the query with pd.read_sql_query.
+        a string is sql of the driver, e.g. with %s or ? placeholders, as pandas ran it before
+        the engine was shared, the engine only executes statements so a 1.x style connection
+        of the same pool runs it
+        '''
+        if isinstance(sql_query, str):
+            return Connection(self.engine)
+        return self.engine.connect()
+
+    def query_sql(self, sql_query: str | Executable, **kwargs) -> pd.DataFrame:
+        '''
+        get sql query and return a dataframe, chunksize returns an iterator as iter_query
+        kwargs: additional parameters for pd.read_sql_query
+        '''
+        if kwargs.get('chunksize'):
+            return self.iter_query(sql_query, kwargs.pop('chunksize'), **kwargs)
+        with self.connect(sql_query) as connection:
+            return pd.read_sql_query(sql_query, connection, **kwargs)
+
+    def iter_query(self,
+                   sql_query: str | Executable,
+                   chunk_size: int = DEFAULT_QUERY_CHUNK_SIZE,
+                   **kwargs) -> Iterator[pd.DataFrame]:
         '''
-        get sql query and return a dataframe
+        yields the rows of the query in dataframes of chunk_size rows, the rows are streamed
+        by a server side cursor where supported so the result is never held in memory at once.
+        the connection is kept until the iterator is exhausted or closed
         kwargs: additional parameters for pd.read_sql_query
         '''
-        return pd.read_sql_query(sql_query, self.connector, **kwargs)
+        with self.connect(sql_query) as connection:
+            connection = connection.execution_options(stream_results=True)
+            yield from pd.read_sql_query(sql_query, connection, chunksize=chunk_size, **kwargs)
 
     def query_table(self, table_name: str, **kwargs) -> pd.DataFrame:
         '''
-        get entire table from database
+        get entire table from database, chunksize returns an iterator of dataframes
         kwargs: additional parameters for pd.read_sql_table
         '''
-        return pd.read_sql_table(table_name, self.connector, **kwargs)
+        if kwargs.get('chunksize'):
+            return self.iter_query(self.base.metadata.tables[table_name].select(),
+                                   kwargs.pop('chunksize'), **kwargs)
+        with self.engine.connect() as connection:
+            return pd.read_sql_table(table_name, connection, **kwargs)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,166 @@
+'''
+Schema migrations of the tracker database.
+Each migration is applied once in order and recorded in the schema_version table.
+usage: python -m tracker.database.migration [--partition]
+'''
+import argparse
+import logging
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from sqlalchemy import DateTime, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+from tracker.database.tracker_orm_data import SQLSchemaVersion, SQLTrade
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Migration:
+    '''a schema change applied in a single transaction'''
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+def create_trade_indexes(connection: Connection) -> None:
+    '''create the secondary indexes of the trades table if they do not exist'''
+    for index in SQLTrade.__table__.indexes:
+        index.create(connection, checkfirst=True)
+
+
+def convert_trade_datetime(connection: Connection) -> None:
+    '''convert the datetime column of trades from iso string to a timestamp type in utc'''
+    columns = {column['name']: column['type']
+               for column in inspect(connection).get_columns(SQLTrade.__tablename__)}
+    if isinstance(columns['datetime'], DateTime):
+        return
+    dialect = connection.dialect.name
+    # datetime is recomputed from the timestamp in ms as the iso format varies by exchange
+    if dialect == 'postgresql':
+        connection.execute(text(
+            'ALTER TABLE trades ALTER COLUMN datetime TYPE TIMESTAMP(3) '
+            "USING to_timestamp(timestamp / 1000.0) AT TIME ZONE 'UTC'"))
+    elif dialect == 'mysql':
+        connection.execute(text("SET time_zone = '+00:00'"))
+        connection.execute(text('ALTER TABLE trades ADD COLUMN datetime_utc DATETIME(3)'))
+        connection.execute(text('UPDATE trades SET datetime_utc = FROM_UNIXTIME(timestamp / 1000)'))
+        connection.execute(text('ALTER TABLE trades DROP COLUMN datetime'))
+        connection.execute(text(
+            'ALTER TABLE trades CHANGE datetime_utc datetime DATETIME(3)'))
+    elif dialect == 'sqlite':
+        # sqlite has no column types, store in the format read by sqlalchemy DateTime
+        connection.execute(text(
+            "UPDATE trades SET datetime = "
+            "strftime('%Y-%m-%d %H:%M:%S', timestamp / 1000, 'unixepoch') || "
+            "printf('.%06d', (timestamp % 1000) * 1000)"))
+    else:
+        raise NotImplementedError(f'datetime migration is not supported for {dialect}')
+
+
+MIGRATIONS = [
+    Migration(1, 'add trades indexes on (campaign_id, timestamp) and (campaign_id, api_key)',
+              create_trade_indexes),
+    Migration(2, 'store trades datetime as timestamp', convert_trade_datetime),
+]
+
+
+def migrate(engine: Engine, migrations: list[Migration] = None) -> list[int]:
+    '''apply migrations not yet recorded in schema_version, returns versions applied'''
+    migrations = migrations or MIGRATIONS
+    SQLSchemaVersion.__table__.create(engine, checkfirst=True)
+    with engine.connect() as connection:
+        applied = set(connection.execute(select(SQLSchemaVersion.version)).scalars())
+    applied_versions = []
+    for migration in sorted(migrations, key=lambda migration: migration.version):
+        if migration.version in applied:
+            continue
+        with engine.begin() as connection:
+            migration.upgrade(connection)
+            connection.execute(SQLSchemaVersion.__table__.insert().values(
+                version=migration.version,
+                description=migration.description,
+                applied_at=int(time.time() * 1000)))
+        logger.info('applied migration %s: %s', migration.version, migration.description)
+        applied_versions.append(migration.version)
+    return applied_versions
+
+
+def partition_trades_by_campaign(engine: Engine) -> None:
+    '''
+    recreate trades as a table partitioned by campaign_id on postgresql,
+    existing campaigns get their own partition and DataBase creates the partition
+    of a new campaign before its first trades are upserted
+    '''
+    if engine.dialect.name != 'postgresql':
+        raise NotImplementedError('partitioning is only supported on postgresql')
+    with engine.begin() as connection:
+        connection.execute(text(
+            'CREATE TABLE trades_partitioned (LIKE trades INCLUDING DEFAULTS) '
+            'PARTITION BY LIST (campaign_id)'))
+        connection.execute(text(
+            'ALTER TABLE trades_partitioned ADD PRIMARY KEY '
+            '(exchange_name, id, "takerOrMaker", campaign_id)'))
+        campaign_ids = connection.execute(
+            text('SELECT DISTINCT campaign_id FROM trades')).scalars().all()
+        for campaign_id in campaign_ids:
+            create_campaign_partition(connection, campaign_id, 'trades_partitioned')
+        connection.execute(text(
+            'CREATE TABLE trades_default PARTITION OF trades_partitioned DEFAULT'))
+        connection.execute(text('INSERT INTO trades_partitioned SELECT * FROM trades'))
+        connection.execute(text('DROP TABLE trades'))
+        connection.execute(text('ALTER TABLE trades_partitioned RENAME TO trades'))
+        # indexes on the partitioned table are created on every partition
+        create_trade_indexes(connection)
+    logger.info('trades partitioned into %s campaigns', len(campaign_ids))
+
+
+def create_campaign_partition(connection: Connection,
+                              campaign_id: int,
+                              table_name: str = 'trades') -> None:
+    '''
+    create the partition of a campaign on the partitioned trades table,
+    must be created before trades of the campaign are inserted into the default partition
+    '''
+    campaign_id = int(campaign_id)
+    connection.execute(text(
+        f'CREATE TABLE IF NOT EXISTS trades_campaign_{campaign_id} '
+        f'PARTITION OF {table_name} FOR VALUES IN ({campaign_id})'))
+
+
+def is_partitioned(connection: Connection, table_name: str = 'trades') -> bool:
+    '''whether the table is partitioned, only postgresql tables are partitioned'''
+    if connection.dialect.name != 'postgresql':
+        return False
+    return connection.execute(text(
+        'SELECT EXISTS (SELECT 1 FROM pg_partitioned_table JOIN pg_class '
+        'ON pg_class.oid = pg_partitioned_table.partrelid '
+        'WHERE pg_class.relname = :table_name)'), {'table_name': table_name}).scalar()
+
+
+def create_campaign_partitions(connection: Connection, campaign_ids: set[int]) -> None:
+    '''create the partitions of campaigns, processes writing the same campaign wait for each other'''
+    connection.execute(text("SELECT pg_advisory_xact_lock(hashtext('trades_partitions'))"))
+    for campaign_id in sorted(campaign_ids):
+        create_campaign_partition(connection, campaign_id)
+
+
+def main() -> None:
+    '''apply pending migrations to the tracker database'''
+    # pylint: disable=import-outside-toplevel
+    from tracker.core.logger import setup_logging
+    from tracker.database.database import DataBase
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--partition', action='store_true',
+                        help='partition trades by campaign_id, postgresql only')
+    args = parser.parse_args()
+    setup_logging(log_filename=None)
+    database = DataBase()
+    print('applied:', migrate(database.engine))
+    if args.partition:
+        partition_trades_by_campaign(database.engine)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+'''
+Binary encoding of order book snapshots.
+Prices and sizes are stored as int64, scaled by the smallest power of ten that is lossless,
+or as the bits of the float64 otherwise.
+Prices are differenced along the levels of each side, which is constant on a tick grid.
+Sizes are either stored as is in a keyframe or as the difference to the previous snapshot.
+The bytes are shuffled and compressed with zlib.
+'''
+import logging
+import struct
+import zlib
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+import numpy as np
+from sqlalchemy import and_, func, select
+from tracker.database.database import DataBase
+from tracker.database.order_book_orm_data import SQLOrderBookSnapshot
+
+logger = logging.getLogger(__name__)
+
+VERSION = 1
+# version, flags, bid count, ask count, price scale, size scale
+HEADER = struct.Struct('<BBIIbb')
+FLAG_DELTA = 1
+FLAG_COMPRESSED = 2
+# scale of values stored as float64 bits
+FLOAT_SCALE = -1
+MAX_SCALE = 12
+LEVEL_DTYPE = np.dtype('<f8')
+VALUE_DTYPE = np.dtype('<i8')
+
+
+@dataclass
+class DecodedOrderBook:
+    '''order book levels as an array of (price, size), bids followed by asks'''
+    levels: np.ndarray
+    bid_count: int
+
+    @property
+    def bids(self) -> np.ndarray:
+        '''bids from the best price'''
+        return self.levels[:self.bid_count]
+
+    @property
+    def asks(self) -> np.ndarray:
+        '''asks from the best price'''
+        return self.levels[self.bid_count:]
+
+    def truncate(self, depth: Optional[int]) -> 'DecodedOrderBook':
+        '''keep only depth levels on each side'''
+        if depth is None:
+            return self
+        bids, asks = self.bids[:depth], self.asks[:depth]
+        return DecodedOrderBook(np.concatenate([bids, asks]), len(bids))
+
+
+def to_levels(levels: list, depth: int = None) -> np.ndarray:
+    '''convert ccxt levels to a (n, 2) float64 array, dropping the extra fields of some exchanges'''
+    levels = levels[:depth]
+    if not levels:
+        return np.empty((0, 2), dtype=LEVEL_DTYPE)
+    return np.array([level[:2] for level in levels], dtype=LEVEL_DTYPE)
+
+
+def to_integers(values: np.ndarray) -> tuple[np.ndarray, int]:
+    '''
+    returns values as int64 and the decimal scale to recover them exactly,
+    the float64 bits with FLOAT_SCALE if no scale is lossless
+    '''
+    for scale in range(MAX_SCALE + 1):
+        integers = np.rint(values * 10. ** scale)
+        if (np.abs(integers) < 2 ** 53).all() and np.array_equal(integers / 10. ** scale, values):
+            return integers.astype(VALUE_DTYPE), scale
+    return values.view(VALUE_DTYPE), FLOAT_SCALE
+
+
+def from_integers(integers: np.ndarray, scale: int) -> np.ndarray:
+    '''inverse of to_integers'''
+    if scale == FLOAT_SCALE:
+        return integers.view(LEVEL_DTYPE)
+    return integers / 10. ** scale
+
+
+def diff_sides(values: np.ndarray, bid_count: int) -> np.ndarray:
+    '''difference between consecutive levels of each side, wrapping on overflow'''
+    return np.concatenate([np.diff(values[:bid_count], prepend=0),
+                           np.diff(values[bid_count:], prepend=0)])
+
+
+def cumsum_sides(values: np.ndarray, bid_count: int) -> np.ndarray:
+    '''inverse of diff_sides'''
+    return np.concatenate([np.cumsum(values[:bid_count]), np.cumsum(values[bid_count:])])
+
+
+def shuffle(array: np.ndarray) -> bytes:
+    '''group the n-th byte of every value together so that zlib finds the repeated bytes'''
+    return array.view(np.uint8).reshape(-1, array.itemsize).T.tobytes()
+
+
+def unshuffle(data: bytes, dtype: np.dtype) -> np.ndarray:
+    '''inverse of shuffle'''
+    array = np.frombuffer(data, dtype=np.uint8).reshape(dtype.itemsize, -1)
+    return np.ascontiguousarray(array.T).view(dtype).ravel()
+
+
+class OrderBookEncoder:
+    '''
+    encodes the snapshots of a market in order,
+    delta encoded snapshots can only be decoded after the previous snapshots
+    '''
+
+    def __init__(self,
+                 depth: int = None,
+                 keyframe_interval: int = 60,
+                 delta: bool = True,
+                 compress: bool = True,
+                 compress_level: int = 6) -> None:
+        self.depth = depth
+        self.keyframe_interval = keyframe_interval
+        self.delta = delta
+        self.compress = compress
+        self.compress_level = compress_level
+        # sizes and scale of the previous snapshot
+        self._previous: Optional[tuple[np.ndarray, int]] = None
+        self._since_keyframe = 0
+
+    def encode(self, bids: list, asks: list) -> tuple[bytes, DecodedOrderBook, bool]:
+        '''returns the encoded snapshot, its levels and if it is a keyframe'''
+        bids, asks = to_levels(bids, self.depth), to_levels(asks, self.depth)
+        book = DecodedOrderBook(np.concatenate([bids, asks]), len(bids))
+        prices, price_scale = to_integers(book.levels[:, 0].copy())
+        sizes, size_scale = to_integers(book.levels[:, 1].copy())
+        previous = self._previous
+        keyframe = (not self.delta or
+                    previous is None or
+                    previous[0].shape != sizes.shape or
+                    previous[1] != size_scale or
+                    self._since_keyframe >= self.keyframe_interval)
+        self._previous = (sizes, size_scale)
+        flags = 0
+        if not keyframe:
+            sizes = sizes - previous[0]
+            flags |= FLAG_DELTA
+        values = np.concatenate([diff_sides(prices, book.bid_count), sizes])
+        if self.compress:
+            body = zlib.compress(shuffle(values), self.compress_level)
+            flags |= FLAG_COMPRESSED
+        else:
+            body = values.tobytes()
+        self._since_keyframe = 0 if keyframe else self._since_keyframe + 1
+        header = HEADER.pack(VERSION, flags, len(bids), len(asks), price_scale, size_scale)
+        return header + body, book, keyframe
+
+    def reset(self) -> None:
+        '''start with a keyframe, e.g. when a snapshot failed to be stored'''
+        self._previous = None
+
+
+class OrderBookDecoder:
+    '''decodes the snapshots of a market in the order they were encoded'''
+
+    def __init__(self) -> None:
+        self._previous_sizes: Optional[np.ndarray] = None
+
+    def decode(self, data: bytes) -> DecodedOrderBook:
+        '''
+        decode a snapshot into a (price, size) array,
+        uncompressed values are read from data without copy
+        '''
+        version, flags, bid_count, ask_count, price_scale, size_scale = HEADER.unpack_from(data)
+        if version != VERSION:
+            raise ValueError(f'unsupported order book encoding version {version}')
+        body = memoryview(data)[HEADER.size:]
+        if flags & FLAG_COMPRESSED:
+            values = unshuffle(zlib.decompress(body), VALUE_DTYPE)
+        else:
+            values = np.frombuffer(body, dtype=VALUE_DTYPE)
+        level_count = bid_count + ask_count
+        prices = cumsum_sides(values[:level_count], bid_count)
+        sizes = values[level_count:]
+        if flags & FLAG_DELTA:
+            if self._previous_sizes is None or self._previous_sizes.size != sizes.size:
+                raise ValueError('delta encoded snapshot without its previous snapshot')
+            sizes = sizes + self._previous_sizes
+        self._previous_sizes = sizes
+        levels = np.empty((level_count, 2), dtype=LEVEL_DTYPE)
+        levels[:, 0] = from_integers(prices, price_scale)
+        levels[:, 1] = from_integers(sizes, size_scale)
+        return DecodedOrderBook(levels, bid_count)
+
+
+def read_order_books(database: DataBase,
+                     exchange_id: str,
+                     symbol: str,
+                     start_time: int,
+                     end_time: int,
+                     depth: int = None) -> Iterator[tuple[int, DecodedOrderBook]]:
+    '''
+    yields (timestamp, order book) of a market between start and end time in ms,
+    decoding from the last keyframe before start time
+    '''
+    market = and_(SQLOrderBookSnapshot.exchange_id == exchange_id,
+                  SQLOrderBookSnapshot.symbol == symbol)
+    keyframe_time = (select(func.max(SQLOrderBookSnapshot.timestamp))
+                     .where(market, SQLOrderBookSnapshot.keyframe,
+                            SQLOrderBookSnapshot.timestamp <= start_time)
+                     .scalar_subquery())
+    query = (select(SQLOrderBookSnapshot.timestamp, SQLOrderBookSnapshot.data)
+             .where(market,
+                    SQLOrderBookSnapshot.timestamp >= func.coalesce(keyframe_time, start_time),
+                    SQLOrderBookSnapshot.timestamp <= end_time)
+             .order_by(SQLOrderBookSnapshot.timestamp))
+    decoder = OrderBookDecoder()
+    with database.engine.connect() as connection:
+        for timestamp, data in connection.execute(query):
+            book = decoder.decode(data)
+            if timestamp >= start_time:
+                yield timestamp, book.truncate(depth)
+
+
+def test() -> None:
+    '''module test'''
+    rng = np.random.default_rng(0)
+    encoder, decoder = OrderBookEncoder(depth=50, keyframe_interval=10), OrderBookDecoder()
+    for _ in range(30):
+        mid = 0.02 + rng.normal(0, 1e-5)
+        bids = [[mid - i * 1e-5, float(rng.integers(1, 1e5))] for i in range(100)]
+        asks = [[mid + i * 1e-5, float(rng.integers(1, 1e5))] for i in range(100)]
+        data, book, keyframe = encoder.encode(bids, asks)
+        decoded = decoder.decode(data)
+        assert np.array_equal(decoded.levels, book.levels)
+        print(len(data), keyframe)
+
+
+if __name__ == '__main__':
+    test()
@@ -1,5 +1,5 @@
 '''Contains trade object relational mapper'''
-from sqlalchemy import BigInteger, Column, String, Text
+from sqlalchemy import BigInteger, Boolean, Column, Integer, LargeBinary, String, Text
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm.decl_api import DeclarativeMeta
 
@@ -14,3 +14,16 @@ class SQLOrderBook(Base):
     symbol = Column(String(100), primary_key=True, nullable=False)
     bids = Column(Text(4294000000))
     asks = Column(Text(4294000000))
+
+
+class SQLOrderBookSnapshot(Base):
+    '''sql orderbook snapshot schema, levels are encoded with order_book_codec'''
+    __tablename__ = "order_book_snapshot"
+    timestamp = Column(BigInteger, primary_key=True, nullable=False)
+    exchange_id = Column(String(100), primary_key=True, nullable=False)
+    symbol = Column(String(100), primary_key=True, nullable=False)
+    # snapshots are decoded from the last keyframe as the others are delta encoded
+    keyframe = Column(Boolean, nullable=False)
+    bid_count = Column(Integer)
+    ask_count = Column(Integer)
+    data = Column(LargeBinary(4294000000))
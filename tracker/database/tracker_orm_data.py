@@ -1,5 +1,5 @@
 '''Contains trade object relational mapper'''
-from sqlalchemy import BigInteger, Column, Float, Integer, String
+from sqlalchemy import BigInteger, Boolean, Column, DateTime, Float, Index, Integer, String
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm.decl_api import DeclarativeMeta
 
@@ -10,6 +10,11 @@ class SQLTrade(Base):
     '''sql trade schema'''
     # exchange_name + id + takerorMaker can be used to detect duplicated trade/wash trading
     __tablename__ = "trades"
+    # every consumer filters by campaign with a time range or an account
+    __table_args__ = (
+        Index('ix_trades_campaign_id_timestamp', 'campaign_id', 'timestamp'),
+        Index('ix_trades_campaign_id_api_key', 'campaign_id', 'api_key'),
+    )
     exchange_name = Column(String, primary_key=True)
     id = Column(String, primary_key=True)
     takerOrMaker = Column(String, primary_key=True)
@@ -22,11 +27,159 @@ class SQLTrade(Base):
     payout_address = Column(String)
     api_key: str = Column(String)
 
-    # trade details
-    datetime = Column(String)
+    # trade details, datetime in utc
+    datetime = Column(DateTime)
     timestamp = Column(BigInteger)
     symbol = Column(String)
     side = Column(String)
     price = Column(Float)
     amount = Column(Float)
     cost = Column(Float)
+
+
+class SQLTradeCursor(Base):
+    '''sql trade cursor schema, high water mark of trades fetched per account and campaign'''
+    __tablename__ = "trade_cursors"
+    exchange_name = Column(String, primary_key=True)
+    api_key = Column(String, primary_key=True)
+    campaign_id = Column(Integer, primary_key=True)
+    market = Column(String, primary_key=True)
+
+    # wall clock time in ms up to which the trades have been fetched
+    fetched_until = Column(BigInteger)
+    # latest trade seen for the account market
+    last_timestamp = Column(BigInteger)
+    last_id = Column(String)
+    # wall clock time in ms of the last fetch starting from campaign start
+    last_full_scan = Column(BigInteger)
+
+
+class SQLLeaderboard(Base):
+    '''sql leaderboard schema, trades aggregated per campaign participant'''
+    __tablename__ = "leaderboard"
+    campaign_id = Column(Integer, primary_key=True)
+    api_key = Column(String, primary_key=True)
+
+    display_name = Column(String)
+    payout_address = Column(String)
+
+    # sum of amount and cost of trades by maker or taker
+    maker_volume = Column(Float)
+    taker_volume = Column(Float)
+    maker_cost = Column(Float)
+    taker_cost = Column(Float)
+    maker_count = Column(Integer)
+    taker_count = Column(Integer)
+    updated_at = Column(BigInteger)
+
+
+class SQLSchemaVersion(Base):
+    '''sql schema version schema, migrations applied to the database'''
+    __tablename__ = "schema_version"
+    version = Column(Integer, primary_key=True)
+    description = Column(String)
+    applied_at = Column(BigInteger)
+
+
+class SQLLiquidityMetric(Base):
+    '''sql liquidity metric schema, time weighted order book metrics per market and time bucket'''
+    __tablename__ = "liquidity_metrics"
+    # same names as the bounty info to join with the campaign market
+    exchange_name = Column(String, primary_key=True)
+    symbol = Column(String, primary_key=True)
+    bucket_start = Column(BigInteger, primary_key=True)
+    bucket_end = Column(BigInteger)
+
+    snapshot_count = Column(Integer)
+    # share of the bucket covered by valid snapshots
+    coverage = Column(Float)
+    mid_price = Column(Float)
+    spread_bps = Column(Float)
+    # quote notional of the levels within bps of the mid price
+    bid_depth_10bps = Column(Float)
+    ask_depth_10bps = Column(Float)
+    bid_depth_50bps = Column(Float)
+    ask_depth_50bps = Column(Float)
+    bid_depth_100bps = Column(Float)
+    ask_depth_100bps = Column(Float)
+    bid_depth_200bps = Column(Float)
+    ask_depth_200bps = Column(Float)
+    updated_at = Column(BigInteger)
+
+
+class SQLCounterpartyPair(Base):
+    '''sql counterparty pair schema, fills between two participants of a campaign'''
+    __tablename__ = "counterparty_pairs"
+    campaign_id = Column(Integer, primary_key=True)
+    maker_api_key = Column(String, primary_key=True)
+    taker_api_key = Column(String, primary_key=True)
+
+    # same api key or payout address on both sides
+    self_match = Column(Boolean)
+    # sum of amount and cost of the fills
+    volume = Column(Float)
+    cost = Column(Float)
+    count = Column(Integer)
+    updated_at = Column(BigInteger)
+
+
+class SQLWashTradeFlag(Base):
+    '''sql wash trade flag schema, share of the maker volume filled by other participants'''
+    __tablename__ = "wash_trade_flags"
+    campaign_id = Column(Integer, primary_key=True)
+    api_key = Column(String, primary_key=True)
+
+    display_name = Column(String)
+    payout_address = Column(String)
+
+    maker_volume = Column(Float)
+    # maker volume whose taker is a participant of the campaign, including itself
+    intra_cohort_volume = Column(Float)
+    self_match_volume = Column(Float)
+    intra_cohort_share = Column(Float)
+    self_match_share = Column(Float)
+    flagged = Column(Boolean)
+    # comma separated rules exceeded, e.g. intra_cohort,self_match
+    reason = Column(String)
+    updated_at = Column(BigInteger)
+
+
+class SQLTradeRollup(Base):
+    '''sql trade rollup schema, trades aggregated per campaign participant and time bucket'''
+    __tablename__ = "trade_rollups"
+    campaign_id = Column(Integer, primary_key=True)
+    api_key = Column(String, primary_key=True)
+    bucket_start = Column(BigInteger, primary_key=True)
+
+    display_name = Column(String)
+    payout_address = Column(String)
+
+    # sum of amount and cost of trades by maker or taker in the bucket
+    maker_volume = Column(Float)
+    taker_volume = Column(Float)
+    maker_cost = Column(Float)
+    taker_cost = Column(Float)
+    maker_count = Column(Integer)
+    taker_count = Column(Integer)
+    updated_at = Column(BigInteger)
+
+
+class SQLRewardPayout(Base):
+    '''sql reward payout schema, reward of each campaign participant under the scoring rules'''
+    __tablename__ = "reward_payouts"
+    campaign_id = Column(Integer, primary_key=True)
+    api_key = Column(String, primary_key=True)
+
+    display_name = Column(String)
+    payout_address = Column(String)
+
+    maker_volume = Column(Float)
+    taker_volume = Column(Float)
+    # volume weighted and capped by the scoring rules
+    score = Column(Float)
+    reward_share = Column(Float)
+    reward = Column(Float)
+    reward_currency = Column(String)
+    # flagged by the wash trade detection
+    excluded = Column(Boolean)
+    updated_at = Column(BigInteger)
@@ -0,0 +1,134 @@
+'''
+Dialect aware bulk upsert used in place of a per row session.merge
+supports postgresql, mysql and sqlite
+'''
+import logging
+from dataclasses import dataclass
+
+from sqlalchemy import Table, literal_column, select, tuple_
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql.expression import Insert
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1000
+# xmax is 0 for a row version created by an insert and set for one created by an update
+INSERTED_COLUMN = literal_column('(xmax = 0)')
+
+
+@dataclass
+class UpsertResult:
+    '''
+    number of rows inserted and updated by an upsert,
+    written counts the rows whose split between inserted and updated was not counted
+    '''
+    inserted: int = 0
+    updated: int = 0
+    written: int = 0
+
+    def __add__(self, other: 'UpsertResult') -> 'UpsertResult':
+        return UpsertResult(self.inserted + other.inserted,
+                            self.updated + other.updated,
+                            self.written + other.written)
+
+    @property
+    def total(self) -> int:
+        '''total rows written'''
+        return self.inserted + self.updated + self.written
+
+
+def create_upsert_statement(table: Table, dialect_name: str, columns: list[str]) -> Insert:
+    '''create an insert statement that updates the non primary key columns on conflict'''
+    primary_keys = [column.name for column in table.primary_key.columns]
+    update_columns = [column for column in columns if column not in primary_keys]
+    if dialect_name in ('postgresql', 'sqlite'):
+        dialect = postgresql if dialect_name == 'postgresql' else sqlite
+        statement = dialect.insert(table)
+        if not update_columns:
+            return statement.on_conflict_do_nothing(index_elements=primary_keys)
+        return statement.on_conflict_do_update(
+            index_elements=primary_keys,
+            set_={column: statement.excluded[column] for column in update_columns})
+    if dialect_name == 'mysql':
+        statement = mysql.insert(table)
+        # updating a primary key to itself is a no-op when there is nothing else to update
+        update_columns = update_columns or primary_keys[:1]
+        return statement.on_duplicate_key_update(
+            {column: statement.inserted[column] for column in update_columns})
+    raise NotImplementedError(f'upsert is not supported for {dialect_name}')
+
+
+def deduplicate_rows(rows: list[dict], primary_keys: list[str]) -> dict[tuple, dict]:
+    '''keep the last row of each primary key, a statement cannot update the same row twice'''
+    return {tuple(row[key] for key in primary_keys): row for row in rows}
+
+
+def count_existing_rows(connection: Connection, table: Table, keys: list[tuple]) -> int:
+    '''count rows in table with the primary keys given using a single query'''
+    primary_key_columns = list(table.primary_key.columns)
+    query = select(*primary_key_columns).where(
+        tuple_(*primary_key_columns).in_(keys))
+    return len(connection.execute(query).all())
+
+
+def upsert_chunk(connection: Connection,
+                 table: Table,
+                 statement: Insert,
+                 chunk: dict[tuple, dict],
+                 count: bool) -> UpsertResult:
+    '''
+    upsert a chunk of rows by primary key. postgresql returns whether each row was inserted
+    from a single multi values statement, the other dialects query the existing keys first
+    if count, their rowcount does not tell inserted from updated rows
+    '''
+    rows = list(chunk.values())
+    if connection.dialect.name == 'postgresql':
+        inserted = connection.execute(
+            statement.values(rows).returning(INSERTED_COLUMN)).scalars().all()
+        # rows skipped by on conflict do nothing are not returned
+        return UpsertResult(inserted=sum(inserted), updated=len(inserted) - sum(inserted))
+    if not count:
+        connection.execute(statement, rows)
+        return UpsertResult(written=len(rows))
+    existing = count_existing_rows(connection, table, list(chunk))
+    connection.execute(statement, rows)
+    return UpsertResult(inserted=len(rows) - existing, updated=existing)
+
+
+def group_by_columns(table: Table, rows: dict[tuple, dict]) -> dict[tuple, dict[tuple, dict]]:
+    '''
+    rows restricted to the table columns grouped by the columns they set,
+    executemany requires every row to have the same keys
+    and a column missing from a row must not be written as null
+    '''
+    groups = {}
+    for key, row in rows.items():
+        row = {column.name: row[column.name] for column in table.columns if column.name in row}
+        groups.setdefault(tuple(row), {})[key] = row
+    return groups
+
+
+def bulk_upsert(connection: Connection,
+                table: Table,
+                rows: list[dict],
+                chunk_size: int = DEFAULT_CHUNK_SIZE,
+                count: bool = False) -> UpsertResult:
+    '''
+    upsert rows of dictionary into table in chunks with executemany,
+    only the columns of a row are written so an existing row keeps the columns it does not set.
+    count: query existing keys per chunk to report inserted and updated rows exactly,
+           rows are reported as written if False. postgresql always reports the split
+    '''
+    result = UpsertResult()
+    if not rows:
+        return result
+    primary_keys = [column.name for column in table.primary_key.columns]
+    for columns, unique_rows in group_by_columns(table, deduplicate_rows(rows, primary_keys)).items():
+        statement = create_upsert_statement(table, connection.dialect.name, list(columns))
+        keys = list(unique_rows)
+        for i in range(0, len(keys), chunk_size):
+            chunk = {key: unique_rows[key] for key in keys[i:i + chunk_size]}
+            result += upsert_chunk(connection, table, statement, chunk, count)
+    logger.debug('upsert %s: %s', table.name, result)
+    return result
@@ -0,0 +1,86 @@
+'''
+Materialized leaderboard of each campaign, aggregated in the database with group by
+and updated for the participants whose trades were upserted.
+The rewards are not computed here, they are read from the payouts of the reward engine.
+'''
+import logging
+import time
+
+import pandas as pd
+from sqlalchemy import case, func, select
+from sqlalchemy.sql import Select
+from tracker.bounty.bounty import BountyInfo
+from tracker.database.database import DataBase
+from tracker.database.tracker_orm_data import SQLLeaderboard, SQLRewardPayout, SQLTrade
+
+logger = logging.getLogger(__name__)
+
+
+def create_aggregate_query(campaign_id: int, api_keys: list[str] = None) -> Select:
+    '''group trades of campaign by participant, only for api_keys if provided'''
+    is_maker = SQLTrade.takerOrMaker == 'maker'
+    is_taker = SQLTrade.takerOrMaker == 'taker'
+    query = (
+        select(SQLTrade.campaign_id,
+               SQLTrade.api_key,
+               func.max(SQLTrade.display_name).label('display_name'),
+               func.max(SQLTrade.payout_address).label('payout_address'),
+               func.sum(case((is_maker, SQLTrade.amount), else_=0)).label('maker_volume'),
+               func.sum(case((is_taker, SQLTrade.amount), else_=0)).label('taker_volume'),
+               func.sum(case((is_maker, SQLTrade.cost), else_=0)).label('maker_cost'),
+               func.sum(case((is_taker, SQLTrade.cost), else_=0)).label('taker_cost'),
+               func.sum(case((is_maker, 1), else_=0)).label('maker_count'),
+               func.sum(case((is_taker, 1), else_=0)).label('taker_count'))
+        .where(SQLTrade.campaign_id == campaign_id)
+        .group_by(SQLTrade.campaign_id, SQLTrade.api_key))
+    if api_keys is not None:
+        query = query.where(SQLTrade.api_key.in_(api_keys))
+    return query
+
+
+class Leaderboard:
+    '''updates and reads the leaderboard table'''
+
+    def __init__(self, database: DataBase) -> None:
+        self.database = database
+
+    def refresh(self, bounty_info: BountyInfo, api_keys: list[str] = None) -> pd.DataFrame:
+        '''recompute the aggregates of participants in api_keys, or all if not provided'''
+        campaign_id = bounty_info.campaign_id
+        aggregates = self.database.query_sql(create_aggregate_query(campaign_id, api_keys))
+        aggregates['updated_at'] = int(time.time() * 1000)
+        self.database.upsert_rows(SQLLeaderboard, aggregates.to_dict('records'))
+        logger.debug('leaderboard %s refreshed for %s participants',
+                     campaign_id, len(aggregates))
+        return self.get_leaderboard_df(campaign_id)
+
+    def get_leaderboard_df(self, campaign_id: int = None) -> pd.DataFrame:
+        '''
+        get leaderboard of campaign, or all campaigns, ordered by maker volume
+        with the reward of the participants paid by the reward engine
+        '''
+        payout = SQLRewardPayout.__table__.c
+        query = (select(SQLLeaderboard.__table__,
+                        payout.reward_share, payout.reward, payout.reward_currency)
+                 .outerjoin(SQLRewardPayout.__table__,
+                            (payout.campaign_id == SQLLeaderboard.campaign_id) &
+                            (payout.api_key == SQLLeaderboard.api_key))
+                 .order_by(
+            SQLLeaderboard.campaign_id, SQLLeaderboard.maker_volume.desc()))
+        if campaign_id is not None:
+            query = query.where(SQLLeaderboard.campaign_id == campaign_id)
+        return self.database.query_sql(query)
+
+
+def test() -> None:
+    '''module test'''
+    # pylint: disable=import-outside-toplevel
+    from tracker.bounty.bounty import get_active_bounty_infos
+    from tracker.core.gsheet import GSheet
+    leaderboard = Leaderboard(DataBase())
+    for bounty_info in get_active_bounty_infos(GSheet.create()):
+        print(leaderboard.refresh(bounty_info))
+
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,36 @@
+'''get liquidity config'''
+import logging
+from dataclasses import dataclass
+from typing import Optional
+
+from tracker.core.utils import load_yml
+
+logger = logging.getLogger(__name__)
+
+CONFIG_LOCATION = './config/liquidity_config.yml'
+
+
+@dataclass
+class LiquidityConfig:
+    '''defines the config file attributes'''
+    bucket_interval: float = 3600  # seconds per metric bucket
+    max_gap: float = 180  # seconds a snapshot is valid without a newer snapshot
+    depth: Optional[int] = None  # levels on each side of the book
+    chunk_interval: float = 604800  # seconds of snapshots loaded at once
+    update_interval: float = 3600  # seconds between metric updates
+
+    @classmethod
+    def create(cls, config_file_location=CONFIG_LOCATION) -> 'LiquidityConfig':
+        '''provides a default method to create liquidity config class'''
+        config = load_yml(config_file_location)
+        return cls(**config)
+
+
+def test() -> None:
+    '''module test'''
+    config = LiquidityConfig.create()
+    print(config)
+
+
+if __name__ == '__main__':
+    test()
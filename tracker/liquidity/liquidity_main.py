@@ -0,0 +1,19 @@
+'''starts the liquidity metrics of stored order books'''
+import asyncio
+
+from tracker.core.logger import setup_logging
+from tracker.database.database import DB_PUBLIC_CREDENTIAL_LOCATION, DataBase, DBConfig
+from tracker.liquidity.get_config import LiquidityConfig
+from tracker.liquidity.metrics import LiquidityMetrics
+
+
+async def main() -> None:
+    '''starts the liquidity metrics update loop'''
+    logger = setup_logging()
+    logger.info('starting liquidity metrics')
+    public_database = DataBase(DBConfig.create(DB_PUBLIC_CREDENTIAL_LOCATION))
+    liquidity_metrics = LiquidityMetrics(public_database, DataBase(), LiquidityConfig.create())
+    await liquidity_metrics.start()
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,223 @@
+'''
+Liquidity metrics of stored order book snapshots.
+Snapshots are padded into (snapshots, levels, 2) arrays so that the spread and the depth
+within bps of the mid price are computed for every snapshot at once,
+then averaged per time bucket weighted by the time each snapshot was quoted.
+'''
+import asyncio
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, select
+from tracker.core.async_io import run_database
+from tracker.database.database import DataBase
+from tracker.database.order_book_codec import DecodedOrderBook, read_order_books
+from tracker.database.order_book_orm_data import SQLOrderBookSnapshot
+from tracker.database.tracker_orm_data import SQLLiquidityMetric
+from tracker.liquidity.get_config import LiquidityConfig
+
+logger = logging.getLogger(__name__)
+
+# depth columns of SQLLiquidityMetric
+DEPTH_BPS = (10, 50, 100, 200)
+# distance to mid price of levels not counted in any depth
+MAX_BPS = 10000
+BPS_TOLERANCE = 1e-6
+
+
+def pad_books(books: list[DecodedOrderBook], depth: int = None) -> tuple[np.ndarray, np.ndarray]:
+    '''stack books into bids and asks arrays of (snapshots, depth, 2) padded with nan'''
+    if depth is None:
+        depth = max((max(len(book.bids), len(book.asks)) for book in books), default=0)
+    bids = np.full((len(books), max(depth, 1), 2), np.nan)
+    asks = np.full((len(books), max(depth, 1), 2), np.nan)
+    for i, book in enumerate(books):
+        book_bids, book_asks = book.bids[:depth], book.asks[:depth]
+        bids[i, :len(book_bids)] = book_bids
+        asks[i, :len(book_asks)] = book_asks
+    return bids, asks
+
+
+def side_depth(levels: np.ndarray,
+               mid: np.ndarray,
+               depth_bps: np.ndarray,
+               is_bid: bool) -> np.ndarray:
+    '''
+    quote notional of levels within bps of mid, returns (snapshots, bps).
+    levels are sorted from the best price so the distance to mid increases along each row,
+    rows are offset by MAX_BPS to find the last level within bps of all rows in one search
+    '''
+    count, depth = levels.shape[:2]
+    prices = levels[:, :, 0]
+    distance = mid[:, None] - prices
+    if not is_bid:
+        np.negative(distance, out=distance)
+    distance *= (1e4 / mid)[:, None]
+    # the nan padding is at the end of the rows, beyond any bps
+    np.fmin(distance, MAX_BPS, out=distance)
+    np.maximum(distance, 0, out=distance)
+    row_offsets = np.arange(count, dtype=float)[:, None] * (MAX_BPS + 1)
+    distance += row_offsets
+    # levels on the bps are included despite rounding
+    positions = np.searchsorted(distance.ravel(), row_offsets + depth_bps + BPS_TOLERANCE,
+                                side='right')
+    # the nan of the padding is never read as positions stop before it
+    cumulative = np.cumsum(prices * levels[:, :, 1], axis=1).ravel()
+    has_levels = positions > np.arange(count)[:, None] * depth
+    return np.where(has_levels, cumulative[positions - 1], 0.)
+
+
+def compute_snapshot_metrics(bids: np.ndarray,
+                             asks: np.ndarray,
+                             depth_bps: tuple[int] = DEPTH_BPS,
+                             ) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    '''returns if each snapshot has a valid spread and the metrics of each snapshot'''
+    best_bid, best_ask = bids[:, 0, 0], asks[:, 0, 0]
+    with np.errstate(invalid='ignore'):
+        valid = np.isfinite(best_bid) & np.isfinite(best_ask) & (best_ask > best_bid)
+    mid = (best_bid + best_ask) / 2
+    metrics = {'mid_price': mid, 'spread_bps': (best_ask - best_bid) / mid * 1e4}
+    bps = np.asarray(depth_bps, dtype=float)
+    bid_depth = side_depth(bids, mid, bps, is_bid=True)
+    ask_depth = side_depth(asks, mid, bps, is_bid=False)
+    for i, value in enumerate(depth_bps):
+        metrics[f'bid_depth_{value}bps'] = bid_depth[:, i]
+        metrics[f'ask_depth_{value}bps'] = ask_depth[:, i]
+    return valid, metrics
+
+
+def aggregate_buckets(timestamps: np.ndarray,
+                      valid: np.ndarray,
+                      metrics: dict[str, np.ndarray],
+                      bucket_interval: int,
+                      max_gap: int,
+                      end_time: int) -> pd.DataFrame:
+    '''
+    time weighted average of metrics per bucket, all times in ms.
+    a snapshot is quoted until the next snapshot, for at most max_gap and until its bucket end
+    '''
+    bucket_start = timestamps // bucket_interval * bucket_interval
+    next_time = np.append(timestamps[1:], end_time)
+    quoted_until = np.minimum(np.minimum(next_time, timestamps + max_gap),
+                              bucket_start + bucket_interval)
+    weight = np.where(valid, np.maximum(quoted_until - timestamps, 0), 0).astype(float)
+    buckets, inverse = np.unique(bucket_start, return_inverse=True)
+    total_weight = np.bincount(inverse, weight)
+    result = {'bucket_start': buckets,
+              'bucket_end': buckets + bucket_interval,
+              'snapshot_count': np.bincount(inverse),
+              'coverage': total_weight / bucket_interval}
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for name, values in metrics.items():
+            weighted = weight * np.where(valid, values, 0)
+            result[name] = np.bincount(inverse, weighted, len(buckets)) / total_weight
+    return pd.DataFrame(result)
+
+
+class LiquidityMetrics:
+    '''computes liquidity metrics from the public database into the tracker database'''
+
+    def __init__(self,
+                 public_database: DataBase,
+                 database: DataBase,
+                 config: LiquidityConfig) -> None:
+        self.public_database = public_database
+        self.database = database
+        self.config = config
+
+    def get_markets(self) -> list[tuple[str, str]]:
+        '''exchange id and symbol of stored order books'''
+        markets = self.public_database.query_sql(
+            select(SQLOrderBookSnapshot.exchange_id, SQLOrderBookSnapshot.symbol).distinct())
+        return list(markets.itertuples(index=False, name=None))
+
+    def compute(self,
+                exchange_id: str,
+                symbol: str,
+                start_time: int,
+                end_time: int) -> pd.DataFrame:
+        '''metrics of each bucket between start and end time in ms'''
+        bucket_interval = int(self.config.bucket_interval * 1000)
+        # chunks end on a bucket boundary so that a bucket is aggregated at once
+        chunk_interval = max(int(self.config.chunk_interval * 1000) //
+                             bucket_interval, 1) * bucket_interval
+        chunk_start = start_time // bucket_interval * bucket_interval
+        results = []
+        while chunk_start < end_time:
+            chunk_end = min(chunk_start + chunk_interval, end_time)
+            snapshots = list(read_order_books(
+                self.public_database, exchange_id, symbol,
+                chunk_start, chunk_end - 1, self.config.depth))
+            if snapshots:
+                timestamps = np.array([timestamp for timestamp, _ in snapshots], dtype=np.int64)
+                bids, asks = pad_books([book for _, book in snapshots], self.config.depth)
+                valid, metrics = compute_snapshot_metrics(bids, asks)
+                results.append(aggregate_buckets(
+                    timestamps, valid, metrics, bucket_interval,
+                    int(self.config.max_gap * 1000), chunk_end))
+            chunk_start = chunk_end
+        if not results:
+            return pd.DataFrame()
+        return pd.concat(results, ignore_index=True)
+
+    def get_last_bucket(self, exchange_id: str, symbol: str) -> int:
+        '''start of the last bucket persisted for the market, None if not found'''
+        last_bucket = self.database.query_sql(
+            select(func.max(SQLLiquidityMetric.bucket_start).label('bucket_start'))
+            .where(SQLLiquidityMetric.exchange_name == exchange_id,
+                   SQLLiquidityMetric.symbol == symbol)).bucket_start[0]
+        return None if pd.isnull(last_bucket) else int(last_bucket)
+
+    def update(self, exchange_id: str, symbol: str, now: int = None) -> int:
+        '''
+        compute metrics from the last persisted bucket, which may have been partial, until now
+        and upsert them, returns the number of buckets
+        '''
+        now = now or int(time.time() * 1000)
+        start_time = self.get_last_bucket(exchange_id, symbol)
+        if start_time is None:
+            start_time = int(self.public_database.query_sql(
+                select(func.min(SQLOrderBookSnapshot.timestamp).label('timestamp'))
+                .where(SQLOrderBookSnapshot.exchange_id == exchange_id,
+                       SQLOrderBookSnapshot.symbol == symbol)).timestamp[0])
+        metrics_df = self.compute(exchange_id, symbol, start_time, now)
+        if metrics_df.empty:
+            return 0
+        metrics_df['exchange_name'] = exchange_id
+        metrics_df['symbol'] = symbol
+        metrics_df['updated_at'] = now
+        # replace nan with none for buckets without a valid snapshot
+        metrics_df = metrics_df.astype(object).where(pd.notnull(metrics_df), None)
+        self.database.upsert_rows(SQLLiquidityMetric, metrics_df.to_dict('records'))
+        logger.info('liquidity metrics of %s %s updated for %s buckets',
+                    exchange_id, symbol, len(metrics_df))
+        return len(metrics_df)
+
+    async def start(self) -> None:
+        '''update metrics of every market every update interval'''
+        while True:
+            try:
+                for exchange_id, symbol in await run_database(self.get_markets):
+                    await run_database(self.update, exchange_id, symbol)
+            except Exception as error:  #pylint: disable=broad-except
+                logger.exception('%s: retry in 5min', error)
+                await asyncio.sleep(300)
+                continue
+            await asyncio.sleep(self.config.update_interval)
+
+
+def test() -> None:
+    '''module test'''
+    # pylint: disable=import-outside-toplevel
+    from tracker.database.database import DB_PUBLIC_CREDENTIAL_LOCATION, DBConfig
+    liquidity_metrics = LiquidityMetrics(DataBase(DBConfig.create(DB_PUBLIC_CREDENTIAL_LOCATION)),
+                                         DataBase(),
+                                         LiquidityConfig.create())
+    for exchange_id, symbol in liquidity_metrics.get_markets():
+        print(exchange_id, symbol, liquidity_metrics.update(exchange_id, symbol))
+
+
+if __name__ == '__main__':
+    test()
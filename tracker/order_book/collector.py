@@ -0,0 +1,148 @@
+'''
+Collects order books of many markets with one exchange client per exchange.
+Markets of an exchange are fetched together where fetchOrderBooks is supported,
+or streamed with ccxt pro, and snapshots are handed to the background writer.
+'''
+import asyncio
+import logging
+import time
+from types import ModuleType
+
+import ccxt.async_support as ccxt
+from ccxt.base.exchange import Exchange
+from tracker.connector.ccxt.ccxt_data import CCXTOrderBook
+from tracker.order_book.get_config import OrderBookConfig
+from tracker.order_book.writer import OrderBookWriter
+
+try:
+    import ccxt.pro as ccxtpro
+except ImportError:
+    try:
+        import ccxtpro
+    except ImportError:
+        ccxtpro = None
+
+logger = logging.getLogger(__name__)
+
+RETRY_DELAY = 5
+
+
+def copy_order_book(order_book: dict) -> dict:
+    '''copy a streamed order book as it keeps being updated in place'''
+    return {**order_book,
+            'bids': [list(bid) for bid in order_book['bids']],
+            'asks': [list(ask) for ask in order_book['asks']]}
+
+
+class OrderBookCollector:
+    '''snapshots the order book of every configured market every interval'''
+
+    def __init__(self,
+                 config: OrderBookConfig,
+                 writer: OrderBookWriter,
+                 exchange_module: ModuleType = ccxt,
+                 stream_module: ModuleType = ccxtpro) -> None:
+        self.config = config
+        self.writer = writer
+        self._exchange_module = exchange_module
+        self._stream_module = stream_module
+        self._exchanges: dict[str, Exchange] = {}
+        self._stream_exchanges: dict[str, Exchange] = {}
+
+    def get_exchange(self, exchange_id: str) -> Exchange:
+        '''get the rest exchange shared by all markets of the exchange'''
+        if exchange_id not in self._exchanges:
+            exchange_class = getattr(self._exchange_module, exchange_id)
+            self._exchanges[exchange_id] = exchange_class({'enableRateLimit': True})
+        return self._exchanges[exchange_id]
+
+    def get_stream_exchange(self, exchange_id: str) -> Exchange:
+        '''get the websocket exchange, returns None if streaming is not supported'''
+        if (not self.config.stream or self._stream_module is None or
+                not hasattr(self._stream_module, exchange_id)):
+            return None
+        if exchange_id not in self._stream_exchanges:
+            exchange = getattr(self._stream_module, exchange_id)({'enableRateLimit': True})
+            if not exchange.has.get('watchOrderBook'):
+                exchange = None
+            self._stream_exchanges[exchange_id] = exchange
+        return self._stream_exchanges[exchange_id]
+
+    def push(self, exchange_id: str, order_book: dict) -> None:
+        '''hand a snapshot to the writer'''
+        self.writer.put(CCXTOrderBook.create_with_exchange_id(order_book, exchange_id))
+
+    async def sleep_until_next(self, started: float) -> None:
+        '''sleep the rest of the interval since started'''
+        await asyncio.sleep(max(self.config.interval - (time.monotonic() - started), 0))
+
+    async def poll_batch(self, exchange: Exchange, symbols: list[str]) -> None:
+        '''fetch the books of all symbols of the exchange with a single request every interval'''
+        while True:
+            started = time.monotonic()
+            try:
+                order_books = await exchange.fetch_order_books(symbols, self.config.limit)
+                for symbol in symbols:
+                    if symbol in order_books:
+                        self.push(exchange.id, order_books[symbol])
+            except Exception as error:  #pylint: disable=broad-except
+                logger.warning('%s: %s order books', error, exchange.id)
+            await self.sleep_until_next(started)
+
+    async def poll(self, exchange: Exchange, symbol: str) -> None:
+        '''fetch the book of symbol every interval'''
+        while True:
+            started = time.monotonic()
+            try:
+                order_book = await exchange.fetch_order_book(symbol, self.config.limit)
+                self.push(exchange.id, order_book)
+            except Exception as error:  #pylint: disable=broad-except
+                logger.warning('%s: %s %s order book', error, exchange.id, symbol)
+            await self.sleep_until_next(started)
+
+    async def watch(self, exchange: Exchange, symbol: str) -> None:
+        '''stream the book of symbol and keep a snapshot every interval'''
+        last_push = 0.
+        while True:
+            try:
+                order_book = await exchange.watch_order_book(symbol, self.config.limit)
+                if time.monotonic() - last_push < self.config.interval:
+                    continue
+                last_push = time.monotonic()
+                self.push(exchange.id, copy_order_book(order_book))
+            except Exception as error:  #pylint: disable=broad-except
+                logger.warning('%s: %s %s order book stream', error, exchange.id, symbol)
+                await asyncio.sleep(RETRY_DELAY)
+
+    async def collect_exchange(self, exchange_id: str, symbols: list[str]) -> None:
+        '''collect every symbol of the exchange with the best method it supports'''
+        stream_exchange = self.get_stream_exchange(exchange_id)
+        if stream_exchange:
+            logger.info('streaming %s order books of %s', len(symbols), exchange_id)
+            await asyncio.gather(*[self.watch(stream_exchange, symbol) for symbol in symbols])
+            return
+        exchange = self.get_exchange(exchange_id)
+        await exchange.load_markets()
+        if len(symbols) > 1 and exchange.has.get('fetchOrderBooks'):
+            logger.info('polling %s order books of %s together', len(symbols), exchange_id)
+            await self.poll_batch(exchange, symbols)
+            return
+        logger.info('polling %s order books of %s', len(symbols), exchange_id)
+        await asyncio.gather(*[self.poll(exchange, symbol) for symbol in symbols])
+
+    async def start(self) -> None:
+        '''collect every configured market until cancelled'''
+        self.writer.start()
+        try:
+            await asyncio.gather(*[self.collect_exchange(exchange_id, symbols)
+                                   for exchange_id, symbols in self.config.markets.items()])
+        finally:
+            await self.close_all()
+            # the writer thread blocks only on the queue and database, not the event loop
+            await asyncio.get_running_loop().run_in_executor(None, self.writer.close)
+
+    async def close_all(self) -> None:
+        '''close connections to all exchanges'''
+        for exchange in [*self._exchanges.values(), *self._stream_exchanges.values()]:
+            if exchange:
+                await exchange.close()
@@ -0,0 +1,41 @@
+'''get order book config'''
+# pylint: disable=too-many-instance-attributes
+import logging
+from dataclasses import dataclass, field
+from typing import Optional
+
+from tracker.core.utils import load_yml
+
+logger = logging.getLogger(__name__)
+
+CONFIG_LOCATION = './config/order_book_config.yml'
+
+
+@dataclass
+class OrderBookConfig:
+    '''defines the config file attributes'''
+    markets: dict[str, list[str]] = field(default_factory=dict)  # exchange_id: symbols
+    interval: float = 60  # seconds between snapshots of a market
+    limit: Optional[int] = None  # levels requested from the exchange
+    depth: Optional[int] = 200  # levels stored on each side of the book
+    keyframe_interval: int = 60  # snapshots between full snapshots
+    stream: bool = False  # stream with websocket where supported
+    batch_size: int = 500  # snapshots written per transaction
+    flush_interval: float = 5  # seconds a snapshot waits for the batch to fill
+    queue_size: int = 10000  # snapshots waiting to be written
+
+    @classmethod
+    def create(cls, config_file_location=CONFIG_LOCATION) -> 'OrderBookConfig':
+        '''provides a default method to create order book config class'''
+        config = load_yml(config_file_location)
+        return cls(**config)
+
+
+def test() -> None:
+    '''module test'''
+    config = OrderBookConfig.create()
+    print(config)
+
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,133 @@
+'''
+Writes order book snapshots from a background thread so that the event loop
+never waits for the database, snapshots are encoded and upserted in batches
+'''
+import logging
+import queue
+import threading
+import time
+
+from tracker.connector.ccxt.ccxt_data import CCXTOrderBook
+from tracker.database.database import DataBase
+from tracker.database.order_book_codec import OrderBookEncoder
+from tracker.database.order_book_orm_data import SQLOrderBookSnapshot
+
+logger = logging.getLogger(__name__)
+
+
+class OrderBookWriter:
+    '''batches snapshots put from the event loop and writes them in a thread'''
+
+    def __init__(self,
+                 database: DataBase,
+                 depth: int = None,
+                 keyframe_interval: int = 60,
+                 batch_size: int = 500,
+                 flush_interval: float = 5,
+                 queue_size: int = 10000) -> None:
+        self.database = database
+        self.depth = depth
+        self.keyframe_interval = keyframe_interval
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: queue.Queue[CCXTOrderBook] = queue.Queue(queue_size)
+        # only used by the writer thread, snapshots of a market are encoded in order
+        self._encoders: dict[tuple[str, str], OrderBookEncoder] = {}
+        # timestamp of the last snapshot encoded of each market
+        self._timestamps: dict[tuple[str, str], int] = {}
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='order_book_writer', daemon=True)
+        self.dropped = 0
+        self.written = 0
+        self.skipped = 0
+
+    def start(self) -> None:
+        '''start the writer thread'''
+        self._thread.start()
+
+    def put(self, order_book: CCXTOrderBook) -> bool:
+        '''queue a snapshot without blocking, returns False if dropped as the queue is full'''
+        try:
+            self._queue.put_nowait(order_book)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            logger.warning('order book queue full, dropped %s %s (%s dropped)',
+                           order_book.exchange_id, order_book.symbol, self.dropped)
+            return False
+
+    def close(self, timeout: float = None) -> None:
+        '''write the queued snapshots and stop the writer thread'''
+        self._stopped.set()
+        self._thread.join(timeout)
+
+    def _get_batch(self) -> list[CCXTOrderBook]:
+        '''wait for the first snapshot then up to flush interval for the batch to fill'''
+        batch = []
+        deadline = None
+        while len(batch) < self.batch_size:
+            timeout = 0.5 if deadline is None else deadline - time.monotonic()
+            if deadline is not None and timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                if deadline is None and self._stopped.is_set():
+                    break
+                continue
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+        return batch
+
+    def _run(self) -> None:
+        '''write batches until stopped and the queue is empty'''
+        while not (self._stopped.is_set() and self._queue.empty()):
+            batch = self._get_batch()
+            if batch:
+                self.write(batch)
+
+    def is_new(self, order_book: CCXTOrderBook) -> bool:
+        '''
+        whether the snapshot is after the last snapshot of its market, a poll returning
+        the same book again would replace the stored row while the next snapshots are
+        delta encoded against it
+        '''
+        key = (order_book.exchange_id, order_book.symbol)
+        if order_book.timestamp <= self._timestamps.get(key, -1):
+            return False
+        self._timestamps[key] = order_book.timestamp
+        return True
+
+    def encode(self, order_book: CCXTOrderBook) -> dict:
+        '''encode a snapshot against the previous snapshot of its market'''
+        key = (order_book.exchange_id, order_book.symbol)
+        encoder = self._encoders.setdefault(
+            key, OrderBookEncoder(self.depth, self.keyframe_interval))
+        data, book, keyframe = encoder.encode(order_book.bids, order_book.asks)
+        return {'timestamp': order_book.timestamp,
+                'exchange_id': order_book.exchange_id,
+                'symbol': order_book.symbol,
+                'keyframe': keyframe,
+                'bid_count': len(book.bids),
+                'ask_count': len(book.asks),
+                'data': data}
+
+    def write(self, batch: list[CCXTOrderBook]) -> None:
+        '''encode and upsert a batch in a single transaction'''
+        new_batch = [order_book for order_book in batch if self.is_new(order_book)]
+        self.skipped += len(batch) - len(new_batch)
+        rows = [self.encode(order_book) for order_book in new_batch]
+        if not rows:
+            return
+        try:
+            self.database.upsert_rows(SQLOrderBookSnapshot, rows)
+        except Exception as error:  #pylint: disable=broad-except
+            logger.exception('%s: dropped %s order books', error, len(rows))
+            # the next snapshots cannot be delta encoded against snapshots not stored
+            for row in rows:
+                self._encoders[(row['exchange_id'], row['symbol'])].reset()
+                self._timestamps.pop((row['exchange_id'], row['symbol']), None)
+            return
+        self.written += len(rows)
+        logger.debug('wrote %s order books, skipped %s not newer than the last',
+                     len(rows), len(batch) - len(rows))
@@ -0,0 +1,42 @@
+'''get reward config'''
+import logging
+from dataclasses import dataclass
+from typing import Optional
+
+from tracker.core.utils import load_yml
+
+logger = logging.getLogger(__name__)
+
+CONFIG_LOCATION = './config/reward_config.yml'
+
+
+@dataclass
+class RewardConfig:
+    '''defines the config file attributes'''
+    bucket_interval: float = 3600  # seconds per rollup bucket
+    overlap: float = 3600  # seconds of buckets rolled up again before the last bucket
+    update_interval: float = 3600  # seconds between payout updates
+    # scoring rules, applied to the rollups so that a change does not rescan the trades
+    volume: str = 'amount'  # amount or cost of the trades
+    maker_weight: float = 1.
+    taker_weight: float = 0.  # 0 to reward the maker volume only
+    reward_period: Optional[float] = 86400  # seconds, reward accrues equally per period
+    max_bucket_volume: Optional[float] = None  # volume of an account counted per bucket
+    max_reward_share: Optional[float] = None  # excess of an account is shared by the others
+    exclude_flagged: bool = True  # accounts flagged by the wash trade detection
+
+    @classmethod
+    def create(cls, config_file_location=CONFIG_LOCATION) -> 'RewardConfig':
+        '''provides a default method to create reward config class'''
+        config = load_yml(config_file_location)
+        return cls(**config)
+
+
+def test() -> None:
+    '''module test'''
+    config = RewardConfig.create()
+    print(config)
+
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,198 @@
+'''
+Reward of each campaign participant computed from the trade rollups with the scoring rules
+of the reward config. The score of a rollup is its weighted volume capped per bucket,
+the campaign reward accrues per period and is shared by the scores of the period,
+so a rule change only recomputes payouts from the rollups without reading the trades.
+'''
+import asyncio
+import logging
+import math
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from tracker.bounty.bounty import BountyInfo, get_bounty_infos
+from tracker.core.async_io import run_database, run_sheet
+from tracker.core.gsheet import GSheet
+from tracker.database.database import DataBase
+from tracker.database.tracker_orm_data import SQLRewardPayout, SQLWashTradeFlag
+from tracker.reward.get_config import RewardConfig
+from tracker.reward.rollup import TradeRollup
+
+logger = logging.getLogger(__name__)
+
+# maker and taker columns of the rollups for each volume of the config
+VOLUME_COLUMNS = {'amount': ('maker_volume', 'taker_volume'),
+                  'cost': ('maker_cost', 'taker_cost')}
+
+
+def score_rollups(rollups: pd.DataFrame, config: RewardConfig) -> np.ndarray:
+    '''weighted volume of each rollup capped per bucket'''
+    if config.volume not in VOLUME_COLUMNS:
+        raise ValueError(f'volume must be one of {list(VOLUME_COLUMNS)}, got {config.volume}')
+    maker_column, taker_column = VOLUME_COLUMNS[config.volume]
+    scores = (config.maker_weight * rollups[maker_column].to_numpy(float) +
+              config.taker_weight * rollups[taker_column].to_numpy(float))
+    if config.max_bucket_volume is not None:
+        scores = np.minimum(scores, config.max_bucket_volume)
+    return scores
+
+
+def accrue_rewards(codes: np.ndarray,
+                   bucket_starts: np.ndarray,
+                   scores: np.ndarray,
+                   count: int,
+                   bounty_info: BountyInfo,
+                   config: RewardConfig,
+                   now: int) -> np.ndarray:
+    '''
+    reward of each participant code, the reward of a period is the campaign reward times
+    the share of the campaign elapsed in the period and is shared by the scores of the period.
+    the reward of a period without score is not paid
+    '''
+    total_reward = float(bounty_info.total_reward or 0)
+    start, end = bounty_info.start_timestamp, bounty_info.end_timestamp
+    if not config.reward_period or end <= start:
+        total_score = scores.sum()
+        rate = total_reward / total_score if total_score > 0 else 0.
+        return np.bincount(codes, scores * rate, count)
+    period = int(config.reward_period * 1000)
+    period_count = max(math.ceil((end - start) / period), 1)
+    period_starts = start + np.arange(period_count, dtype=np.int64) * period
+    period_ends = np.minimum(np.minimum(period_starts + period, end), max(now, start))
+    period_rewards = total_reward * np.maximum(period_ends - period_starts, 0) / (end - start)
+    periods = np.clip((bucket_starts - start) // period, 0, period_count - 1)
+    period_scores = np.bincount(periods, scores, period_count)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rates = np.where(period_scores > 0, period_rewards / period_scores, 0.)
+    return np.bincount(codes, scores * rates[periods], count)
+
+
+def cap_rewards(rewards: np.ndarray, max_share: float) -> np.ndarray:
+    '''
+    cap the share of the total reward of each participant,
+    the excess is shared by the participants under the cap in proportion of their rewards
+    '''
+    rewards = rewards.astype(float)
+    cap = rewards.sum() * max_share
+    # every iteration caps at least one more participant
+    for _ in range(len(rewards)):
+        over = rewards > cap
+        if not over.any():
+            break
+        excess = (rewards[over] - cap).sum()
+        rewards[over] = cap
+        under = (rewards < cap) & (rewards > 0)
+        if not under.any():
+            break
+        rewards[under] += excess * rewards[under] / rewards[under].sum()
+    return rewards
+
+
+def compute_payouts(rollups: pd.DataFrame,
+                    bounty_info: BountyInfo,
+                    config: RewardConfig,
+                    flagged_api_keys: set[str] = None,
+                    now: int = None) -> pd.DataFrame:
+    '''payout of each participant of the rollups of a campaign'''
+    now = now or int(time.time() * 1000)
+    api_keys, codes = np.unique(rollups.api_key.to_numpy(dtype=object), return_inverse=True)
+    excluded = np.zeros(len(api_keys), dtype=bool)
+    if config.exclude_flagged and flagged_api_keys:
+        excluded = np.isin(api_keys, list(flagged_api_keys))
+    scores = np.where(excluded[codes], 0., score_rollups(rollups, config))
+    rewards = accrue_rewards(codes, rollups.bucket_start.to_numpy(np.int64), scores,
+                             len(api_keys), bounty_info, config, now)
+    if config.max_reward_share is not None:
+        rewards = cap_rewards(rewards, config.max_reward_share)
+
+    participants = rollups.groupby(codes).agg(display_name=('display_name', 'last'),
+                                              payout_address=('payout_address', 'last'),
+                                              maker_volume=('maker_volume', 'sum'),
+                                              taker_volume=('taker_volume', 'sum'))
+    total = rewards.sum()
+    payouts = pd.DataFrame({
+        'campaign_id': bounty_info.campaign_id,
+        'api_key': api_keys,
+        'display_name': participants.display_name.to_numpy(),
+        'payout_address': participants.payout_address.to_numpy(),
+        'maker_volume': participants.maker_volume.to_numpy(),
+        'taker_volume': participants.taker_volume.to_numpy(),
+        'score': np.bincount(codes, scores, len(api_keys)),
+        'reward_share': rewards / total if total > 0 else 0.,
+        'reward': rewards,
+        'reward_currency': bounty_info.reward_currency,
+        'excluded': excluded})
+    return payouts.sort_values('reward', ascending=False, ignore_index=True)
+
+
+class RewardEngine:
+    '''updates the trade rollups and the reward payouts of campaigns'''
+
+    def __init__(self,
+                 database: DataBase,
+                 config: RewardConfig,
+                 rollup: TradeRollup = None) -> None:
+        self.database = database
+        self.config = config
+        self.rollup = rollup or TradeRollup(database, config)
+
+    def get_flagged_api_keys(self, campaign_id: int) -> set[str]:
+        '''accounts of the campaign flagged by the wash trade detection'''
+        flags = self.database.query_sql(
+            select(SQLWashTradeFlag.api_key)
+            .where(SQLWashTradeFlag.campaign_id == campaign_id, SQLWashTradeFlag.flagged))
+        return set(flags.api_key)
+
+    def compute(self, bounty_info: BountyInfo, now: int = None) -> pd.DataFrame:
+        '''payouts of the campaign from its rollups'''
+        rollups = self.rollup.get_rollups(bounty_info.campaign_id)
+        if rollups.empty:
+            return pd.DataFrame()
+        flagged_api_keys = set()
+        if self.config.exclude_flagged:
+            flagged_api_keys = self.get_flagged_api_keys(bounty_info.campaign_id)
+        return compute_payouts(rollups, bounty_info, self.config, flagged_api_keys, now)
+
+    def save(self, payouts: pd.DataFrame) -> None:
+        '''upsert the payouts'''
+        payouts = payouts.assign(updated_at=int(time.time() * 1000))
+        self.database.upsert_rows(SQLRewardPayout, payouts.to_dict('records'))
+
+    def update(self, bounty_info: BountyInfo) -> pd.DataFrame:
+        '''roll up the new trades of the campaign then update its payouts'''
+        self.rollup.update(bounty_info.campaign_id)
+        payouts = self.compute(bounty_info)
+        if not payouts.empty:
+            self.save(payouts)
+            logger.info('campaign %s: %s %s paid to %s participants',
+                        bounty_info.campaign_id, round(payouts.reward.sum(), 8),
+                        bounty_info.reward_currency, int((payouts.reward > 0).sum()))
+        return payouts
+
+    async def start(self, g_sheet: GSheet) -> None:
+        '''update payouts of the campaigns started every update interval'''
+        while True:
+            try:
+                now = int(time.time() * 1000)
+                bounty_infos = await run_sheet(get_bounty_infos, g_sheet)
+                for bounty_info in bounty_infos.values():
+                    if bounty_info.start_timestamp <= now:
+                        await run_database(self.update, bounty_info)
+            except Exception as error:  #pylint: disable=broad-except
+                logger.exception('%s: retry in 5min', error)
+                await asyncio.sleep(300)
+                continue
+            await asyncio.sleep(self.config.update_interval)
+
+
+def test() -> None:
+    '''module test'''
+    engine = RewardEngine(DataBase(), RewardConfig.create())
+    for bounty_info in get_bounty_infos(GSheet.create()).values():
+        print(engine.compute(bounty_info))
+
+
+if __name__ == '__main__':
+    test()
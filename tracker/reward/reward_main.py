@@ -0,0 +1,19 @@
+'''starts the reward payouts of the campaigns'''
+import asyncio
+
+from tracker.core.gsheet import GSheet
+from tracker.core.logger import setup_logging
+from tracker.database.database import DataBase
+from tracker.reward.get_config import RewardConfig
+from tracker.reward.reward import RewardEngine
+
+
+async def main() -> None:
+    '''starts the reward payouts update loop'''
+    logger = setup_logging()
+    logger.info('starting reward')
+    engine = RewardEngine(DataBase(), RewardConfig.create())
+    await engine.start(GSheet.create())
+
+if __name__ == '__main__':
+    asyncio.run(main())
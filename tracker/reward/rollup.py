@@ -0,0 +1,166 @@
+'''
+Rollups of the trades of each campaign participant per time bucket, aggregated in the database
+with group by. Buckets from the last bucket minus overlap are rolled up again every update
+and accounts with trades missing from their rollups, e.g. backfilled by a new account,
+are rolled up from the campaign start.
+'''
+import logging
+import time
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import case, func, select
+from sqlalchemy.sql import Select
+from tracker.database.database import DataBase
+from tracker.database.tracker_orm_data import SQLTrade, SQLTradeRollup
+from tracker.reward.get_config import RewardConfig
+
+logger = logging.getLogger(__name__)
+
+
+def create_rollup_query(campaign_id: int,
+                        bucket_interval: int,
+                        since: int = None,
+                        api_keys: list[str] = None) -> Select:
+    '''group trades of campaign by participant and bucket from since, only for api_keys if provided'''
+    is_maker = SQLTrade.takerOrMaker == 'maker'
+    is_taker = SQLTrade.takerOrMaker == 'taker'
+    # modulo is supported by every dialect unlike integer division
+    bucket_start = (SQLTrade.timestamp - SQLTrade.timestamp % bucket_interval).label('bucket_start')
+    query = (
+        select(SQLTrade.campaign_id,
+               SQLTrade.api_key,
+               bucket_start,
+               func.max(SQLTrade.display_name).label('display_name'),
+               func.max(SQLTrade.payout_address).label('payout_address'),
+               func.sum(case((is_maker, SQLTrade.amount), else_=0)).label('maker_volume'),
+               func.sum(case((is_taker, SQLTrade.amount), else_=0)).label('taker_volume'),
+               func.sum(case((is_maker, SQLTrade.cost), else_=0)).label('maker_cost'),
+               func.sum(case((is_taker, SQLTrade.cost), else_=0)).label('taker_cost'),
+               func.sum(case((is_maker, 1), else_=0)).label('maker_count'),
+               func.sum(case((is_taker, 1), else_=0)).label('taker_count'))
+        .where(SQLTrade.campaign_id == campaign_id)
+        .group_by(SQLTrade.campaign_id, SQLTrade.api_key, bucket_start))
+    if since is not None:
+        query = query.where(SQLTrade.timestamp >= since)
+    if api_keys is not None:
+        query = query.where(SQLTrade.api_key.in_(api_keys))
+    return query
+
+
+def rollup_trades(campaign_id: int, trades: pd.DataFrame, bucket_interval: int) -> pd.DataFrame:
+    '''group trades in memory by participant and bucket with the columns of create_rollup_query'''
+    is_maker = (trades.takerOrMaker == 'maker').to_numpy()
+    is_taker = (trades.takerOrMaker == 'taker').to_numpy()
+    timestamps = trades.timestamp.to_numpy(np.int64)
+    amounts = trades.amount.to_numpy(float)
+    costs = trades.cost.to_numpy(float)
+    rollups = (trades[['api_key', 'display_name', 'payout_address']]
+               .assign(bucket_start=timestamps - timestamps % bucket_interval,
+                       maker_volume=np.where(is_maker, amounts, 0.),
+                       taker_volume=np.where(is_taker, amounts, 0.),
+                       maker_cost=np.where(is_maker, costs, 0.),
+                       taker_cost=np.where(is_taker, costs, 0.),
+                       maker_count=is_maker.astype(int),
+                       taker_count=is_taker.astype(int))
+               .groupby(['api_key', 'bucket_start'], as_index=False)
+               .agg(display_name=('display_name', 'first'),
+                    payout_address=('payout_address', 'first'),
+                    maker_volume=('maker_volume', 'sum'),
+                    taker_volume=('taker_volume', 'sum'),
+                    maker_cost=('maker_cost', 'sum'),
+                    taker_cost=('taker_cost', 'sum'),
+                    maker_count=('maker_count', 'sum'),
+                    taker_count=('taker_count', 'sum')))
+    rollups.insert(0, 'campaign_id', campaign_id)
+    return rollups.sort_values('bucket_start', ignore_index=True)
+
+
+class TradeRollup:
+    '''updates and reads the trade rollups table'''
+
+    def __init__(self, database: DataBase, config: RewardConfig) -> None:
+        self.database = database
+        self.config = config
+
+    @property
+    def bucket_interval(self) -> int:
+        '''bucket interval in ms'''
+        return int(self.config.bucket_interval * 1000)
+
+    def get_trade_counts(self, campaign_id: int) -> pd.Series:
+        '''trades of each account in the campaign, read from the (campaign_id, api_key) index'''
+        counts = self.database.query_sql(
+            select(SQLTrade.api_key, func.count().label('count'))
+            .where(SQLTrade.campaign_id == campaign_id)
+            .group_by(SQLTrade.api_key))
+        return counts.set_index('api_key')['count']
+
+    def get_rolled_up_counts(self, campaign_id: int) -> pd.Series:
+        '''trades of each account in the rollups of the campaign'''
+        counts = self.database.query_sql(
+            select(SQLTradeRollup.api_key,
+                   func.sum(SQLTradeRollup.maker_count + SQLTradeRollup.taker_count)
+                   .label('count'))
+            .where(SQLTradeRollup.campaign_id == campaign_id)
+            .group_by(SQLTradeRollup.api_key))
+        return counts.set_index('api_key')['count']
+
+    def get_last_bucket(self, campaign_id: int) -> Optional[int]:
+        '''start of the last bucket rolled up for the campaign, None if not found'''
+        last_bucket = self.database.query_sql(
+            select(func.max(SQLTradeRollup.bucket_start).label('bucket_start'))
+            .where(SQLTradeRollup.campaign_id == campaign_id)).bucket_start[0]
+        return None if pd.isnull(last_bucket) else int(last_bucket)
+
+    def rollup(self, campaign_id: int, since: int = None, api_keys: list[str] = None) -> int:
+        '''roll up the buckets from since, which starts a bucket, returns the number of buckets'''
+        rollups = self.database.query_sql(
+            create_rollup_query(campaign_id, self.bucket_interval, since, api_keys))
+        if rollups.empty:
+            return 0
+        rollups['updated_at'] = int(time.time() * 1000)
+        self.database.upsert_rows(SQLTradeRollup, rollups.to_dict('records'))
+        return len(rollups)
+
+    def update(self, campaign_id: int) -> int:
+        '''
+        roll up the buckets from the last bucket minus overlap, then the accounts with fewer
+        trades in their rollups than in the trades table, returns the number of buckets
+        '''
+        counts = self.get_trade_counts(campaign_id)
+        last_bucket = self.get_last_bucket(campaign_id)
+        if last_bucket is None:
+            buckets = self.rollup(campaign_id)
+            logger.info('campaign %s rolled up into %s buckets', campaign_id, buckets)
+            return buckets
+        since = last_bucket - int(self.config.overlap * 1000)
+        buckets = self.rollup(campaign_id, since - since % self.bucket_interval)
+        rolled_up = self.get_rolled_up_counts(campaign_id).reindex(counts.index, fill_value=0)
+        missing = counts.index[rolled_up < counts].tolist()
+        if missing:
+            logger.info('rolling up all trades of %s accounts of campaign %s',
+                        len(missing), campaign_id)
+            buckets += self.rollup(campaign_id, api_keys=missing)
+        logger.debug('campaign %s rolled up %s buckets', campaign_id, buckets)
+        return buckets
+
+    def get_rollups(self, campaign_id: int) -> pd.DataFrame:
+        '''rollups of the campaign ordered by bucket'''
+        return self.database.query_sql(
+            select(SQLTradeRollup.__table__)
+            .where(SQLTradeRollup.campaign_id == campaign_id)
+            .order_by(SQLTradeRollup.bucket_start))
+
+
+def test() -> None:
+    '''module test'''
+    rollup = TradeRollup(DataBase(), RewardConfig.create())
+    campaign_ids = rollup.database.query_sql(select(SQLTrade.campaign_id).distinct()).campaign_id
+    for campaign_id in campaign_ids:
+        print(campaign_id, rollup.update(int(campaign_id)))
+
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,142 @@
+'''
+benchmark TradeFetcher with accounts x campaigns against fake exchanges and a sqlite database,
+the first cycle backfills the campaigns and the following ones resume from the cursors
+usage: python -m tracker.script.benchmark_connector --accounts 100 --campaigns 2 --trades 2000
+'''
+import argparse
+import asyncio
+import itertools
+import os
+import resource
+import tempfile
+import time
+
+import numpy as np
+
+from tracker.account.account_validator import get_validated_account_infos
+from tracker.account.validation import ValidationCache
+from tracker.bounty.bounty import get_active_bounty_infos
+from tracker.connector.ccxt.cursor import CursorStore
+from tracker.connector.ccxt.fetch_trades import TradeFetcher
+from tracker.connector.ccxt.get_config import CCXTConfig
+from tracker.connector.ccxt.pagination import PAGINATION_METHODS
+from tracker.connector.ccxt.rate_limiter import RateLimitScheduler
+from tracker.database.database import DataBase, DBConfig
+from tracker.database.tracker_orm_data import SQLTrade
+from tracker.leaderboard.leaderboard import Leaderboard
+from tracker.testing.fake_exchange import DAY_MS, FakeExchangeConfig, create_exchange_module
+from tracker.testing.fake_gsheet import FakeGSheet, create_bounty_infos, create_user_infos
+
+
+def count_trades(database: DataBase) -> int:
+    '''number of trades stored'''
+    return int(database.query_sql(
+        f'SELECT COUNT(*) AS count FROM {SQLTrade.__tablename__}')['count'][0])
+
+
+async def run_cycle(fetcher: TradeFetcher, pairs: list[tuple]) -> tuple[list[float], int]:
+    '''fetch every account and bounty pair once, returns the pair latencies and errors'''
+    latencies = []
+    errors = 0
+
+    async def fetch(account_info, bounty_info) -> None:
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            await fetcher.fetch(account_info, bounty_info)
+        except Exception:  # pylint: disable=broad-except
+            errors += 1
+        latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*[fetch(*pair) for pair in pairs])
+    return latencies, errors
+
+
+async def run(args: argparse.Namespace, database: DataBase) -> None:
+    '''validate the accounts of the fake sheet then run the fetch cycles'''
+    exchange_names = args.exchanges.split(',')
+    now = int(time.time() * 1000)
+    exchange_config = FakeExchangeConfig(start_time=now - args.days * DAY_MS,
+                                         end_time=now,
+                                         trades=args.trades,
+                                         max_limit=args.limit,
+                                         latency=args.latency,
+                                         jitter=args.jitter,
+                                         rate_limit_error_rate=args.rate_limit_errors)
+    exchange_module = create_exchange_module(
+        exchange_config, {exchange_name: args.pagination for exchange_name in exchange_names})
+    sheet = FakeGSheet(
+        create_user_infos(args.accounts, exchange_names),
+        create_bounty_infos(args.campaigns, exchange_names, exchange_config.markets,
+                            exchange_config.start_time, now + DAY_MS))
+    config = CCXTConfig(
+        limits={exchange_name: args.limit for exchange_name in exchange_names},
+        update_interval=600,
+        pagination={exchange_name: args.pagination for exchange_name in exchange_names},
+        rate_limits={exchange_name: args.rate_limit for exchange_name in exchange_names})
+    scheduler = RateLimitScheduler(config.rate_limits, costs=config.rate_limit_costs)
+
+    started = time.perf_counter()
+    account_infos = await get_validated_account_infos(
+        sheet, scheduler, ValidationCache(exchange_module=exchange_module))
+    bounty_infos = get_active_bounty_infos(sheet)
+    print(f'validated {len(account_infos)} accounts in {time.perf_counter() - started:.2f}s, '
+          f'requests: {exchange_module.stats["requests"]}')
+
+    fetcher = TradeFetcher(account_infos=account_infos,
+                           bounty_infos=bounty_infos,
+                           config=config,
+                           database=database,
+                           cursor_store=CursorStore.create(database),
+                           scheduler=scheduler,
+                           leaderboard=Leaderboard(database))
+    # campaigns are fetched by the accounts of their exchange only
+    pairs = [(account_info, bounty_info)
+             for account_info, bounty_info in itertools.product(account_infos, bounty_infos)
+             if account_info.user_info.exchange_name == bounty_info.exchange_name]
+    print(f'{"cycle":>5} {"pairs":>6} {"time (s)":>9} {"trades":>8} {"trades/s":>9} '
+          f'{"requests/s":>10} {"429s":>5} {"p95 (s)":>8} {"errors":>6} {"rss (MB)":>9}')
+    for cycle in range(args.cycles):
+        trades = count_trades(database)
+        stats = exchange_module.stats.copy()
+        started = time.perf_counter()
+        latencies, errors = await run_cycle(fetcher, pairs)
+        elapsed = time.perf_counter() - started
+        new_trades = count_trades(database) - trades
+        requests = exchange_module.stats['fetch_my_trades'] - stats['fetch_my_trades']
+        rate_limit_errors = (exchange_module.stats['rate_limit_errors'] -
+                             stats['rate_limit_errors'])
+        # linux reports the peak resident set size in kB
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f'{cycle:>5} {len(pairs):>6} {elapsed:>9.2f} {new_trades:>8} '
+              f'{new_trades / elapsed:>9.0f} {requests / elapsed:>10.1f} {rate_limit_errors:>5} '
+              f'{np.percentile(latencies, 95):>8.2f} {errors:>6} {peak_rss:>9.1f}')
+
+
+def main() -> None:
+    '''run the benchmark on a temporary sqlite database'''
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--accounts', type=int, default=100)
+    parser.add_argument('--campaigns', type=int, default=2)
+    parser.add_argument('--trades', type=int, default=2000, help='trades per account market')
+    parser.add_argument('--days', type=int, default=30, help='campaign duration')
+    parser.add_argument('--exchanges', default='okex')
+    parser.add_argument('--pagination', default='earliest_id', choices=PAGINATION_METHODS)
+    parser.add_argument('--limit', type=int, default=100, help='trades per request')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds per request')
+    parser.add_argument('--jitter', type=float, default=0.02)
+    parser.add_argument('--rate-limit', type=float, default=200,
+                        help='requests per second of each exchange')
+    parser.add_argument('--rate-limit-errors', type=float, default=0.,
+                        help='fraction of requests failing with 429')
+    parser.add_argument('--cycles', type=int, default=2)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        database = DataBase(DBConfig(db_type='sqlite+pysqlite',
+                                     host=os.path.join(directory, 'benchmark.sqlite')))
+        asyncio.run(run(args, database))
+        database.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+'''
+benchmark the event loop lag of accounts paginating trades while their pages are upserted
+and the google sheet is read, with the blocking calls in the loop against in the executors
+usage: python -m tracker.script.benchmark_event_loop --accounts 500 --duration 10
+'''
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from tracker.core.async_io import LoopLagMonitor, run_database, run_sheet
+from tracker.database.database import DataBase, DBConfig
+from tracker.database.tracker_orm_data import SQLTrade
+from tracker.script.benchmark_upsert import create_trade_rows
+
+PAGE_SIZE = 100
+# seconds taken by a google sheet read of the account worksheet
+SHEET_READ_TIME = 1.
+
+
+async def paginate(database: DataBase,
+                   account: int,
+                   deadline: float,
+                   use_executor: bool,
+                   pages: list[int]) -> None:
+    '''fetch a page from a simulated exchange then upsert it until deadline'''
+    rows = create_trade_rows(PAGE_SIZE, campaign_id=account)
+    while time.monotonic() < deadline:
+        await asyncio.sleep(random.uniform(0.05, 0.5))
+        if use_executor:
+            await run_database(database.upsert_rows, SQLTrade, rows)
+        else:
+            database.upsert_rows(SQLTrade, rows)
+        pages.append(account)
+
+
+async def read_sheet(deadline: float, use_executor: bool) -> None:
+    '''simulated account validation reading the sheet every few seconds'''
+    while time.monotonic() < deadline:
+        await asyncio.sleep(3)
+        if use_executor:
+            await run_sheet(time.sleep, SHEET_READ_TIME)
+        else:
+            time.sleep(SHEET_READ_TIME)
+
+
+async def run(database: DataBase, accounts: int, duration: float, use_executor: bool) -> dict:
+    '''returns the lag stats and the pages upserted per second'''
+    monitor = LoopLagMonitor(interval=0.05, log_interval=duration * 2)
+    monitor_task = asyncio.create_task(monitor.start())
+    deadline = time.monotonic() + duration
+    pages = []
+    await asyncio.gather(read_sheet(deadline, use_executor),
+                         *[paginate(database, account, deadline, use_executor, pages)
+                           for account in range(accounts)])
+    monitor_task.cancel()
+    return {**monitor.get_stats(), 'pages/s': len(pages) / duration}
+
+
+def main() -> None:
+    '''run the same load with blocking calls and with the executors'''
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--accounts', type=int, default=500)
+    parser.add_argument('--duration', type=float, default=10)
+    args = parser.parse_args()
+    print(f'{"mode":>9} {"p50 (s)":>8} {"p99 (s)":>8} {"max (s)":>8} {"pages/s":>8}')
+    with tempfile.TemporaryDirectory() as directory:
+        for mode, use_executor in (('blocking', False), ('executor', True)):
+            location = os.path.join(directory, f'{mode}.sqlite')
+            database = DataBase(DBConfig(db_type='sqlite+pysqlite', host=location))
+            stats = asyncio.run(run(database, args.accounts, args.duration, use_executor))
+            print(f'{mode:>9} {stats["p50"]:>8.3f} {stats["p99"]:>8.3f} '
+                  f'{stats["max"]:>8.3f} {stats["pages/s"]:>8.1f}')
+            database.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+'''
+benchmark the liquidity metrics on a year of synthetic minute snapshots on one core
+usage: python -m tracker.script.benchmark_liquidity --days 365 --depth 200
+'''
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from tracker.liquidity.metrics import aggregate_buckets, compute_snapshot_metrics
+
+TICK = 1e-5
+START_TIME = 1640995200000
+MINUTE = 60000
+HOUR = 3600000
+
+
+def create_books(count: int, depth: int, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    '''padded bids and asks of a random walk mid price, a few books have one side missing'''
+    rng = np.random.default_rng(seed)
+    mid_ticks = 2000 + np.cumsum(rng.integers(-2, 3, count))
+    offsets = np.arange(1, depth + 1)
+    bids = np.empty((count, depth, 2))
+    asks = np.empty((count, depth, 2))
+    bids[:, :, 0] = (mid_ticks[:, None] - offsets) * TICK
+    asks[:, :, 0] = (mid_ticks[:, None] + offsets) * TICK
+    bids[:, :, 1] = rng.integers(1, 100000, (count, depth))
+    asks[:, :, 1] = rng.integers(1, 100000, (count, depth))
+    asks[rng.random(count) < 0.001] = np.nan
+    return bids, asks
+
+
+def main() -> None:
+    '''compute hourly metrics week by week as the metrics engine does'''
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--depth', type=int, default=200)
+    args = parser.parse_args()
+    count = args.days * 24 * 60
+    week = 7 * 24 * 60
+    timestamps = START_TIME + np.arange(count, dtype=np.int64) * MINUTE
+    bids, asks = create_books(count, args.depth)
+    print(f'{count} snapshots with {args.depth} levels per side')
+    start = time.perf_counter()
+    results = []
+    for chunk in range(0, count, week):
+        chunk_slice = slice(chunk, chunk + week)
+        valid, metrics = compute_snapshot_metrics(bids[chunk_slice], asks[chunk_slice])
+        chunk_timestamps = timestamps[chunk_slice]
+        results.append(aggregate_buckets(chunk_timestamps, valid, metrics, HOUR, 3 * MINUTE,
+                                         int(chunk_timestamps[-1]) + MINUTE))
+    metrics_df = pd.concat(results, ignore_index=True)
+    print(f'{len(metrics_df)} hourly buckets in {time.perf_counter() - start:.2f}s')
+    print(metrics_df.describe().T[['mean', 'min', 'max']])
+
+
+if __name__ == '__main__':
+    main()
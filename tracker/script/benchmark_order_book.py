@@ -0,0 +1,119 @@
+'''
+benchmark storage size and read time of json order books against the binary snapshots on sqlite
+usage: python -m tracker.script.benchmark_order_book --days 30 --depth 200
+'''
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import Iterator
+
+import numpy as np
+from sqlalchemy import select
+from tracker.database.database import DataBase, DBConfig
+from tracker.database.order_book_codec import OrderBookEncoder, read_order_books
+from tracker.database.order_book_orm_data import SQLOrderBook, SQLOrderBookSnapshot
+
+EXCHANGE_ID = 'binance'
+SYMBOL = 'ONE/USDT'
+TICK = 1e-5
+START_TIME = 1640995200000
+
+
+def iter_order_books(count: int, depth: int, seed: int = 0) -> Iterator[tuple[list, list]]:
+    '''synthetic order books every minute, the mid price walks by ticks and some sizes change'''
+    rng = np.random.default_rng(seed)
+    mid_tick = 2000
+    bid_sizes = rng.integers(1, 100000, depth).astype(float)
+    ask_sizes = rng.integers(1, 100000, depth).astype(float)
+    offsets = np.arange(1, depth + 1)
+    for _ in range(count):
+        mid_tick += int(rng.integers(-2, 3))
+        for sizes in (bid_sizes, ask_sizes):
+            changed = rng.random(depth) < 0.2
+            sizes[changed] = rng.integers(1, 100000, changed.sum())
+        bids = np.column_stack([(mid_tick - offsets) * TICK, bid_sizes]).round(8)
+        asks = np.column_stack([(mid_tick + offsets) * TICK, ask_sizes]).round(8)
+        yield bids.tolist(), asks.tolist()
+
+
+def create_database(directory: str, name: str) -> tuple[DataBase, str]:
+    '''create an empty public database in directory'''
+    location = os.path.join(directory, f'{name}.sqlite')
+    return DataBase(DBConfig(db_type='sqlite+pysqlite', host=location, base='public')), location
+
+
+def write_json(database: DataBase, books: list[tuple[list, list]]) -> None:
+    '''store books as json text like the previous order book collector'''
+    database.upsert_rows(SQLOrderBook, [
+        {'timestamp': START_TIME + i * 60000, 'exchange_id': EXCHANGE_ID, 'symbol': SYMBOL,
+         'bids': json.dumps(bids), 'asks': json.dumps(asks)}
+        for i, (bids, asks) in enumerate(books)])
+
+
+def write_binary(database: DataBase, books: list[tuple[list, list]]) -> None:
+    '''store books as encoded snapshots'''
+    encoder = OrderBookEncoder()
+    rows = []
+    for i, (bids, asks) in enumerate(books):
+        data, book, keyframe = encoder.encode(bids, asks)
+        rows.append({'timestamp': START_TIME + i * 60000, 'exchange_id': EXCHANGE_ID,
+                     'symbol': SYMBOL, 'keyframe': keyframe, 'bid_count': len(book.bids),
+                     'ask_count': len(book.asks), 'data': data})
+    database.upsert_rows(SQLOrderBookSnapshot, rows)
+
+
+def read_json(database: DataBase) -> float:
+    '''read every book into arrays, returns the sum of spreads to check the results'''
+    total = 0.
+    query = select(SQLOrderBook.bids, SQLOrderBook.asks).order_by(SQLOrderBook.timestamp)
+    with database.engine.connect() as connection:
+        for bids, asks in connection.execute(query):
+            bids, asks = np.array(json.loads(bids)), np.array(json.loads(asks))
+            total += asks[0, 0] - bids[0, 0]
+    return total
+
+
+def read_binary(database: DataBase) -> float:
+    '''read every book into arrays, returns the sum of spreads to check the results'''
+    total = 0.
+    for _, book in read_order_books(database, EXCHANGE_ID, SYMBOL, 0, 2 ** 62):
+        total += book.asks[0, 0] - book.bids[0, 0]
+    return total
+
+
+def timeit(func, *args) -> tuple[float, object]:
+    '''returns the time taken in seconds and the result'''
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main() -> None:
+    '''write and read the same books in both formats'''
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--depth', type=int, default=200)
+    args = parser.parse_args()
+    books = list(iter_order_books(args.days * 24 * 60, args.depth))
+    print(f'{len(books)} books with {args.depth} levels per side')
+    print(f'{"format":>7} {"size (MB)":>10} {"write (s)":>10} {"read (s)":>9}')
+    with tempfile.TemporaryDirectory() as directory:
+        spreads = []
+        for name, write, read in (('json', write_json, read_json),
+                                  ('binary', write_binary, read_binary)):
+            database, location = create_database(directory, name)
+            write_time, _ = timeit(write, database, books)
+            with database.engine.connect() as connection:
+                connection.exec_driver_sql('VACUUM')
+            read_time, spread = timeit(read, database)
+            spreads.append(spread)
+            size = os.path.getsize(location) / 2 ** 20
+            print(f'{name:>7} {size:>10.1f} {write_time:>10.2f} {read_time:>9.2f}')
+            database.engine.dispose()
+        assert np.isclose(*spreads)
+
+
+if __name__ == '__main__':
+    main()
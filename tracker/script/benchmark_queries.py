@@ -0,0 +1,101 @@
+'''
+benchmark the leaderboard and sync queries on synthetic trades without and with the trades indexes
+usage: python -m tracker.script.benchmark_queries --rows 10000000 --campaigns 20
+'''
+import argparse
+import os
+import tempfile
+import time
+from typing import Iterator
+
+from sqlalchemy import func, select
+from tracker.database.database import DataBase, DBConfig
+from tracker.database.migration import create_trade_indexes
+from tracker.database.tracker_orm_data import SQLTrade
+from tracker.leaderboard.leaderboard import create_aggregate_query
+from tracker.script.benchmark_upsert import create_trade_rows
+
+CHUNK_SIZE = 100000
+
+
+def iter_trade_chunks(rows: int, campaigns: int) -> Iterator[list[dict]]:
+    '''synthetic trades spread over campaigns in chunks of rows'''
+    for offset in range(0, rows, CHUNK_SIZE):
+        chunk = create_trade_rows(min(CHUNK_SIZE, rows - offset))
+        for i, row in enumerate(chunk, start=offset):
+            row['id'] = str(i)
+            row['campaign_id'] = i % campaigns
+            row['timestamp'] += offset * 1000
+        yield chunk
+
+
+def populate(database: DataBase, rows: int, campaigns: int) -> None:
+    '''insert synthetic trades with plain inserts, the table is empty'''
+    with database.engine.begin() as connection:
+        for chunk in iter_trade_chunks(rows, campaigns):
+            connection.execute(SQLTrade.__table__.insert(), chunk)
+
+
+def drop_trade_indexes(database: DataBase) -> None:
+    '''drop the secondary indexes of the trades table'''
+    with database.engine.begin() as connection:
+        for index in SQLTrade.__table__.indexes:
+            index.drop(connection, checkfirst=True)
+
+
+def create_queries(campaign_id: int, since: int) -> dict[str, object]:
+    '''queries run by the leaderboard and the google sheet sync for a campaign'''
+    return {
+        'leaderboard': create_aggregate_query(campaign_id),
+        'leaderboard_keys': create_aggregate_query(campaign_id, ['key_1', 'key_2']),
+        'sync_summary': select(func.count().label('row_count'),
+                               func.max(SQLTrade.timestamp).label('max_timestamp'))
+                        .where(SQLTrade.campaign_id == campaign_id),
+        'sync_since': select(SQLTrade.__table__)
+                      .where(SQLTrade.campaign_id == campaign_id)
+                      .where(SQLTrade.timestamp >= since)
+                      .order_by(SQLTrade.timestamp),
+    }
+
+
+def timeit(database: DataBase, query, repeat: int) -> float:
+    '''returns the best time taken in seconds'''
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        database.query_sql(query)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main() -> None:
+    '''run each query before and after creating the indexes'''
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--campaigns', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        location = os.path.join(directory, 'trades.sqlite')
+        database = DataBase(DBConfig(db_type='sqlite+pysqlite', host=location))
+        drop_trade_indexes(database)
+        start = time.perf_counter()
+        populate(database, args.rows, args.campaigns)
+        print(f'inserted {args.rows} trades in {time.perf_counter() - start:.1f}s')
+        # sync the last hour of trades of a campaign
+        max_timestamp = database.query_sql(select(func.max(SQLTrade.timestamp))).iloc[0, 0]
+        queries = create_queries(campaign_id=1, since=int(max_timestamp) - 3600 * 1000)
+        before = {name: timeit(database, query, args.repeat) for name, query in queries.items()}
+        start = time.perf_counter()
+        with database.engine.begin() as connection:
+            create_trade_indexes(connection)
+        print(f'created indexes in {time.perf_counter() - start:.1f}s')
+        after = {name: timeit(database, query, args.repeat) for name, query in queries.items()}
+        print(f'{"query":>16} {"before (s)":>11} {"after (s)":>11}')
+        for name in queries:
+            print(f'{name:>16} {before[name]:>11.3f} {after[name]:>11.3f}')
+        database.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+'''
+benchmark per row session.merge against the bulk upsert on sqlite
+usage: python -m tracker.script.benchmark_upsert --sizes 10000 100000
+'''
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy.orm import Session
+from tracker.database.database import DataBase, DBConfig
+from tracker.database.tracker_orm_data import SQLTrade
+
+
+def create_trade_rows(size: int, campaign_id: int = 1) -> list[dict]:
+    '''create synthetic trade rows'''
+    start_time = 1640995200000
+    return [{
+        'exchange_name': 'okex',
+        'id': str(i),
+        'takerOrMaker': 'maker' if i % 2 else 'taker',
+        'campaign_id': campaign_id,
+        'display_name': f'user_{i % 200}',
+        'email_address': f'user_{i % 200}@mail.com',
+        'payout_address': f'one{i % 200}',
+        'api_key': f'key_{i % 200}',
+        'datetime': datetime.utcfromtimestamp(start_time / 1000 + i),
+        'timestamp': start_time + i * 1000,
+        'symbol': 'ONE/USDT',
+        'side': 'buy' if i % 3 else 'sell',
+        'price': 0.1,
+        'amount': float(i % 1000),
+        'cost': 0.1 * (i % 1000),
+    } for i in range(size)]
+
+
+def create_database(directory: str, name: str) -> DataBase:
+    '''create an empty sqlite database in directory'''
+    location = os.path.join(directory, f'{name}.sqlite')
+    return DataBase(DBConfig(db_type='sqlite+pysqlite', host=location))
+
+
+def merge(database: DataBase, rows: list[dict]) -> None:
+    '''previous implementation of commit_task_list_to_sql'''
+    with Session(database.engine) as session:
+        for row in rows:
+            session.merge(SQLTrade(**row))
+        session.commit()
+
+
+def timeit(func, *args) -> float:
+    '''returns the time taken in seconds'''
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    '''run benchmark for each size, first pass inserts and second pass updates'''
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    args = parser.parse_args()
+    print(f'{"trades":>8} {"method":>6} {"insert (s)":>11} {"update (s)":>11}')
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            rows = create_trade_rows(size)
+            merge_db = create_database(directory, f'merge_{size}')
+            bulk_db = create_database(directory, f'bulk_{size}')
+            merge_times = [timeit(merge, merge_db, rows) for _ in range(2)]
+            bulk_times = [timeit(bulk_db.upsert_rows, SQLTrade, rows) for _ in range(2)]
+            print(f'{size:>8} {"merge":>6} {merge_times[0]:>11.2f} {merge_times[1]:>11.2f}')
+            print(f'{size:>8} {"bulk":>6} {bulk_times[0]:>11.2f} {bulk_times[1]:>11.2f}')
+            merge_db.engine.dispose()
+            bulk_db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
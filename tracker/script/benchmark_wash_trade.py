@@ -0,0 +1,119 @@
+'''
+benchmark the wash trade detection on a synthetic campaign in sqlite,
+the first colluders fill each other and the last account fills itself for a share of their trades
+usage: python -m tracker.script.benchmark_wash_trade --trades 2000000 --accounts 200
+'''
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+from tracker.database.database import DataBase, DBConfig
+from tracker.database.tracker_orm_data import SQLTrade
+from tracker.surveillance.get_config import SurveillanceConfig
+from tracker.surveillance.wash_trade import WashTradeDetector
+
+START_TIME = 1640995200000
+CAMPAIGN_DURATION = 30 * 24 * 3600 * 1000
+CHUNK_SIZE = 100000
+
+
+def create_trade_rows(fills: int,
+                      accounts: int,
+                      colluders: int,
+                      wash_share: float,
+                      first_id: int = 0,
+                      start_time: int = START_TIME,
+                      seed: int = 0) -> list[dict]:
+    '''
+    trades of the fills, a fill has a row for each side traded by a participant,
+    only one side of the fills with a counterparty outside the campaign is stored
+    '''
+    rng = np.random.default_rng(seed)
+    account = rng.integers(0, accounts, fills)
+    is_maker = rng.random(fills) < 0.5
+    timestamps = np.sort(rng.integers(start_time, start_time + CAMPAIGN_DURATION, fills))
+    amounts = rng.integers(1, 1000, fills).astype(float)
+    # colluders make and the counterparty colluder takes, the last account takes its own orders
+    is_wash = (account < colluders) & (rng.random(fills) < wash_share)
+    counterparty = np.where(account < colluders - 1, account + 1, 0)
+    is_self_match = (account == accounts - 1) & (rng.random(fills) < wash_share)
+    is_maker |= is_wash | is_self_match
+    taker = np.where(is_wash, counterparty, account)
+    double = is_wash | is_self_match
+    sides = [(np.arange(fills), account, np.where(is_maker, 'maker', 'taker')),
+             (np.flatnonzero(double), taker[double], np.full(int(double.sum()), 'taker'))]
+    rows = []
+    for fill_index, side_account, side in sides:
+        for index, participant, taker_or_maker in zip(fill_index, side_account, side):
+            rows.append({'exchange_name': 'okex',
+                         'id': str(first_id + index),
+                         'takerOrMaker': taker_or_maker,
+                         'campaign_id': 1,
+                         'display_name': f'user_{participant}',
+                         'email_address': f'user_{participant}@mail.com',
+                         'payout_address': f'one{participant}',
+                         'api_key': f'key_{participant}',
+                         'datetime': datetime.utcfromtimestamp(timestamps[index] / 1000),
+                         'timestamp': int(timestamps[index]),
+                         'symbol': 'ONE/USDT',
+                         'side': 'buy',
+                         'price': 0.1,
+                         'amount': amounts[index],
+                         'cost': 0.1 * amounts[index]})
+    return rows
+
+
+def insert_rows(database: DataBase, rows: list[dict]) -> None:
+    '''insert trades in chunks'''
+    with database.engine.begin() as connection:
+        for start in range(0, len(rows), CHUNK_SIZE):
+            connection.execute(SQLTrade.__table__.insert(), rows[start:start + CHUNK_SIZE])
+
+
+def main() -> None:
+    '''detect the campaign from scratch, then after new trades and without change'''
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--trades', type=int, default=2000000, help='fills of the campaign')
+    parser.add_argument('--accounts', type=int, default=200)
+    parser.add_argument('--colluders', type=int, default=5)
+    parser.add_argument('--wash-share', type=float, default=0.8,
+                        help='share of the fills of colluders between themselves')
+    parser.add_argument('--new-trades', type=int, default=20000,
+                        help='fills added before the incremental update')
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        database = DataBase(DBConfig(db_type='sqlite+pysqlite',
+                                     host=os.path.join(directory, 'benchmark.sqlite')))
+        started = time.perf_counter()
+        rows = create_trade_rows(args.trades, args.accounts, args.colluders, args.wash_share)
+        insert_rows(database, rows)
+        print(f'inserted {len(rows)} trades in {time.perf_counter() - started:.1f}s')
+
+        detector = WashTradeDetector(database, SurveillanceConfig())
+        started = time.perf_counter()
+        detector.update(1)
+        print(f'full detection: {time.perf_counter() - started:.2f}s')
+
+        rows = create_trade_rows(args.new_trades, args.accounts, args.colluders, args.wash_share,
+                                 first_id=args.trades,
+                                 start_time=START_TIME + CAMPAIGN_DURATION, seed=1)
+        insert_rows(database, rows)
+        started = time.perf_counter()
+        reloaded = detector.update(1)
+        print(f'incremental detection of {len(rows)} new trades for {reloaded} accounts: '
+              f'{time.perf_counter() - started:.2f}s')
+        started = time.perf_counter()
+        detector.update(1)
+        print(f'detection without new trades: {time.perf_counter() - started:.2f}s')
+
+        flags = database.query_sql('SELECT * FROM wash_trade_flags WHERE flagged')
+        print(flags[['api_key', 'maker_volume', 'intra_cohort_share', 'self_match_share',
+                     'reason']].to_string(index=False))
+        database.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+'''
+compute the payouts of a campaign from its trade rollups with the scoring rules of a config,
+e.g. after a rule change, without reading the trades again
+usage: python -m tracker.script.compute_rewards --campaign-id 9 --config ./config/reward_config.yml
+'''
+import argparse
+import time
+
+from tracker.bounty.bounty import get_bounty_info_from_campaign_id
+from tracker.core.gsheet import GSheet
+from tracker.core.logger import setup_logging
+from tracker.database.database import DataBase
+from tracker.reward.get_config import CONFIG_LOCATION, RewardConfig
+from tracker.reward.reward import RewardEngine
+
+
+def main() -> None:
+    '''print the payouts and save them if asked'''
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--campaign-id', type=int, required=True)
+    parser.add_argument('--config', default=CONFIG_LOCATION, help='reward config with the rules')
+    parser.add_argument('--rollup', action='store_true',
+                        help='roll up the new trades before computing')
+    parser.add_argument('--save', action='store_true', help='upsert the payouts')
+    args = parser.parse_args()
+    setup_logging(log_filename=None)
+    bounty_info = get_bounty_info_from_campaign_id(GSheet.create(), args.campaign_id)
+    engine = RewardEngine(DataBase(), RewardConfig.create(args.config))
+    started = time.perf_counter()
+    if args.rollup:
+        engine.rollup.update(bounty_info.campaign_id)
+    payouts = engine.compute(bounty_info)
+    print(payouts.to_string(index=False))
+    print(f'computed in {time.perf_counter() - started:.2f}s')
+    if args.save and not payouts.empty:
+        engine.save(payouts)
+
+
+if __name__ == '__main__':
+    main()
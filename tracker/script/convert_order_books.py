@@ -0,0 +1,62 @@
+'''
+convert the json order books of the public database into binary snapshots
+usage: python -m tracker.script.convert_order_books --depth 200
+'''
+import argparse
+import json
+
+from sqlalchemy import select, tuple_
+from tracker.database.database import DB_PUBLIC_CREDENTIAL_LOCATION, DataBase, DBConfig
+from tracker.database.order_book_codec import OrderBookEncoder
+from tracker.database.order_book_orm_data import SQLOrderBook, SQLOrderBookSnapshot
+
+BATCH_SIZE = 1000
+
+
+def convert_order_books(database: DataBase,
+                        depth: int = None,
+                        keyframe_interval: int = 60) -> int:
+    '''encode every json order book in timestamp order of each market, returns books converted'''
+    key_columns = (SQLOrderBook.exchange_id, SQLOrderBook.symbol, SQLOrderBook.timestamp)
+    encoders: dict[tuple[str, str], OrderBookEncoder] = {}
+    last_key = None
+    count = 0
+    while True:
+        # read by pages after the last key as the writes would wait for an open read on sqlite
+        query = select(SQLOrderBook.__table__).order_by(*key_columns).limit(BATCH_SIZE)
+        if last_key:
+            query = query.where(tuple_(*key_columns) > tuple_(*last_key))
+        with database.engine.connect() as connection:
+            order_books = connection.execute(query).all()
+        if not order_books:
+            return count
+        rows = []
+        for order_book in order_books:
+            key = (order_book.exchange_id, order_book.symbol)
+            encoder = encoders.setdefault(key, OrderBookEncoder(depth, keyframe_interval))
+            data, book, keyframe = encoder.encode(
+                json.loads(order_book.bids), json.loads(order_book.asks))
+            rows.append({'timestamp': order_book.timestamp,
+                         'exchange_id': order_book.exchange_id,
+                         'symbol': order_book.symbol,
+                         'keyframe': keyframe,
+                         'bid_count': len(book.bids),
+                         'ask_count': len(book.asks),
+                         'data': data})
+        database.upsert_rows(SQLOrderBookSnapshot, rows)
+        count += len(rows)
+        last_key = tuple(order_books[-1][column.key] for column in key_columns)
+
+
+def main() -> None:
+    '''convert order books of the public database'''
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--depth', type=int, default=None)
+    parser.add_argument('--keyframe-interval', type=int, default=60)
+    args = parser.parse_args()
+    database = DataBase(DBConfig.create(DB_PUBLIC_CREDENTIAL_LOCATION))
+    print('converted:', convert_order_books(database, args.depth, args.keyframe_interval))
+
+
+if __name__ == '__main__':
+    main()
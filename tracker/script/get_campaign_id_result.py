@@ -1,44 +1,60 @@
-'''get result of campaign id'''
+'''
+get result of campaign id, the trades of the campaign are fetched once into a temporary
+sqlite database then the leaderboard and the payouts are computed from it
+usage: python -m tracker.script.get_campaign_id_result --campaign-id 9
+'''
+import argparse
+import asyncio
+import tempfile
+from pathlib import Path
+
 from tracker.bounty.bounty import get_bounty_info_from_campaign_id
 from tracker.core.gsheet import GSheet
 from tracker.core.logger import setup_logging
 from tracker.account.account_validator import get_validated_account_infos
 from tracker.connector.ccxt.get_config import CCXTConfig
 from tracker.connector.ccxt.fetch_trades import TradeFetcher
-
-
-class MockDataBase:
-    '''mock database'''
-
-    def commit_task_list_to_sql(self, tasks: list) -> None:
-        '''commit list of tasks to database'''
-        result = {}
-        for sql_class in tasks:
-            if sql_class.display_name not in result:
-                result[sql_class.display_name] = 0
-            if sql_class.takerOrMaker == 'maker':
-                result[sql_class.display_name] += sql_class.amount
-        print(result)
+from tracker.database.database import DataBase, DBConfig
+from tracker.leaderboard.leaderboard import Leaderboard
+from tracker.reward.get_config import RewardConfig
+from tracker.reward.reward import RewardEngine
 
 
 async def main():
     '''main script'''
-    setup_logging()
-    database = MockDataBase()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--campaign-id', type=int, default=9)
+    args = parser.parse_args()
+    logger = setup_logging()
     gsheet = GSheet.create()
     account_infos = await get_validated_account_infos(gsheet)
-    bounty_infos = [get_bounty_info_from_campaign_id(gsheet, 9)]
-    print(bounty_infos)
-    print(account_infos)
-    config = CCXTConfig.create()
-    fetcher = TradeFetcher(
-        account_infos=account_infos,
-        bounty_infos=bounty_infos,
-        config=config,
-        database=database,
-    )
-    await fetcher.start()
+    bounty_info = get_bounty_info_from_campaign_id(gsheet, args.campaign_id)
+    with tempfile.TemporaryDirectory() as directory:
+        database = DataBase(DBConfig(db_type='sqlite+pysqlite',
+                                     host=str(Path(directory) / 'campaign.sqlite')))
+        leaderboard = Leaderboard(database)
+        fetcher = TradeFetcher(
+            account_infos=account_infos,
+            bounty_infos=[bounty_info],
+            config=CCXTConfig.create(),
+            database=database,
+            leaderboard=leaderboard,
+        )
+        try:
+            results = await asyncio.gather(
+                *(fetcher.fetch_and_record(account_info, bounty_info)
+                  for account_info in account_infos),
+                return_exceptions=True)
+        finally:
+            await fetcher.close_all()
+        for account_info, result in zip(account_infos, results):
+            if isinstance(result, Exception):
+                logger.error('%s: trades of %s are missing from the result',
+                             result, account_info.user_info.display_name)
+        # rewards are paid by the reward engine, the leaderboard reads them from its payouts
+        RewardEngine(database, RewardConfig.create()).update(bounty_info)
+        print(leaderboard.get_leaderboard_df(bounty_info.campaign_id).to_string(index=False))
+        database.engine.dispose()
 
 if __name__ == '__main__':
-    import asyncio
     asyncio.run(main())
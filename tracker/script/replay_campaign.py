@@ -0,0 +1,160 @@
+'''
+replay campaigns offline on archived trades: the trades of the campaign market and time range
+are read from the database or a parquet export and evaluated with the reward rules,
+so any bounty definition, including hypothetical ones, is evaluated without exchange apis.
+campaigns are replayed in parallel by a process pool.
+usage: python -m tracker.script.replay_campaign --campaign-ids 9 10
+       python -m tracker.script.replay_campaign --bounties bounties.yml --parquet ./data/archive
+bounties.yml is a list of bounty infos, start and end timestamps default to the dates in utc
+'''
+import argparse
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, fields
+from typing import Optional
+
+import pandas as pd
+from sqlalchemy import select
+from tracker.archive.reader import ArchiveReader
+from tracker.bounty.bounty import BountyInfo, get_bounty_infos
+from tracker.core.utils import load_yml
+from tracker.database.database import DB_TRACKER_CREDENTIAL_LOCATION, DataBase, DBConfig
+from tracker.database.tracker_orm_data import SQLTrade
+from tracker.reward.get_config import CONFIG_LOCATION as REWARD_CONFIG_LOCATION, RewardConfig
+from tracker.reward.reward import compute_payouts
+from tracker.reward.rollup import rollup_trades
+from tracker.surveillance.get_config import SurveillanceConfig
+from tracker.surveillance.wash_trade import detect_trades
+
+TRADE_COLUMNS = ['exchange_name', 'id', 'takerOrMaker', 'api_key', 'display_name',
+                 'payout_address', 'timestamp', 'amount', 'cost']
+
+
+@dataclass
+class TradeArchive:
+    '''archived trades in the parquet archive root, or in the database of the config'''
+    parquet: Optional[str] = None
+    database_config: str = DB_TRACKER_CREDENTIAL_LOCATION
+
+    def load_trades(self, bounty_info: BountyInfo) -> pd.DataFrame:
+        '''
+        trades of the campaign market in its time range whatever the campaign they were fetched
+        for, a trade fetched for several campaigns is kept once
+        '''
+        start, end = bounty_info.start_timestamp, bounty_info.end_timestamp
+        if self.parquet:
+            trades = ArchiveReader(self.parquet).read_trades(
+                exchange_name=bounty_info.exchange_name, symbol=bounty_info.market,
+                start_time=start, end_time=end, columns=TRADE_COLUMNS)
+        else:
+            database = DataBase(DBConfig.create(self.database_config))
+            trades = database.query_sql(
+                select(*[getattr(SQLTrade, column) for column in TRADE_COLUMNS])
+                .where(SQLTrade.exchange_name == bounty_info.exchange_name,
+                       SQLTrade.symbol == bounty_info.market,
+                       SQLTrade.timestamp.between(start, end)))
+            database.engine.dispose()
+        return trades[TRADE_COLUMNS].drop_duplicates(['exchange_name', 'id', 'takerOrMaker'])
+
+
+@dataclass
+class ReplayResult:
+    '''payouts of a replayed campaign with its statistics'''
+    bounty_info: BountyInfo
+    payouts: pd.DataFrame
+    trades: int
+    flagged: int
+    seconds: float
+
+
+def replay(bounty_info: BountyInfo,
+           archive: TradeArchive,
+           reward_config: RewardConfig,
+           surveillance_config: SurveillanceConfig) -> ReplayResult:
+    '''evaluate the campaign on the archived trades, runs in a worker process'''
+    started = time.perf_counter()
+    trades = archive.load_trades(bounty_info)
+    if trades.empty:
+        return ReplayResult(bounty_info, pd.DataFrame(), 0, 0, time.perf_counter() - started)
+    flagged_api_keys = set()
+    if reward_config.exclude_flagged:
+        flags = detect_trades(bounty_info.campaign_id, trades, surveillance_config)
+        flagged_api_keys = set(flags.api_key[flags.flagged])
+    rollups = rollup_trades(bounty_info.campaign_id, trades,
+                            int(reward_config.bucket_interval * 1000))
+    # a campaign replayed after its end pays its whole reward
+    payouts = compute_payouts(rollups, bounty_info, reward_config, flagged_api_keys,
+                              now=int(time.time() * 1000))
+    return ReplayResult(bounty_info, payouts, len(trades), len(flagged_api_keys),
+                        time.perf_counter() - started)
+
+
+def create_bounty_info(row: dict) -> BountyInfo:
+    '''bounty info of a row of the bounties file, timestamps default to the dates in utc'''
+    row = {'start_date': '', 'end_date': '', 'reward_currency': '', 'active': True, **row}
+    for name in ('start', 'end'):
+        if row.get(f'{name}_timestamp') is None:
+            row[f'{name}_timestamp'] = int(
+                pd.Timestamp(row[f'{name}_date'], tz='UTC').timestamp() * 1000)
+    names = {field.name for field in fields(BountyInfo)}
+    return BountyInfo(**{name: value for name, value in row.items() if name in names})
+
+
+def load_bounty_infos(args: argparse.Namespace) -> list[BountyInfo]:
+    '''bounty infos of the bounties file and of the campaign ids in the campaign worksheet'''
+    bounty_infos = [create_bounty_info(row) for row in
+                    (load_yml(args.bounties) if args.bounties else [])]
+    if args.campaign_ids:
+        # pylint: disable=import-outside-toplevel
+        from tracker.core.gsheet import GSheet
+        sheet_bounty_infos = get_bounty_infos(GSheet.create())
+        bounty_infos += [sheet_bounty_infos[campaign_id] for campaign_id in args.campaign_ids]
+    return bounty_infos
+
+
+def main() -> None:
+    '''replay the campaigns and print their payouts'''
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--campaign-ids', type=int, nargs='*', default=[],
+                        help='campaigns of the campaign worksheet')
+    parser.add_argument('--bounties', help='yml file of bounty infos, e.g. hypothetical ones')
+    parser.add_argument('--parquet', help='root of the parquet archive of tracker.archive, '
+                        'the database is read if not provided')
+    parser.add_argument('--database-config', default=DB_TRACKER_CREDENTIAL_LOCATION)
+    parser.add_argument('--reward-config', default=REWARD_CONFIG_LOCATION)
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--output', help='csv file of the payouts of every campaign')
+    args = parser.parse_args()
+    bounty_infos = load_bounty_infos(args)
+    if not bounty_infos:
+        parser.error('no campaign to replay, provide --campaign-ids or --bounties')
+    archive = TradeArchive(args.parquet, args.database_config)
+    reward_config = RewardConfig.create(args.reward_config)
+    surveillance_config = SurveillanceConfig.create()
+
+    started = time.perf_counter()
+    # spawn so that workers do not inherit database connections
+    with ProcessPoolExecutor(min(args.workers, len(bounty_infos)),
+                             mp_context=multiprocessing.get_context('spawn')) as executor:
+        results = list(executor.map(replay, bounty_infos,
+                                    [archive] * len(bounty_infos),
+                                    [reward_config] * len(bounty_infos),
+                                    [surveillance_config] * len(bounty_infos)))
+    for result in results:
+        info = result.bounty_info
+        print(f'\ncampaign {info.campaign_id} {info.exchange_name} {info.market} '
+              f'{info.total_reward} {info.reward_currency}: {result.trades} trades, '
+              f'{len(result.payouts)} participants, {result.flagged} flagged, '
+              f'{result.seconds:.2f}s')
+        if not result.payouts.empty:
+            print(result.payouts[['display_name', 'maker_volume', 'score', 'reward_share',
+                                  'reward', 'excluded']].to_string(index=False))
+    print(f'\nreplayed {len(results)} campaigns in {time.perf_counter() - started:.2f}s')
+    if args.output:
+        pd.concat([result.payouts for result in results]).to_csv(args.output, index=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+'''get surveillance config'''
+import logging
+from dataclasses import dataclass
+
+from tracker.core.utils import load_yml
+
+logger = logging.getLogger(__name__)
+
+CONFIG_LOCATION = './config/surveillance_config.yml'
+
+
+@dataclass
+class SurveillanceConfig:
+    '''defines the config file attributes'''
+    max_intra_cohort_share: float = 0.5  # share of maker volume filled by participants
+    max_self_match_share: float = 0.05  # share of maker volume filled by the same owner
+    min_maker_volume: float = 0.  # accounts with less maker volume are not flagged
+    overlap: float = 3600  # seconds of trades reloaded before the last trade of an account
+    update_interval: float = 600  # seconds between detections
+
+    @classmethod
+    def create(cls, config_file_location=CONFIG_LOCATION) -> 'SurveillanceConfig':
+        '''provides a default method to create surveillance config class'''
+        config = load_yml(config_file_location)
+        return cls(**config)
+
+
+def test() -> None:
+    '''module test'''
+    config = SurveillanceConfig.create()
+    print(config)
+
+
+if __name__ == '__main__':
+    test()
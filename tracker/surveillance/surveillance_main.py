@@ -0,0 +1,18 @@
+'''starts the wash trade detection of stored trades'''
+import asyncio
+
+from tracker.core.logger import setup_logging
+from tracker.database.database import DataBase
+from tracker.surveillance.get_config import SurveillanceConfig
+from tracker.surveillance.wash_trade import WashTradeDetector
+
+
+async def main() -> None:
+    '''starts the wash trade detection loop'''
+    logger = setup_logging()
+    logger.info('starting surveillance')
+    detector = WashTradeDetector(DataBase(), SurveillanceConfig.create())
+    await detector.start()
+
+if __name__ == '__main__':
+    asyncio.run(main())
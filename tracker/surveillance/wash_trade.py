@@ -0,0 +1,367 @@
+'''
+Wash trade and self match detection of stored trades.
+Both sides of a fill between two participants are stored with the same exchange trade id,
+one as maker and one as taker, so the trades of a campaign are hash joined on the exchange
+and id to find the counterparty of every fill in linear time.
+Trades of each campaign are kept in memory as hashed ids and only the accounts whose trade count
+changed are reloaded, from their last trade minus overlap, before the fills are matched again.
+'''
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import delete, func, select
+from tracker.core.async_io import run_database
+from tracker.database.database import DataBase
+from tracker.database.tracker_orm_data import SQLCounterpartyPair, SQLTrade, SQLWashTradeFlag
+from tracker.database.upsert import bulk_upsert
+from tracker.surveillance.get_config import SurveillanceConfig
+
+logger = logging.getLogger(__name__)
+
+# rows read from the database at once, the trade ids are hashed chunk by chunk
+CHUNK_SIZE = 200000
+TRADE_DTYPES = {'key': np.uint64,
+                'participant': np.int32,
+                'maker': bool,
+                'amount': float,
+                'cost': float,
+                'timestamp': np.int64}
+MATCH_DTYPES = {'key': np.uint64,
+                'participant_maker': np.int32,
+                'amount': float,
+                'cost': float,
+                'participant_taker': np.int32}
+
+
+def hash_trade_ids(trades: pd.DataFrame) -> np.ndarray:
+    '''64 bit hash of the exchange and trade id, ids are only unique within an exchange'''
+    return pd.util.hash_pandas_object(trades[['exchange_name', 'id']].astype(object),
+                                      index=False).to_numpy(np.uint64)
+
+
+def match_trades(trades: pd.DataFrame) -> pd.DataFrame:
+    '''
+    join maker and taker trades on the hashed id, an id has at most one maker and one taker trade
+    in a campaign as takerOrMaker is in the primary key, so there is a row per fill
+    '''
+    makers = trades.loc[trades.maker, ['key', 'participant', 'amount', 'cost']]
+    takers = trades.loc[~trades.maker, ['key', 'participant']]
+    return makers.merge(takers, on='key', suffixes=('_maker', '_taker'))
+
+
+def to_trade_rows(trades: pd.DataFrame, codes: dict[str, int]) -> pd.DataFrame:
+    '''trades with hashed ids and participant codes, ids and api keys are not kept'''
+    return pd.DataFrame({'key': hash_trade_ids(trades),
+                         'participant': trades.api_key.map(codes).to_numpy(np.int32),
+                         'maker': (trades.takerOrMaker == 'maker').to_numpy(),
+                         'amount': trades.amount.to_numpy(float),
+                         'cost': trades.cost.to_numpy(float),
+                         'timestamp': trades.timestamp.to_numpy(np.int64)})
+
+
+@dataclass
+class Participant:
+    '''account of a campaign with its trades in memory'''
+    api_key: str
+    display_name: Optional[str] = None
+    payout_address: Optional[str] = None
+    count: int = 0
+    last_timestamp: Optional[int] = None
+
+
+class CampaignTrades:
+    '''trades of a campaign in memory with their matched fills, participants are integer codes'''
+
+    def __init__(self, campaign_id: int) -> None:
+        self.campaign_id = campaign_id
+        self.participants: list[Participant] = []
+        self.codes: dict[str, int] = {}
+        self.trades = pd.DataFrame({name: pd.Series(dtype=dtype)
+                                    for name, dtype in TRADE_DTYPES.items()})
+        self.matches = pd.DataFrame({name: pd.Series(dtype=dtype)
+                                     for name, dtype in MATCH_DTYPES.items()})
+
+    def get_count(self, api_key: str) -> int:
+        '''trades in memory of the account'''
+        code = self.codes.get(api_key)
+        return 0 if code is None else self.participants[code].count
+
+    def add_participant(self, participant: Participant) -> int:
+        '''code of the participant'''
+        if participant.api_key not in self.codes:
+            self.codes[participant.api_key] = len(self.participants)
+            self.participants.append(participant)
+        return self.codes[participant.api_key]
+
+    def replace(self, since: dict[int, Optional[int]], rows: pd.DataFrame) -> None:
+        '''
+        replace the trades of each participant from its since timestamp, or all if None,
+        with the rows loaded and match the fills of the ids removed or loaded
+        '''
+        since_by_code = np.full(len(self.participants), np.iinfo(np.int64).max)
+        for code, timestamp in since.items():
+            since_by_code[code] = np.iinfo(np.int64).min if timestamp is None else timestamp
+        trades = self.trades
+        removed = trades.timestamp.to_numpy() >= since_by_code[trades.participant.to_numpy()]
+        changed_keys = np.concatenate([trades.key.to_numpy()[removed], rows.key.to_numpy()])
+        self.trades = pd.concat([trades[~removed], rows[list(TRADE_DTYPES)]], ignore_index=True)
+
+        counts = np.bincount(self.trades.participant, minlength=len(self.participants))
+        last_timestamps = rows.groupby('participant').timestamp.max()
+        for code, participant in enumerate(self.participants):
+            participant.count = int(counts[code])
+            if code in last_timestamps.index:
+                participant.last_timestamp = max(int(last_timestamps[code]),
+                                                 participant.last_timestamp or 0)
+            elif participant.count == 0:
+                participant.last_timestamp = None
+
+        # hash lookups of the changed ids instead of matching every trade again
+        matches = self.matches
+        self.matches = pd.concat(
+            [matches[~matches.key.isin(changed_keys)],
+             match_trades(self.trades[self.trades.key.isin(changed_keys)])],
+            ignore_index=True)
+
+
+def aggregate_pairs(campaign: CampaignTrades) -> pd.DataFrame:
+    '''volume of the fills between each maker and taker participant'''
+    pairs = (campaign.matches
+             .groupby(['participant_maker', 'participant_taker'], as_index=False)
+             .agg(volume=('amount', 'sum'), cost=('cost', 'sum'), count=('key', 'size')))
+    payout_addresses = np.array([participant.payout_address or None
+                                 for participant in campaign.participants], dtype=object)
+    maker_addresses = payout_addresses[pairs.participant_maker.to_numpy()]
+    taker_addresses = payout_addresses[pairs.participant_taker.to_numpy()]
+    # participants with the same payout address are owned by the same person
+    pairs['self_match'] = ((pairs.participant_maker == pairs.participant_taker) |
+                           (pd.notnull(maker_addresses) & (maker_addresses == taker_addresses)))
+    return pairs
+
+
+def compute_flags(campaign: CampaignTrades,
+                  pairs: pd.DataFrame,
+                  config: SurveillanceConfig) -> pd.DataFrame:
+    '''share of the maker volume of each participant filled by participants or by itself'''
+    count = len(campaign.participants)
+    trades = campaign.trades
+    is_maker = trades.maker.to_numpy()
+    maker_volume = np.bincount(trades.participant.to_numpy()[is_maker],
+                               trades.amount.to_numpy()[is_maker], count)
+    makers = pairs.participant_maker.to_numpy()
+    intra_cohort_volume = np.bincount(makers, pairs.volume.to_numpy(), count)
+    is_self_match = pairs.self_match.to_numpy()
+    self_match_volume = np.bincount(makers[is_self_match],
+                                    pairs.volume.to_numpy()[is_self_match], count)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        intra_cohort_share = np.where(maker_volume > 0, intra_cohort_volume / maker_volume, 0.)
+        self_match_share = np.where(maker_volume > 0, self_match_volume / maker_volume, 0.)
+
+    flags = pd.DataFrame({
+        'campaign_id': campaign.campaign_id,
+        'api_key': [participant.api_key for participant in campaign.participants],
+        'display_name': [participant.display_name for participant in campaign.participants],
+        'payout_address': [participant.payout_address for participant in campaign.participants],
+        'maker_volume': maker_volume,
+        'intra_cohort_volume': intra_cohort_volume,
+        'self_match_volume': self_match_volume,
+        'intra_cohort_share': intra_cohort_share,
+        'self_match_share': self_match_share})
+    rules = {'intra_cohort': intra_cohort_share > config.max_intra_cohort_share,
+             'self_match': self_match_share > config.max_self_match_share}
+    eligible = maker_volume >= config.min_maker_volume
+    flags['reason'] = [','.join(name for name, exceeded in rules.items() if exceeded[code])
+                       if eligible[code] else '' for code in range(count)]
+    flags['flagged'] = flags.reason != ''
+    flags['reason'] = flags.reason.where(flags.flagged, None)
+    return flags
+
+
+def detect_trades(campaign_id: int,
+                  trades: pd.DataFrame,
+                  config: SurveillanceConfig) -> pd.DataFrame:
+    '''flags of trades in memory, e.g. replayed from an archive, with the columns of SQLTrade'''
+    campaign = CampaignTrades(campaign_id)
+    infos = trades.groupby('api_key', sort=False)[['display_name', 'payout_address']].first()
+    for api_key, info in infos.iterrows():
+        campaign.add_participant(Participant(api_key, info.display_name, info.payout_address))
+    campaign.replace({code: None for code in range(len(campaign.participants))},
+                     to_trade_rows(trades, campaign.codes))
+    return compute_flags(campaign, aggregate_pairs(campaign), config)
+
+
+class WashTradeDetector:
+    '''detects wash trades of the campaigns in the tracker database'''
+
+    def __init__(self, database: DataBase, config: SurveillanceConfig) -> None:
+        self.database = database
+        self.config = config
+        self.campaigns: dict[int, CampaignTrades] = {}
+
+    def get_campaign_ids(self) -> list[int]:
+        '''campaigns with stored trades'''
+        campaign_ids = self.database.query_sql(select(SQLTrade.campaign_id).distinct())
+        return [int(campaign_id) for campaign_id in campaign_ids.campaign_id]
+
+    def get_counts(self, campaign_id: int) -> dict[str, int]:
+        '''trades of each account in the campaign, read from the (campaign_id, api_key) index'''
+        counts = self.database.query_sql(
+            select(SQLTrade.api_key, func.count().label('count'))
+            .where(SQLTrade.campaign_id == campaign_id)
+            .group_by(SQLTrade.api_key))
+        return dict(zip(counts.api_key, counts['count'].astype(int)))
+
+    def get_participants(self, campaign_id: int, api_keys: list[str]) -> list[Participant]:
+        '''display name and payout address of new accounts from one of their trades'''
+        participants = []
+        # a lookup on the (campaign_id, api_key) index per account instead of an aggregate
+        # that reads every trade of the accounts
+        with self.database.engine.connect() as connection:
+            for api_key in api_keys:
+                row = connection.execute(
+                    select(SQLTrade.display_name, SQLTrade.payout_address)
+                    .where(SQLTrade.campaign_id == campaign_id, SQLTrade.api_key == api_key)
+                    .limit(1)).first()
+                participants.append(Participant(api_key, *(row or (None, None))))
+        return participants
+
+    def load_trades(self,
+                    campaign: CampaignTrades,
+                    api_keys: list[str],
+                    since: Optional[int] = None) -> pd.DataFrame:
+        '''trades of the accounts from since with their ids hashed'''
+        query = (select(SQLTrade.api_key, SQLTrade.exchange_name, SQLTrade.id,
+                        SQLTrade.takerOrMaker, SQLTrade.amount, SQLTrade.cost, SQLTrade.timestamp)
+                 .where(SQLTrade.campaign_id == campaign.campaign_id))
+        # the campaign is read in order without index lookups per account on the first load
+        if len(api_keys) < len(campaign.participants):
+            query = query.where(SQLTrade.api_key.in_(api_keys))
+        if since is not None:
+            query = query.where(SQLTrade.timestamp >= since)
+        chunks = []
+        for chunk in self.database.iter_query(query, CHUNK_SIZE):
+            # the ids and api keys are not kept to hold millions of trades in memory
+            chunks.append(to_trade_rows(chunk, campaign.codes))
+        if not chunks:
+            return campaign.trades.iloc[:0]
+        return pd.concat(chunks, ignore_index=True)
+
+    def reload(self, campaign: CampaignTrades, api_keys: list[str]) -> None:
+        '''
+        load the new trades of the accounts, accounts already in memory from their last trade
+        minus overlap with a single query on (campaign_id, timestamp)
+        '''
+        overlap = int(self.config.overlap * 1000)
+        since = {}
+        for api_key in api_keys:
+            last_timestamp = campaign.participants[campaign.codes[api_key]].last_timestamp
+            since[campaign.codes[api_key]] = (None if last_timestamp is None
+                                              else last_timestamp - overlap)
+        full = [api_key for api_key in api_keys if since[campaign.codes[api_key]] is None]
+        incremental = [api_key for api_key in api_keys if api_key not in full]
+        loaded = []
+        if full:
+            loaded.append(self.load_trades(campaign, full))
+        if incremental:
+            rows = self.load_trades(campaign, incremental,
+                                    min(since[campaign.codes[api_key]] for api_key in incremental))
+            since_by_code = np.zeros(len(campaign.participants), dtype=np.int64)
+            for api_key in incremental:
+                since_by_code[campaign.codes[api_key]] = since[campaign.codes[api_key]]
+            loaded.append(rows[rows.timestamp.to_numpy() >=
+                               since_by_code[rows.participant.to_numpy()]])
+        campaign.replace(since, pd.concat(loaded, ignore_index=True))
+
+    def update(self, campaign_id: int) -> int:
+        '''
+        match the fills of the accounts whose trades changed and upsert the counterparty pairs
+        and flags of the campaign, returns the number of accounts reloaded
+        '''
+        campaign = self.campaigns.setdefault(campaign_id, CampaignTrades(campaign_id))
+        counts = self.get_counts(campaign_id)
+        changed = [api_key for api_key, count in counts.items()
+                   if campaign.get_count(api_key) != count]
+        if not changed:
+            return 0
+        new = [api_key for api_key in changed if api_key not in campaign.codes]
+        if new:
+            for participant in self.get_participants(campaign_id, new):
+                campaign.add_participant(participant)
+        self.reload(campaign, changed)
+        # trades upserted before the overlap, e.g. found by a full rescan, are missing
+        missing = [api_key for api_key in changed if campaign.get_count(api_key) < counts[api_key]]
+        if missing:
+            logger.info('reloading all trades of %s accounts of campaign %s',
+                        len(missing), campaign_id)
+            for api_key in missing:
+                campaign.participants[campaign.codes[api_key]].last_timestamp = None
+            self.reload(campaign, missing)
+        self.save(campaign)
+        return len(changed)
+
+    def save(self, campaign: CampaignTrades) -> pd.DataFrame:
+        '''
+        replace the counterparty pairs and upsert the flags of the campaign, returns the flags.
+        pairs whose fills are gone, e.g. matched on a trade that was reloaded, are deleted
+        '''
+        now = int(time.time() * 1000)
+        pairs = aggregate_pairs(campaign)
+        api_keys = np.array([participant.api_key for participant in campaign.participants],
+                            dtype=object)
+        pair_rows = pd.DataFrame({'campaign_id': campaign.campaign_id,
+                                  'maker_api_key': api_keys[pairs.participant_maker.to_numpy()],
+                                  'taker_api_key': api_keys[pairs.participant_taker.to_numpy()],
+                                  'self_match': pairs.self_match.astype(bool),
+                                  'volume': pairs.volume,
+                                  'cost': pairs.cost,
+                                  'count': pairs['count'].astype(int),
+                                  'updated_at': now})
+        flags = compute_flags(campaign, pairs, self.config)
+        flags['updated_at'] = now
+        with self.database.engine.begin() as connection:
+            connection.execute(delete(SQLCounterpartyPair).where(
+                SQLCounterpartyPair.campaign_id == campaign.campaign_id))
+            bulk_upsert(connection, SQLCounterpartyPair.__table__, pair_rows.to_dict('records'))
+        self.database.upsert_rows(SQLWashTradeFlag, flags.to_dict('records'))
+        logger.info('campaign %s: %s fills between participants, %s of %s accounts flagged',
+                    campaign.campaign_id, len(campaign.matches), int(flags.flagged.sum()),
+                    len(flags))
+        return flags
+
+    def update_all(self) -> None:
+        '''update every campaign with trades, campaigns without trades are released'''
+        campaign_ids = self.get_campaign_ids()
+        for campaign_id in set(self.campaigns) - set(campaign_ids):
+            del self.campaigns[campaign_id]
+        for campaign_id in campaign_ids:
+            self.update(campaign_id)
+
+    async def start(self) -> None:
+        '''detect wash trades every update interval'''
+        while True:
+            try:
+                await run_database(self.update_all)
+            except Exception as error:  #pylint: disable=broad-except
+                logger.exception('%s: retry in 5min', error)
+                await asyncio.sleep(300)
+                continue
+            await asyncio.sleep(self.config.update_interval)
+
+
+def test() -> None:
+    '''module test'''
+    detector = WashTradeDetector(DataBase(), SurveillanceConfig.create())
+    for campaign_id in detector.get_campaign_ids():
+        detector.update(campaign_id)
+        campaign = detector.campaigns[campaign_id]
+        flags = compute_flags(campaign, aggregate_pairs(campaign), detector.config)
+        print(campaign_id, flags[flags.flagged])
+
+
+if __name__ == '__main__':
+    test()
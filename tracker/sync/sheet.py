@@ -1,15 +1,91 @@
 '''create view for google governor to google sheet'''
 import asyncio
+import hashlib
+import json
 import logging
+from dataclasses import dataclass, field
 
 import gspread
 import pandas as pd
+from sqlalchemy import func, select
+from tracker.core.async_io import run_sheet
 from tracker.core.gsheet import GSheet
+from tracker.core.metrics import SHEET_SECONDS
 from tracker.database.database import DataBase
+from tracker.database.tracker_orm_data import SQLTrade
+from tracker.leaderboard.leaderboard import Leaderboard
 
 
 logger = logging.getLogger(__name__)
 
+# trades with timestamp up to overlap ms before the latest synced trade are checked for changes
+SYNC_OVERLAP_MS = 60 * 60 * 1000
+ROW_KEYS = ['exchange_name', 'id', 'takerOrMaker']
+LEADERBOARD_WORKSHEET_PREFIX = 'leaderboard_'
+
+
+@dataclass
+class WorksheetState:
+    '''
+    rows already pushed to a campaign worksheet, read back from the worksheet after a restart.
+    the summary of the campaign trades when last synced skips campaigns without changes
+    '''
+    columns: list[str]
+    row_count: int = 0
+    max_timestamp: int = 0
+    total_cost: float = None
+    # row key: (row number in worksheet, digest of row values)
+    rows: dict[tuple, tuple[int, str]] = field(default_factory=dict)
+
+
+def get_digest(rows: list[list]) -> str:
+    '''
+    digest of values stable across processes, numbers are compared as the floats
+    that the worksheet returns for them
+    '''
+    rows = [[float(value) if isinstance(value, (int, float)) else value for value in row]
+            for row in rows]
+    return hashlib.sha1(json.dumps(rows, default=str).encode()).hexdigest()
+
+
+def read_worksheet_state(worksheet: gspread.Worksheet, columns: list[str]) -> WorksheetState:
+    '''
+    state of the rows in a worksheet written by a previous process,
+    None if the worksheet does not hold the trades with columns once each
+    '''
+    header, *rows = worksheet.get_all_values(value_render_option='UNFORMATTED_VALUE') or [[]]
+    if header != columns:
+        return None
+    state = WorksheetState(columns=columns, row_count=len(rows))
+    key_positions = [columns.index(key) for key in ROW_KEYS]
+    timestamp_position = columns.index('timestamp')
+    for row_number, row_values in enumerate(rows, start=2):
+        key = tuple(row_values[position] for position in key_positions)
+        state.rows[key] = (row_number, get_digest([row_values]))
+        if row_values[timestamp_position] != '':
+            state.max_timestamp = max(state.max_timestamp, int(row_values[timestamp_position]))
+    if len(state.rows) != len(rows):
+        return None
+    return state
+
+
+def to_values(dataframe: pd.DataFrame) -> list[list]:
+    '''convert dataframe to json serializable values for google sheet'''
+    # datetime in the iso format of ccxt with milliseconds
+    for column in dataframe.select_dtypes(include='datetime').columns:
+        iso_format = dataframe[column].dt.strftime('%Y-%m-%dT%H:%M:%S.%f').str[:-3] + 'Z'
+        dataframe = dataframe.assign(**{column: iso_format})
+    dataframe = dataframe.astype(object).where(pd.notnull(dataframe), '')
+    return dataframe.values.tolist()
+
+
+def write_worksheet(worksheet: gspread.Worksheet, dataframe: pd.DataFrame) -> None:
+    '''replace worksheet with the header and values of dataframe formatted as the appended rows'''
+    values = [list(dataframe.columns)] + to_values(dataframe)
+    worksheet.clear()
+    worksheet.resize(rows=len(values), cols=max(len(dataframe.columns), 1))
+    worksheet.update('A1', values, value_input_option='RAW')
+
 
 class GoogleSyncTrade:
     '''sends full leaderboard for governor to view'''
@@ -22,32 +98,160 @@ class GoogleSyncTrade:
         self.governor_ss: gspread.Spreadsheet = g_sheet.governor_ss
         self.trades_ss: gspread.Spreadsheet = g_sheet.trades_ss
         self.update_interval = g_sheet.update_interval
+        self.states: dict[int, WorksheetState] = {}
+        self.leaderboard = Leaderboard(database)
+        # campaign_id: digest of the leaderboard last pushed
+        self.leaderboard_hashes: dict[int, str] = {}
 
     def set_sheets_by_campaign_id(self):
-        '''group trade data by campaign_id and send to google sheet'''
-        trades_df = self.get_trades_df()
-        campaign_id_list = trades_df.campaign_id.unique()
+        '''sync trade data of each campaign_id to its own worksheet'''
+        campaign_id_list = self.database.query_sql(
+            select(SQLTrade.campaign_id).distinct()).campaign_id
 
         for campaign_id in campaign_id_list:
-            id_df = trades_df[trades_df.campaign_id == campaign_id]
-            try:
-                id_ws = self.trades_ss.worksheet(str(campaign_id))
-            except gspread.exceptions.WorksheetNotFound:
-                id_ws = self.trades_ss.add_worksheet(str(campaign_id), 1, 1)
-            self.g_sheet.set_sheet_with_df(id_ws, id_df)
+            self.sync_campaign(int(campaign_id))
+
+    def set_leaderboard_sheets(self) -> None:
+        '''send the materialized leaderboard of each campaign to the governor spreadsheet'''
+        leaderboard_df = self.leaderboard.get_leaderboard_df()
+        for campaign_id, campaign_df in leaderboard_df.groupby('campaign_id'):
+            campaign_df = campaign_df.drop(columns=['api_key', 'updated_at'])
+            leaderboard_hash = get_digest(to_values(campaign_df))
+            if self.leaderboard_hashes.get(campaign_id) == leaderboard_hash:
+                continue
+            worksheet = self.get_worksheet(
+                f'{LEADERBOARD_WORKSHEET_PREFIX}{campaign_id}', self.governor_ss)
+            write_worksheet(worksheet, campaign_df)
+            self.leaderboard_hashes[campaign_id] = leaderboard_hash
+
+    def get_worksheet(self,
+                      title: str | int,
+                      spreadsheet: gspread.Spreadsheet = None) -> gspread.Worksheet:
+        '''get worksheet by title from trade spreadsheet by default, creates it if not found'''
+        spreadsheet = spreadsheet or self.trades_ss
+        try:
+            return spreadsheet.worksheet(str(title))
+        except gspread.exceptions.WorksheetNotFound:
+            return spreadsheet.add_worksheet(str(title), 1, 1)
+
+    def sync_campaign(self, campaign_id: int) -> None:
+        '''
+        push only trades not yet in the worksheet and patch the changed rows.
+        the first sync of a process reads the rows already in the worksheet and
+        only rewrites it if it does not hold the trades, e.g. a new campaign.
+        edits in place are found from the total cost of the campaign, edits of
+        other columns are only patched within the overlap of a sync with new trades
+        '''
+        summary = self.database.query_sql(
+            select(func.count().label('row_count'),
+                   func.max(SQLTrade.timestamp).label('max_timestamp'),
+                   func.sum(SQLTrade.cost).label('total_cost'))
+            .where(SQLTrade.campaign_id == campaign_id))
+        row_count = int(summary.row_count[0])
+        max_timestamp = int(summary.max_timestamp[0] or 0)
+        total_cost = float(summary.total_cost[0] or 0.)
+        state = self.states.get(campaign_id)
+        if state and (state.row_count, state.max_timestamp, state.total_cost) == (
+                row_count, max_timestamp, total_cost):
+            logger.debug('campaign %s unchanged', campaign_id)
+            return
+
+        worksheet = self.get_worksheet(campaign_id)
+        columns = [column.name for column in SQLTrade.__table__.columns]
+        state = state or read_worksheet_state(worksheet, columns)
+        if state is None:
+            state = self.rewrite_worksheet(worksheet, self.get_trades_df(campaign_id))
+        elif (state.row_count, state.max_timestamp) == (row_count, max_timestamp):
+            # no trade is added, trades were edited in place
+            self.update_worksheet(worksheet, state, self.get_trades_df(campaign_id))
+        else:
+            # older trades are only added on a backfill, then compare the whole campaign
+            since = state.max_timestamp - SYNC_OVERLAP_MS
+            trades_df = self.get_trades_df(campaign_id, since)
+            new_row_count = sum(1 for key in trades_df[ROW_KEYS].itertuples(index=False, name=None)
+                                if key not in state.rows)
+            if state.row_count + new_row_count != row_count:
+                trades_df = self.get_trades_df(campaign_id)
+            self.update_worksheet(worksheet, state, trades_df)
+        state.total_cost = total_cost
+        self.states[campaign_id] = state
+
+    def rewrite_worksheet(self,
+                          worksheet: gspread.Worksheet,
+                          trades_df: pd.DataFrame) -> WorksheetState:
+        '''replace worksheet with trades and returns the state of worksheet'''
+        write_worksheet(worksheet, trades_df)
+        state = WorksheetState(columns=list(trades_df.columns))
+        self.add_rows_to_state(state, trades_df, first_row=2)
+        logger.info('worksheet %s rewritten with %s rows', worksheet.title, state.row_count)
+        return state
+
+    def update_worksheet(self,
+                         worksheet: gspread.Worksheet,
+                         state: WorksheetState,
+                         trades_df: pd.DataFrame) -> None:
+        '''append new trades and patch changed trades with batched requests'''
+        trades_df = trades_df[state.columns]
+        keys = list(trades_df[ROW_KEYS].itertuples(index=False, name=None))
+        values = to_values(trades_df)
+        new_positions = []
+        patches = []
+        last_column = gspread.utils.rowcol_to_a1(1, len(state.columns)).rstrip('1')
+        for position, (key, row_values) in enumerate(zip(keys, values)):
+            if key not in state.rows:
+                new_positions.append(position)
+                continue
+            row_number, row_digest = state.rows[key]
+            if get_digest([row_values]) != row_digest:
+                patches.append((key, row_number, row_values))
+        if patches:
+            worksheet.batch_update([{'range': f'A{row_number}:{last_column}{row_number}',
+                                     'values': [row_values]}
+                                    for _, row_number, row_values in patches])
+            for key, row_number, row_values in patches:
+                state.rows[key] = (row_number, get_digest([row_values]))
+        if new_positions:
+            new_df = trades_df.iloc[new_positions]
+            worksheet.append_rows(to_values(new_df), value_input_option='RAW')
+            self.add_rows_to_state(state, new_df, first_row=state.row_count + 2)
+        logger.info('worksheet %s appended %s rows, patched %s rows',
+                    worksheet.title, len(new_positions), len(patches))
+
+    @staticmethod
+    def add_rows_to_state(state: WorksheetState,
+                          trades_df: pd.DataFrame,
+                          first_row: int) -> None:
+        '''record rows written from first_row in the worksheet'''
+        keys = trades_df[ROW_KEYS].itertuples(index=False, name=None)
+        for i, (key, row_values) in enumerate(zip(keys, to_values(trades_df))):
+            state.rows[key] = (first_row + i, get_digest([row_values]))
+        state.row_count += len(trades_df)
+        if len(trades_df):
+            state.max_timestamp = max(state.max_timestamp, int(trades_df.timestamp.max()))
 
-    def get_trades_df(self) -> pd.DataFrame:
-        '''gets trade data from database'''
-        return self.database.query_table('trades')
+    def get_trades_df(self, campaign_id: int, since: int = None) -> pd.DataFrame:
+        '''gets trade data of campaign from database ordered by time'''
+        query = (select(SQLTrade.__table__)
+                 .where(SQLTrade.campaign_id == campaign_id)
+                 .order_by(SQLTrade.timestamp))
+        if since is not None:
+            query = query.where(SQLTrade.timestamp >= since)
+        return self.database.query_sql(query)
 
     async def start(self):
         '''starts the application'''
         while True:
             try:
-                self.set_sheets_by_campaign_id()
+                with SHEET_SECONDS.time('sync_campaigns'):
+                    await run_sheet(self.set_sheets_by_campaign_id)
+                with SHEET_SECONDS.time('sync_leaderboards'):
+                    await run_sheet(self.set_leaderboard_sheets)
                 logger.info('sleep for %s seconds', self.update_interval)
             except Exception as error:  #pylint: disable=broad-except
                 logger.exception('%s: retry in 5min', error)
+                # worksheets may be partially updated, read them again on the next sync
+                self.states.clear()
+                self.leaderboard_hashes.clear()
                 await asyncio.sleep(300)
                 continue
             await asyncio.sleep(self.update_interval)
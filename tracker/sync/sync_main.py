@@ -1,6 +1,7 @@
 '''starts sync trades to google sheet'''
 import asyncio
 from tracker.core.gsheet import GSheet
+from tracker.core.metrics import create_metrics_server
 from tracker.database.database import DataBase
 from tracker.sync.sheet import GoogleSyncTrade
 from tracker.core.logger import setup_logging
@@ -13,7 +14,7 @@ async def main():
     g_sheet = GSheet.create()
     database = DataBase()
     view = GoogleSyncTrade(database, g_sheet)
-    await view.start()
+    await asyncio.gather(view.start(), create_metrics_server('sync').start())
 
 if __name__ == '__main__':
     asyncio.run(main())
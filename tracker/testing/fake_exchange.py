@@ -0,0 +1,200 @@
+'''
+Fake ccxt async exchanges serving generated trades for benchmarks and tests without network.
+fetch_my_trades follows the pagination methods of tracker.connector.ccxt.pagination:
+date_time returns the oldest page from since, end_time the latest page up to endTime
+and earliest_id the latest page before the after order id.
+trades are only returned once their timestamp has passed, watch_my_trades streams them
+as they happen like ccxt pro so the module can also replace the websocket module
+'''
+import asyncio
+import hashlib
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+
+import numpy as np
+from ccxt.base.errors import AuthenticationError, RateLimitExceeded
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+
+@dataclass
+class FakeExchangeConfig:
+    '''trades and behaviour of the fake exchanges'''
+    start_time: int  # first trade timestamp in ms
+    end_time: int  # last trade timestamp in ms
+    trades: int = 1000  # trades of each account and market
+    max_limit: int = 100  # most trades returned by a request
+    latency: float = 0.05  # seconds per request
+    jitter: float = 0.  # random extra seconds per request
+    rate_limit_error_rate: float = 0.  # fraction of requests failing with 429
+    invalid_api_keys: list[str] = field(default_factory=list)  # fail authentication
+    markets: list[str] = field(default_factory=lambda: ['BTC/USDT', 'ETH/USDT'])
+
+
+class FakeExchange:
+    '''ccxt compatible async exchange of an account, subclassed per exchange id'''
+    id = 'fake'
+    rateLimit = 50
+    has = {'fetchMyTrades': True, 'fetchBalance': True, 'watchMyTrades': True}
+    pagination = 'date_time'
+    config: FakeExchangeConfig = None
+    stats: Counter = None
+
+    def __init__(self, params: dict = None) -> None:
+        params = params or {}
+        self.apiKey = params.get('apiKey')
+        self.secret = params.get('secret')
+        self.password = params.get('password')
+        self.enableRateLimit = params.get('enableRateLimit', True)
+        self.markets = None
+        self.currencies = None
+        self._timestamps: dict[str, np.ndarray] = {}
+        # symbol: index of the next trade streamed by watch_my_trades
+        self._streamed: dict[str, int] = {}
+        self._random = random.Random(self.apiKey)
+
+    async def request(self, name: str) -> None:
+        '''simulate the latency and rate limit errors of a request'''
+        self.stats['requests'] += 1
+        self.stats[name] += 1
+        await asyncio.sleep(self.config.latency + self._random.random() * self.config.jitter)
+        if self._random.random() < self.config.rate_limit_error_rate:
+            self.stats['rate_limit_errors'] += 1
+            raise RateLimitExceeded(f'{self.id} 429 Too Many Requests')
+
+    async def load_markets(self, reload: bool = False, params: dict = None) -> dict:
+        '''markets of the config'''
+        if self.markets and not reload:
+            return self.markets
+        await self.request('load_markets')
+        self.set_markets({symbol: {'symbol': symbol} for symbol in self.config.markets},
+                         {symbol.split('/')[0]: {} for symbol in self.config.markets})
+        return self.markets
+
+    def set_markets(self, markets: dict, currencies: dict = None) -> dict:
+        '''set markets loaded by another instance'''
+        self.markets = markets
+        self.currencies = currencies
+        return self.markets
+
+    async def fetch_balance(self, params: dict = None) -> dict:
+        '''empty balance, raises AuthenticationError for invalid api keys'''
+        await self.request('fetch_balance')
+        if self.apiKey in self.config.invalid_api_keys:
+            raise AuthenticationError(f'{self.id} invalid api key {self.apiKey}')
+        return {'info': {}}
+
+    def get_timestamps(self, symbol: str) -> np.ndarray:
+        '''sorted trade timestamps of the account market, the same for every instance'''
+        if symbol not in self._timestamps:
+            seed = int.from_bytes(
+                hashlib.md5(f'{self.id}:{self.apiKey}:{symbol}'.encode()).digest()[:4], 'big')
+            timestamps = np.random.default_rng(seed).integers(
+                self.config.start_time, self.config.end_time, self.config.trades)
+            self._timestamps[symbol] = np.sort(timestamps)
+        return self._timestamps[symbol]
+
+    def get_trade_count(self, symbol: str) -> int:
+        '''number of trades of the account market made until now'''
+        return int(np.searchsorted(self.get_timestamps(symbol), time.time() * 1000, 'right'))
+
+    def create_trade(self, symbol: str, index: int, timestamp: int) -> dict:
+        '''trade json as returned by ccxt, order is the index for after pagination'''
+        price = 100 + index % 50
+        amount = 1 + index % 7
+        return {'id': f'{self.apiKey}-{symbol}-{index}',
+                'order': str(index),
+                'datetime': None,
+                'timestamp': int(timestamp),
+                'symbol': symbol,
+                'type': 'limit',
+                'side': 'buy' if index % 2 else 'sell',
+                'takerOrMaker': 'maker' if index % 3 else 'taker',
+                'price': float(price),
+                'amount': float(amount),
+                'cost': float(price * amount),
+                'fee': {'cost': price * amount * 0.001, 'currency': 'USDT'},
+                'fees': [],
+                'info': {}}
+
+    async def fetch_my_trades(self,
+                              symbol: str = None,
+                              since: int = None,
+                              limit: int = None,
+                              params: dict = None) -> list[dict]:
+        '''trades of the account sorted by timestamp'''
+        await self.request('fetch_my_trades')
+        params = params or {}
+        limit = min(limit or self.config.max_limit, self.config.max_limit)
+        timestamps = self.get_timestamps(symbol)
+        start = 0 if since is None else int(np.searchsorted(timestamps, since, 'left'))
+        end = self.get_trade_count(symbol)
+        if 'endTime' in params:
+            end = int(np.searchsorted(timestamps, params['endTime'], 'right'))
+        if 'after' in params:
+            end = min(end, int(params['after']))
+        if self.pagination == 'date_time':
+            end = min(end, start + limit)
+        else:
+            start = max(start, end - limit)
+        return [self.create_trade(symbol, index, timestamps[index])
+                for index in range(start, end)]
+
+    async def watch_my_trades(self,
+                              symbol: str = None,
+                              since: int = None,
+                              limit: int = None,
+                              params: dict = None) -> list[dict]:
+        '''trades of the account made since the previous call, waits for the next trade'''
+        timestamps = self.get_timestamps(symbol)
+        if symbol not in self._streamed:
+            # subscribing is a request, the stream starts with the trades made after it
+            await self.request('watch_my_trades')
+            self._streamed[symbol] = self.get_trade_count(symbol)
+        start = self._streamed[symbol]
+        while (end := self.get_trade_count(symbol)) == start:
+            delay = 1.
+            if start < len(timestamps):
+                delay = min(max(timestamps[start] / 1000 - time.time(), 0.001), delay)
+            await asyncio.sleep(delay)
+        self._streamed[symbol] = end
+        return [self.create_trade(symbol, index, timestamps[index])
+                for index in range(start, end)]
+
+    async def close(self) -> None:
+        '''nothing to close'''
+        self.stats['close'] += 1
+
+
+def create_exchange_module(config: FakeExchangeConfig,
+                           pagination: dict[str, str]) -> SimpleNamespace:
+    '''
+    module with a fake exchange class per exchange_id: pagination_method sharing config and stats,
+    can replace ccxt.async_support in create_account_infos and ValidationCache
+    '''
+    stats = Counter()
+    module = SimpleNamespace(stats=stats, config=config)
+    for exchange_id, method in pagination.items():
+        setattr(module, exchange_id, type(exchange_id, (FakeExchange,),
+                                          {'id': exchange_id, 'pagination': method,
+                                           'config': config, 'stats': stats}))
+    return module
+
+
+async def test() -> None:
+    '''module test, pages of each pagination method cover all trades'''
+    config = FakeExchangeConfig(0, DAY_MS, trades=250, latency=0)
+    module = create_exchange_module(config, {'binance': 'date_time', 'okex': 'earliest_id'})
+    ascending = await module.binance({'apiKey': 'key'}).fetch_my_trades('BTC/USDT', 0, 100)
+    exchange = module.okex({'apiKey': 'key'})
+    latest = await exchange.fetch_my_trades('BTC/USDT', 0, 100)
+    before = await exchange.fetch_my_trades('BTC/USDT', 0, 100, {'after': latest[0]['order']})
+    print(ascending[0]['order'], ascending[-1]['order'], latest[0]['order'],
+          latest[-1]['order'], before[0]['order'], before[-1]['order'])
+
+
+if __name__ == '__main__':
+    asyncio.run(test())
@@ -0,0 +1,118 @@
+'''
+In memory google sheet with the user info and campaign worksheets for benchmarks and tests,
+it is read through the same GSheet.read_worksheet code as the real sheet
+'''
+import dataclasses
+from collections import Counter
+from dataclasses import dataclass
+
+from tracker.account.get_user_info import UserInfo
+from tracker.bounty.bounty import BountyInfo
+from tracker.core.gsheet import GSheet
+
+
+@dataclass
+class FakeCell:
+    '''gspread cell with the attributes used by the tracker'''
+    row: int
+    col: int
+    value: object = ''
+
+
+class FakeWorksheet:
+    '''gspread worksheet and spreadsheet backed by a list of rows'''
+
+    def __init__(self, worksheet_id: int, title: str, values: list[list], stats: Counter) -> None:
+        self.id = worksheet_id
+        self.title = title
+        self.values = values
+        self.stats = stats
+        self.spreadsheet = self
+
+    def values_get(self, title: str, params: dict = None) -> dict:
+        '''values of the used range as returned by the sheets api'''
+        self.stats['reads'] += 1
+        return {'range': title, 'values': [list(row) for row in self.values]}
+
+    def find(self, query: str, in_row: int = None) -> FakeCell:
+        '''first cell of the header row with the value'''
+        self.stats['reads'] += 1
+        return FakeCell(1, self.values[0].index(query) + 1, query)
+
+    def range(self, first_row: int, first_col: int, last_row: int, last_col: int) -> list[FakeCell]:
+        '''cells of the range, rows and columns start at 1'''
+        self.stats['reads'] += 1
+        return [FakeCell(row, col) for row in range(first_row, last_row + 1)
+                for col in range(first_col, last_col + 1)]
+
+    def update_cells(self, cells: list[FakeCell]) -> None:
+        '''write the values of the cells'''
+        self.stats['writes'] += 1
+        for cell in cells:
+            row = self.values[cell.row - 1]
+            row += [''] * (cell.col - len(row))
+            row[cell.col - 1] = '' if cell.value is None else cell.value
+
+
+def to_values(rows: list) -> list[list]:
+    '''worksheet values of dataclass rows with a header row, None is an empty cell'''
+    header = [field.name for field in dataclasses.fields(rows[0])]
+    return [header] + [['' if value is None else value for value in dataclasses.astuple(row)]
+                       for row in rows]
+
+
+class FakeGSheet(GSheet):
+    '''GSheet without a google connection serving the user infos and bounty infos given'''
+
+    def __init__(self, user_infos: list[UserInfo], bounty_infos: list[BountyInfo]) -> None:
+        # pylint: disable=super-init-not-called
+        self.stats = Counter()
+        self.update_interval = 600
+        self.user_info_ws = FakeWorksheet(1, 'user_info', to_values(user_infos), self.stats)
+        self.campaigns_ws = FakeWorksheet(2, 'campaigns', to_values(bounty_infos), self.stats)
+        self._readers = {}
+
+
+def create_user_infos(accounts: int, exchange_names: list[str]) -> list[UserInfo]:
+    '''user infos of accounts spread over the exchanges'''
+    return [UserInfo(Timestamp='2022-01-01 00:00:00',
+                     email_address=f'user{index}@example.com',
+                     payout_address=f'0x{index:040x}',
+                     display_name=f'user{index}',
+                     exchange_name=exchange_names[index % len(exchange_names)],
+                     api_key=f'api_key_{index}',
+                     secret=f'secret_{index}')
+            for index in range(accounts)]
+
+
+def create_bounty_infos(campaigns: int,
+                        exchange_names: list[str],
+                        markets: list[str],
+                        start_timestamp: int,
+                        end_timestamp: int) -> list[BountyInfo]:
+    '''active campaigns over the exchanges and markets'''
+    return [BountyInfo(exchange_name=exchange_names[index % len(exchange_names)],
+                       market=markets[index % len(markets)],
+                       start_date='',
+                       end_date='',
+                       total_reward=1000.,
+                       reward_currency='USDT',
+                       campaign_id=index + 1,
+                       start_timestamp=start_timestamp,
+                       end_timestamp=end_timestamp,
+                       active=True)
+            for index in range(campaigns)]
+
+
+def test() -> None:
+    '''module test, rows read back as the dataclasses written'''
+    # pylint: disable=import-outside-toplevel
+    from tracker.account.get_user_info import get_user_infos
+    from tracker.bounty.bounty import get_active_bounty_infos
+    user_infos = create_user_infos(3, ['okex'])
+    sheet = FakeGSheet(user_infos, create_bounty_infos(2, ['okex'], ['BTC/USDT'], 0, 1))
+    print(get_user_infos(sheet) == user_infos, get_active_bounty_infos(sheet), sheet.stats)
+
+
+if __name__ == '__main__':
+    test()